@@ -0,0 +1,174 @@
+"""Shift allocation engines.
+
+Both engines give each reporter at most one shift and never put more
+reporters on a shift than it has slots. They take an explicit seed so any
+run can be reproduced exactly.
+
+* ``greedy``  - the original algorithm: walk reporters in random order and
+  give each a random shift that still has room. Can leave slots vacant even
+  when a full assignment exists.
+* ``optimal`` - the greedy result is then improved with Hopcroft-Karp style
+  augmenting paths (capacity-aware bipartite matching), which maximises the
+  number of filled slots. Reporter order and each reporter's shift order are
+  shuffled with the seed, so ties are still broken at random.
+"""
+import random
+
+MODES = ('optimal', 'greedy')
+INF = float('inf')
+
+
+def new_seed():
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def index_shifts(shifts):
+    """Map shift id -> shift dict"""
+    return {shift['id']: shift for shift in shifts}
+
+
+def allocate_greedy(signups, shifts, seed):
+    """The original random-order greedy allocation"""
+    rng = random.Random(seed)
+    shifts_by_id = index_shifts(shifts)
+    assignments = {}
+    shift_assignments = {shift['id']: [] for shift in shifts}
+
+    # Randomize order for fairness
+    interested_reporters = [r for r in signups.keys() if signups[r]]
+    rng.shuffle(interested_reporters)
+
+    for reporter in interested_reporters:
+        available = [shift_id for shift_id in signups[reporter]
+                     if shift_id in shifts_by_id
+                     and len(shift_assignments[shift_id]) < shifts_by_id[shift_id]['slots']]
+        if available:
+            selected_shift = rng.choice(available)
+            assignments[reporter] = selected_shift
+            shift_assignments[selected_shift].append(reporter)
+
+    return assignments, shift_assignments
+
+
+def allocate_optimal(signups, shifts, seed):
+    """Random-order greedy followed by augmenting paths up to a maximum matching"""
+    rng = random.Random(seed)
+    shift_ids = [shift['id'] for shift in shifts]
+    position = {shift_id: i for i, shift_id in enumerate(shift_ids)}
+    cap = [shift['slots'] for shift in shifts]
+    load = [0] * len(shifts)
+    holders = [[] for _ in shifts]
+
+    # Reporters and their (deduplicated, known) shift choices, in random order
+    usernames = [r for r in signups.keys() if signups[r]]
+    rng.shuffle(usernames)
+    adj = []
+    for username in usernames:
+        choices = list(dict.fromkeys(position[s] for s in signups[username] if s in position))
+        rng.shuffle(choices)
+        adj.append(choices)
+    n = len(usernames)
+    match = [-1] * n
+
+    # Greedy start: first choice (in shuffled order) with room
+    for r in range(n):
+        for s in adj[r]:
+            if load[s] < cap[s]:
+                match[r] = s
+                load[s] += 1
+                holders[s].append(r)
+                break
+
+    def candidates(r, dist, layer):
+        # (shift, None) = free slot; (shift, holder) = take holder's slot
+        for s in adj[r]:
+            if load[s] < cap[s]:
+                yield s, None
+            elif layer[s] == dist[r] + 1:
+                for h in list(holders[s]):
+                    yield s, h
+                # Once every holder has failed, nobody else can get through
+                # s this phase
+                layer[s] = INF
+
+    def augment(start, dist, gens, layer):
+        stack, via = [start], []
+        while stack:
+            r = stack[-1]
+            if r not in gens:
+                gens[r] = candidates(r, dist, layer)
+            step = next(gens[r], None)
+            if step is None:
+                dist[r] = INF
+                stack.pop()
+                if via:
+                    via.pop()
+                continue
+            s, h = step
+            if h is None:
+                if load[s] < cap[s]:
+                    # stack[i] takes via[i] from stack[i + 1]; the last one takes s
+                    via.append(s)
+                    load[s] += 1
+                    for r, s in zip(stack, via):
+                        if match[r] != -1:
+                            holders[match[r]].remove(r)
+                        match[r] = s
+                        holders[s].append(r)
+                        dist[r] = INF  # each reporter is used once per phase
+                    return True
+            elif dist[h] == dist[r] + 1 and match[h] == s:
+                stack.append(h)
+                via.append(s)
+        return False
+
+    total_cap = sum(cap)
+    while sum(load) < total_cap:
+        # BFS layers from every unmatched reporter, up to the first layer
+        # that can reach a free slot (shortest augmenting paths only). A full
+        # shift's holders all land on one layer, recorded in layer[s].
+        dist = [INF] * n
+        layer = [INF] * len(shifts)
+        queue = [r for r in range(n) if match[r] == -1 and adj[r]]
+        for r in queue:
+            dist[r] = 0
+        limit = INF
+        for r in queue:
+            if dist[r] >= limit:
+                break
+            for s in adj[r]:
+                if load[s] < cap[s]:
+                    limit = dist[r]
+                elif layer[s] == INF:
+                    layer[s] = dist[r] + 1
+                    for h in holders[s]:
+                        dist[h] = layer[s]
+                        queue.append(h)
+        if limit == INF:
+            break
+
+        gens = {}
+        augmented = False
+        for r in range(n):
+            if match[r] == -1 and dist[r] == 0 and augment(r, dist, gens, layer):
+                augmented = True
+        if not augmented:
+            break
+
+    assignments = {usernames[r]: shift_ids[match[r]] for r in range(n) if match[r] != -1}
+    shift_assignments = {shift_id: [] for shift_id in shift_ids}
+    for r in range(n):
+        if match[r] != -1:
+            shift_assignments[shift_ids[match[r]]].append(usernames[r])
+    return assignments, shift_assignments
+
+
+def allocate(signups, shifts, mode='optimal', seed=None):
+    """Run an allocation; returns (assignments, shift_assignments, seed)"""
+    if mode not in MODES:
+        raise ValueError(f"Unknown allocation mode '{mode}'")
+    if seed is None:
+        seed = new_seed()
+    engine = allocate_optimal if mode == 'optimal' else allocate_greedy
+    assignments, shift_assignments = engine(signups, shifts, seed)
+    return assignments, shift_assignments, seed
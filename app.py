@@ -1,122 +1,395 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file
+from flask import Blueprint, Flask, current_app, render_template, request, jsonify, session, redirect, url_for, send_file, make_response
 from datetime import datetime
+import gc
+import hmac
 import json
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
 import random
-import csv
+from io import BytesIO
+from storage import DATASETS, JsonFileCache, JsonStore, Snapshots, SqliteStore, copy_datasets, thaw
+from journal import Journal, JournalStore, parse_time
+import allocation
+import bulk
+import simulation
+from seasons import SeasonArchive, season_id, valid_season
+from interest import InterestIndex, build_index
+from views import VersionedCache, build_manager_view, content_etag
+import export
+import ical
+import jobs
+from passwords import PasswordPool, PasswordPoolBusy, needs_rehash
+import credentials
+import reporter_sync
+import metrics
+import profiling
+from group_commit import GroupCommit
+from jinja2 import FileSystemBytecodeCache
+from assets import IMMUTABLE, AssetPipeline
+from events import EventBus, EventStream
+import click
 
 # Determine the base directory (where this script is located)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-template_folder = os.path.join(BASE_DIR, 'templates')
-app = Flask(__name__, template_folder=template_folder)
+TEMPLATE_FOLDER = os.path.join(BASE_DIR, 'templates')
 
 # Fixed secret key for session persistence
-app.secret_key = 'reporter-holiday-shifts-secret-key-2025'
-
-# Data storage
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-os.makedirs(DATA_DIR, exist_ok=True)
+SECRET_KEY = 'reporter-holiday-shifts-secret-key-2025'
 
-# Use shared reporters file from weekend_reporter if available
-WEEKEND_REPORTER_DIR = os.path.join(os.path.dirname(BASE_DIR), 'weekend_reporter')
-SHARED_REPORTERS_FILE = os.path.join(WEEKEND_REPORTER_DIR, 'data', 'reporters.json')
+# Routes and CLI commands; create_app() registers them on the app it builds
+bp = Blueprint('holiday', __name__, cli_group=None)
 
-# If weekend_reporter's file exists, use it; otherwise use local
-if os.path.exists(SHARED_REPORTERS_FILE):
-    REPORTERS_FILE = SHARED_REPORTERS_FILE
-    print(f"Using shared reporters file from weekend_reporter: {SHARED_REPORTERS_FILE}")
-else:
-    REPORTERS_FILE = os.path.join(DATA_DIR, 'reporters.json')
-    print(f"Using local reporters file: {REPORTERS_FILE}")
+EVENT_HEARTBEAT = 15
+EVENT_RETRY_MS = 5000
 
-SIGNUPS_FILE = os.path.join(DATA_DIR, 'signups.json')
-SETTINGS_FILE = os.path.join(DATA_DIR, 'settings.json')
-ASSIGNMENTS_FILE = os.path.join(DATA_DIR, 'assignments.json')
-HOLIDAYS_FILE = os.path.join(DATA_DIR, 'holidays.json')
+def configure(config=None):
+    """Resolve paths and settings from the environment, overridden by config.
+    
+    Sets the module-level names the rest of this file uses. Reads and writes
+    nothing; create_app() does the setup work.
+    """
+    global DATA_DIR, SHARED_REPORTERS_FILE, REPORTERS_FILE, DESK, PARTITION_DIR
+    global SIGNUPS_FILE, SETTINGS_FILE, ASSIGNMENTS_FILE, HOLIDAYS_FILE
+    global STORAGE_BACKEND, SQLITE_FILE, JOURNAL_DIR, SEASONS_DIR, ALLOCATION_MODE, JOB_SIMULATION_TIME_BUDGET
+    global CREDENTIALS_STATE_FILE, REPORTERS_SYNC_SOURCE, REPORTERS_SYNC_CURSOR, REPORTERS_SYNC_WATCH
+    global METRICS_DIR, METRICS_TOKEN, EVENTS_FILE, EVENT_STREAMS, ASYNC_EVENT_STREAMS, WSGI_THREADS
+    global TEMPLATE_CACHE_DIR, PROFILES_DIR, CALENDAR_SECRET, CALENDAR_SECRET_FILE, CALENDAR_TIMEZONE
+    settings = dict(os.environ)
+    settings.update(config or {})
+    
+    # Data storage (HOLIDAY_DATA_DIR points the app at another data directory,
+    # e.g. a generated benchmark dataset)
+    DATA_DIR = settings.get('HOLIDAY_DATA_DIR', os.path.join(BASE_DIR, 'data'))
+    
+    # Use shared reporters file from weekend_reporter if available
+    weekend_reporter_dir = os.path.join(os.path.dirname(BASE_DIR), 'weekend_reporter')
+    SHARED_REPORTERS_FILE = os.path.join(weekend_reporter_dir, 'data', 'reporters.json')
+    
+    # If weekend_reporter's file exists, use it; otherwise use local
+    # (USE_SHARED_REPORTERS=0 always uses the local file)
+    if os.path.exists(SHARED_REPORTERS_FILE) and settings.get('USE_SHARED_REPORTERS', '1') != '0':
+        REPORTERS_FILE = SHARED_REPORTERS_FILE
+    else:
+        REPORTERS_FILE = os.path.join(DATA_DIR, 'reporters.json')
+    
+    # Season data is partitioned per desk when DESK is set (data/desks/<desk>/);
+    # reporters are shared by all desks
+    DESK = settings.get('DESK')
+    PARTITION_DIR = os.path.join(DATA_DIR, 'desks', DESK) if DESK else DATA_DIR
+    
+    SIGNUPS_FILE = os.path.join(PARTITION_DIR, 'signups.json')
+    SETTINGS_FILE = os.path.join(PARTITION_DIR, 'settings.json')
+    ASSIGNMENTS_FILE = os.path.join(PARTITION_DIR, 'assignments.json')
+    HOLIDAYS_FILE = os.path.join(PARTITION_DIR, 'holidays.json')
+    
+    # Storage backend: 'json' (one file per dataset), 'sqlite' (row updates in
+    # data/holiday_reporter.sqlite3, migrated once from the JSON files) or
+    # 'journal' (signups/assignments as an append-only event log in data/journal/)
+    STORAGE_BACKEND = settings.get('STORAGE_BACKEND', 'json')
+    SQLITE_FILE = os.path.join(PARTITION_DIR, 'holiday_reporter.sqlite3')
+    JOURNAL_DIR = os.path.join(PARTITION_DIR, 'journal')
+    
+    # Past seasons, frozen into read-only archives when the system is reset
+    SEASONS_DIR = os.path.join(PARTITION_DIR, 'seasons')
+    
+    # Default allocation engine: 'optimal' (fills as many slots as possible) or
+    # 'greedy' (the original one-pass random allocation)
+    ALLOCATION_MODE = settings.get('ALLOCATION_MODE', 'optimal')
+    
+    # Seconds a simulation run as a background job may take (unset: no limit;
+    # /api/simulate answers within SIMULATION_TIME_BUDGET or queues a job)
+    JOB_SIMULATION_TIME_BUDGET = settings.get('JOB_SIMULATION_TIME_BUDGET')
+    if JOB_SIMULATION_TIME_BUDGET:
+        JOB_SIMULATION_TIME_BUDGET = float(JOB_SIMULATION_TIME_BUDGET)
+    else:
+        JOB_SIMULATION_TIME_BUDGET = None
+    
+    # State of the last reporter_credentials.csv import (fingerprints, not passwords)
+    CREDENTIALS_STATE_FILE = os.path.join(DATA_DIR, 'credentials_import.json')
+    
+    # Changed accounts in weekend_reporter's reporters.json are synced into our
+    # reporters store (set REPORTERS_SYNC_WATCH=1 to sync automatically on change)
+    REPORTERS_SYNC_SOURCE = settings.get('REPORTERS_SYNC_SOURCE', SHARED_REPORTERS_FILE)
+    REPORTERS_SYNC_CURSOR = os.path.join(DATA_DIR, 'reporter_sync.json')
+    REPORTERS_SYNC_WATCH = settings.get('REPORTERS_SYNC_WATCH') == '1'
+    
+    # Per-worker request/span metrics, summed across workers by /metrics.
+    # Prometheus can scrape with `Authorization: Bearer $METRICS_TOKEN`.
+    METRICS_DIR = settings.get('METRICS_DIR', os.path.join(DATA_DIR, 'metrics'))
+    METRICS_TOKEN = settings.get('METRICS_TOKEN')
+    
+    # Profiler captures (/api/profiling), kept within PROFILE_BUDGET_MB
+    PROFILES_DIR = settings.get('PROFILES_DIR', os.path.join(DATA_DIR, 'profiles'))
+    
+    # Live dashboard updates (/api/events). Workers share events through the feed
+    # file; each worker holds at most EVENT_STREAMS streams open - and no more
+    # than half its WSGI_THREADS, which gunicorn.conf.py sets from --threads.
+    # Past that (or on a server without threads) a stream sends one snapshot
+    # and the browser reconnects EVENT_RETRY_MS later instead. Under asgi.py an
+    # open stream takes no thread, so the limit is ASYNC_EVENT_STREAMS.
+    EVENTS_FILE = os.path.join(PARTITION_DIR, 'events.ndjson')
+    EVENT_STREAMS = int(settings.get('EVENT_STREAMS', 32))
+    WSGI_THREADS = int(settings['WSGI_THREADS']) if settings.get('WSGI_THREADS') else None
+    ASYNC_EVENT_STREAMS = int(settings.get('ASYNC_EVENT_STREAMS', 1000))
+    
+    # Calendar feeds (/calendar/...ics) are authorized by HMAC tokens in their
+    # URLs; changing CALENDAR_SECRET revokes every subscription. Unset, a random
+    # secret is generated into CALENDAR_SECRET_FILE on first start (bootstrap).
+    # Shift times are local times, labelled CALENDAR_TIMEZONE (e.g.
+    # Europe/London) if set.
+    CALENDAR_SECRET = settings.get('CALENDAR_SECRET') or None
+    CALENDAR_SECRET_FILE = os.path.join(DATA_DIR, 'calendar_secret')
+    CALENDAR_TIMEZONE = settings.get('CALENDAR_TIMEZONE')
+    
+    # Compiled templates, so a worker that didn't inherit them skips compiling
+    TEMPLATE_CACHE_DIR = os.path.join(DATA_DIR, 'template_cache')
 
 # No automatic deadline - system uses manual is_locked flag only
 
-# Initialize data files
-def init_data_files():
-    # Always load reporters from CSV if it exists (to catch any CSV updates)
-    reporters = {}
-    csv_loaded = False
-    
-    # Manager account
-    reporters['admin'] = {
-        'name': 'Admin',
-        'is_manager': True,
-        'password': generate_password_hash('admin123')
-    }
-    
-    # Load from reporter_credentials.csv (local copy or parent directory)
+def find_credentials_csv():
+    """reporter_credentials.csv (local copy or weekend_reporter's), or None"""
     csv_path = os.path.join(BASE_DIR, 'reporter_credentials.csv')
     if not os.path.exists(csv_path):
         csv_path = os.path.join(os.path.dirname(BASE_DIR), 'weekend_reporter', 'reporter_credentials.csv')
+    return csv_path if os.path.exists(csv_path) else None
+
+# Initialize data files
+def init_data_files():
+    # One-shot migration of existing JSON data into the SQLite store
+    if STORAGE_BACKEND == 'sqlite':
+        migrated = copy_datasets(json_store, store, names=SqliteStore.TABLES)
+        if migrated:
+            print(f"Migrated {', '.join(migrated)} from JSON into {SQLITE_FILE}")
     
-    if os.path.exists(csv_path):
-        # Try multiple encodings
-        for encoding in ['utf-8', 'latin-1', 'cp1252']:
-            try:
-                with open(csv_path, 'r', encoding=encoding) as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        username = row['Username']
-                        reporters[username] = {
-                            'name': row['Name'],
-                            'is_manager': False,
-                            'password': generate_password_hash(row['Password']),
-                            'email': row['Email']
-                        }
-                csv_loaded = True
-                print(f"Loaded {len(reporters)-1} reporters from CSV: {csv_path}")
-                break  # Success, stop trying encodings
-            except UnicodeDecodeError:
-                continue  # Try next encoding
-    
-    # If we loaded from CSV AND reporters.json doesn't exist, save it
-    # Don't overwrite existing reporters.json (preserves password changes)
-    if csv_loaded and not os.path.exists(REPORTERS_FILE):
-        save_json(REPORTERS_FILE, reporters)
-        print(f"Created reporters.json with {len(reporters)} accounts from CSV")
-    
-    if not os.path.exists(SIGNUPS_FILE):
-        save_json(SIGNUPS_FILE, {})
-    
-    if not os.path.exists(SETTINGS_FILE):
-        save_json(SETTINGS_FILE, {
+    # Reporters come from reporter_credentials.csv on first run only; later CSV
+    # changes are merged with `flask --app app import-credentials`
+    # (don't re-hash the CSV on every worker boot - it preserves password changes anyway)
+    if not store.exists('reporters'):
+        csv_path = find_credentials_csv()
+        if csv_path:
+            result = credentials.import_credentials(csv_path, store, CREDENTIALS_STATE_FILE)
+            print(f"Imported {result.get('rows', 0)} reporters from CSV: {csv_path}")
+    
+    if not store.exists('signups'):
+        store.replace('signups', {})
+    
+    if not store.exists('settings'):
+        store.replace('settings', {
             'is_locked': False
         })
     
-    if not os.path.exists(ASSIGNMENTS_FILE):
-        save_json(ASSIGNMENTS_FILE, {})
+    if not store.exists('assignments'):
+        store.replace('assignments', {})
     
     # Copy holidays.json from git if it doesn't exist in data directory
     # (This handles the case where data/ is a mounted disk that overlays git files)
     if not os.path.exists(HOLIDAYS_FILE):
         # Check if there's a holidays.json in the project root or a backup location
+        # (a new desk starts from the shared data/holidays.json)
         backup_path = os.path.join(BASE_DIR, 'holidays_backup.json')
+        if DESK and os.path.exists(os.path.join(DATA_DIR, 'holidays.json')):
+            backup_path = os.path.join(DATA_DIR, 'holidays.json')
         if os.path.exists(backup_path):
             import shutil
             shutil.copy(backup_path, HOLIDAYS_FILE)
             print(f"Copied holidays.json from backup to {HOLIDAYS_FILE}")
 
-# Helper functions
-def load_json(filepath):
-    with open(filepath, 'r') as f:
-        return json.load(f)
+def open_store():
+    """(JSON file store, the STORAGE_BACKEND store) - the same object for 'json'.
+    
+    Also what the reset_*.py scripts write through, so their changes reach
+    whichever backend the app runs on.
+    """
+    json_store = JsonStore({
+        'reporters': REPORTERS_FILE,
+        'signups': SIGNUPS_FILE,
+        'settings': SETTINGS_FILE,
+        'assignments': ASSIGNMENTS_FILE,
+        'holidays': HOLIDAYS_FILE,
+    }, JsonFileCache())
+    
+    if STORAGE_BACKEND == 'sqlite':
+        store = SqliteStore(SQLITE_FILE, json_store)
+    elif STORAGE_BACKEND == 'journal':
+        store = JournalStore(Journal(JOURNAL_DIR), json_store)
+    else:
+        store = json_store
+    return json_store, store
+
+def build_services():
+    """Create the store and everything built on it (module-level, one app per process)"""
+    global json_store, store, snapshots, interest_index, event_bus, signup_commits
+    global season_archive, password_pool, reporter_watcher, asset_pipeline, feed_stamps, job_runner
+    os.makedirs(PARTITION_DIR, exist_ok=True)
+    
+    # Data store
+    # Loaded data is cached per worker and revalidated against the backing
+    # file/database, and is read-only - use thaw() before modifying it.
+    json_store, store = open_store()
+    
+    # Consistent views of all datasets for code that reads several of them
+    snapshots = Snapshots(store, os.path.join(PARTITION_DIR, 'snapshot.seq'))
+    
+    # shift id -> interested reporters, updated incrementally on signup changes
+    interest_index = InterestIndex(store)
+    
+    event_bus = EventBus(EVENTS_FILE)
+    
+    # Concurrent signup submissions (from any worker) are written in batches
+    signup_commits = GroupCommit(store.put_signups, os.path.join(PARTITION_DIR, 'signup_queue'),
+                                 on_commit=signups_committed)
+    
+    season_archive = SeasonArchive(SEASONS_DIR)
+    
+    # Allocations, exports and simulations submitted as background jobs (/api/jobs)
+    job_runner = jobs.JobRunner(jobs.JobQueue(os.path.join(PARTITION_DIR, 'jobs.sqlite'),
+                                              os.path.join(PARTITION_DIR, 'jobs')))
+    job_runner.register('allocate', prepare_allocation_job, allocation_job, finish_allocation_job,
+                        exclusive=True)
+    job_runner.register('export', prepare_export_job, export_job, finish_export_job,
+                        artifact_name='holiday_shifts.xlsx')
+    job_runner.register('simulate', prepare_simulation_job, simulation_job, finish_simulation_job)
+    
+    # When each calendar feed last changed, the same for every worker
+    feed_stamps = ical.FeedStamps(os.path.join(PARTITION_DIR, 'calendar_stamps.json'))
+    
+    # Password hashing/verification runs in a bounded process pool
+    password_pool = PasswordPool()
+    
+    reporter_watcher = reporter_sync.SyncWatcher(
+        REPORTERS_SYNC_SOURCE, sync_reporters,
+        poll_interval=float(os.environ.get('REPORTERS_SYNC_INTERVAL', 30)))
+    
+    # Dashboard CSS/JS live in assets/ and are served from content-hashed URLs
+    asset_pipeline = AssetPipeline(os.path.join(BASE_DIR, 'assets'),
+                                   os.path.join(BASE_DIR, 'assets', 'dist'))
+
+# Rendered pages, keyed on the data version they were built from
+render_cache = VersionedCache()
+
+def interest_counts(snapshot):
+    return interest_index.counts_at(snapshot.versions['signups'], snapshot['signups'])
+
+def live_counts():
+    """What live dashboards show: interest per shift, submissions, assignments"""
+    snapshot = snapshots.current()
+    counts = interest_counts(snapshot)
+    return {
+        'shift_interest': {shift['id']: counts.get(shift['id'], 0) for shift in snapshot['holidays']['shifts']},
+        'submitted_count': sum(1 for shift_ids in snapshot['signups'].values() if shift_ids),
+        'assignment_count': len(snapshot['assignments']),
+        'is_locked': snapshot['settings'].get('is_locked', False),
+    }
+
+def signups_committed(change, changes):
+    interest_index.apply(change, changes)
+    # Only the shifts whose interest changed
+    touched = set()
+    for username, shift_ids in changes.items():
+        touched |= set(change.previous.get(username) or ()) ^ set(shift_ids or ())
+    counts = interest_index.counts()
+    event_bus.publish('signups', {
+        'shift_interest': {shift_id: counts.get(shift_id, 0) for shift_id in touched},
+        'submitted_count': sum(1 for shift_ids in get_signups().values() if shift_ids),
+    })
+
+def reporters_shared():
+    """True if reporters are read from (and written to) weekend_reporter's file"""
+    return STORAGE_BACKEND != 'sqlite' and REPORTERS_FILE == SHARED_REPORTERS_FILE
+
+def sync_reporters(dry_run=False):
+    # With the JSON backend the shared file may already *be* our reporters store
+    if STORAGE_BACKEND != 'sqlite' and os.path.exists(REPORTERS_FILE) \
+            and os.path.exists(REPORTERS_SYNC_SOURCE) \
+            and os.path.samefile(REPORTERS_FILE, REPORTERS_SYNC_SOURCE):
+        return {'skipped': True, 'reason': 'Source is the live reporters store'}
+    return reporter_sync.sync_from_file(REPORTERS_SYNC_SOURCE, store, REPORTERS_SYNC_CURSOR, dry_run)
 
-def save_json(filepath, data):
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
+def server_busy():
+    response = jsonify({'success': False, 'error': 'Server is busy, please try again in a moment'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
 
-# Initialize after defining helper functions
-init_data_files()
+def bootstrap(app):
+    """One-time setup. Under `gunicorn --preload` it runs once in the master,
+    and the workers inherit the result instead of each redoing it."""
+    global CALENDAR_SECRET
+    os.makedirs(DATA_DIR, exist_ok=True)
+    init_data_files()
+    if CALENDAR_SECRET is None:
+        CALENDAR_SECRET = ical.load_secret(CALENDAR_SECRET_FILE)
+    asset_pipeline.build()
+    
+    # Compile every template now, and keep the bytecode for cold workers
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    
+    # Load every dataset and build the interest index (without reporters, as
+    # before the credentials are imported, requests fail on their own)
+    if all(store.exists(name) for name in snapshots.names):
+        snapshots.current()
+        interest_index.sync()
+
+_worker_pid = None
+
+def start_worker(threads=None):
+    """Per-process setup: call in each worker after forking (gunicorn.conf.py does)
+    
+    threads is the number of request threads the worker has, if known.
+    """
+    global _worker_pid, WSGI_THREADS
+    if threads is not None:
+        WSGI_THREADS = threads
+    if _worker_pid == os.getpid():
+        return
+    _worker_pid = os.getpid()
+    # Forked workers would otherwise share the parent's random state
+    random.seed()
+    # Threads don't survive a fork; each worker runs its own
+    if REPORTERS_SYNC_WATCH and os.path.isdir(os.path.dirname(REPORTERS_SYNC_SOURCE)):
+        reporter_watcher.start()
+
+def create_app(config=None, preload=False):
+    """Build the app.
+    
+    config overrides environment settings (same names, e.g.
+    {'HOLIDAY_DATA_DIR': ...}). With preload=True (gunicorn.conf.py), the
+    caller is a master process that will fork workers: per-worker setup is
+    left to start_worker(), and everything loaded so far is moved out of the
+    garbage collector's reach so it stays shared with the workers instead of
+    being copied into each one.
+    """
+    configure(config)
+    if REPORTERS_FILE == SHARED_REPORTERS_FILE:
+        print(f"Using shared reporters file from weekend_reporter: {SHARED_REPORTERS_FILE}")
+    else:
+        print(f"Using local reporters file: {REPORTERS_FILE}")
+    
+    app = Flask(__name__, template_folder=TEMPLATE_FOLDER)
+    app.secret_key = SECRET_KEY
+    app.config.update(DATA_DIR=DATA_DIR, DESK=DESK, STORAGE_BACKEND=STORAGE_BACKEND)
+    app.register_blueprint(bp)
+    metrics.registry.directory = METRICS_DIR
+    metrics.registry.instrument(app)
+    profiling.profiler.directory = PROFILES_DIR
+    profiling.profiler.instrument(app)
+    
+    build_services()
+    bootstrap(app)
+    if preload:
+        gc.freeze()
+    else:
+        start_worker()
+    return app
+
+@bp.app_template_global()
+def asset_url(name):
+    return url_for('holiday.static_asset', filename=asset_pipeline.hashed_name(name))
 
 # Template filters
-@app.template_filter('format_date')
+@bp.app_template_filter('format_date')
 def format_date(date_str):
     """Convert YYYY-MM-DD to 'Month DD, YYYY'"""
     try:
@@ -126,31 +399,54 @@ def format_date(date_str):
         return date_str
 
 def get_reporters():
-    return load_json(REPORTERS_FILE)
+    return store.load('reporters')
 
 def get_signups():
-    return load_json(SIGNUPS_FILE)
+    return store.load('signups')
 
 def get_settings():
-    return load_json(SETTINGS_FILE)
+    return store.load('settings')
 
 def get_assignments():
-    return load_json(ASSIGNMENTS_FILE)
+    return store.load('assignments')
 
 def get_holidays():
-    return load_json(HOLIDAYS_FILE)
+    return store.load('holidays')
+
+def data_version(names=DATASETS):
+    """Identifies the current contents of the datasets; changes on every write.
+    
+    Only stats the files (or reads the SQLite version counters), so checking
+    it is far cheaper than loading anything.
+    """
+    return tuple(store.version(name) for name in names)
 
 # Routes
-@app.route('/')
+@bp.route('/assets/<filename>')
+def static_asset(filename):
+    """Hashed CSS/JS bundles, precompressed, cached by browsers for a year"""
+    resolved = asset_pipeline.resolve(filename, request.accept_encodings)
+    if resolved is None:
+        return jsonify({'error': 'Not found'}), 404
+    path, mimetype, encoding = resolved
+    
+    response = send_file(path, mimetype=mimetype, max_age=0)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+@bp.route('/')
 def index():
     if 'username' in session:
         if session.get('is_manager'):
-            return redirect(url_for('manager_dashboard'))
+            return redirect(url_for('.manager_dashboard'))
         else:
-            return redirect(url_for('reporter_dashboard'))
-    return redirect(url_for('login'))
+            return redirect(url_for('.reporter_dashboard'))
+    return redirect(url_for('.login'))
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         data = request.json
@@ -160,55 +456,83 @@ def login():
         reporters = get_reporters()
         
         if username in reporters:
-            if check_password_hash(reporters[username]['password'], password):
+            try:
+                valid = password_pool.verify(reporters[username]['password'], password)
+            except PasswordPoolBusy:
+                return server_busy()
+            
+            if valid:
                 session['username'] = username
                 session['is_manager'] = reporters[username].get('is_manager', False)
+                
+                # Upgrade hashes made under an older hash policy - but not in
+                # weekend_reporter's reporters.json, which we only share
+                if needs_rehash(reporters[username]['password']) and not reporters_shared():
+                    try:
+                        reporter = thaw(reporters[username])
+                        reporter['password'] = password_pool.hash(password)
+                        store.put_reporters({username: reporter})
+                    except PasswordPoolBusy:
+                        pass  # try again next login
+                
                 return jsonify({'success': True, 'is_manager': session['is_manager']})
         
         return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
     
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/manager/dashboard')
+@bp.route('/manager/dashboard')
 def manager_dashboard():
     if not session.get('is_manager'):
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
-    reporters = get_reporters()
-    settings = get_settings()
-    signups = get_signups()
-    assignments = get_assignments()
-    holidays = get_holidays()
+    # A manager can switch the dashboard to an archived season (read-only)
+    viewing = session.get('season')
+    archived = season_archive.load(viewing) if viewing else None
+    snapshot = snapshots.current() if archived is None else None
     
-    # Count reporters who have submitted signups
-    submitted_count = len([r for r in signups.keys() if signups[r]])
-    
-    # Calculate interest per shift
-    shift_interest = {}
-    for holiday in holidays['shifts']:
-        shift_id = holiday['id']
-        interested = sum(1 for reporter_shifts in signups.values() if shift_id in reporter_shifts)
-        shift_interest[shift_id] = interested
-    
-    return render_template('manager_dashboard.html', 
-                         reporters=reporters,
-                         settings=settings,
-                         submitted_count=submitted_count,
-                         total_reporters=len([r for r in reporters.values() if not r.get('is_manager')]),
-                         assignments=assignments,
-                         signups=signups,
-                         holidays=holidays['shifts'],
-                         shift_interest=shift_interest)
+    def render():
+        if archived is not None:
+            names = archived['reporter_names']
+            view = build_manager_view({username: {'name': name} for username, name in names.items()},
+                                      {'is_locked': True}, archived['signups'], archived['assignments'],
+                                      archived['holidays']['shifts'],
+                                      {shift_id: len(usernames) for shift_id, usernames in
+                                       build_index(archived['signups']).items()})
+            view.update(season=archived['season'], archived=True,
+                        total_reporters=archived.get('total_reporters', view['total_reporters']))
+        else:
+            shifts = snapshot['holidays']['shifts']
+            view = build_manager_view(snapshot['reporters'], snapshot['settings'], snapshot['signups'],
+                                      snapshot['assignments'], shifts, interest_counts(snapshot))
+            view.update(season=season_id(snapshot['settings'], shifts), archived=False)
+        view['archived_seasons'] = [entry['season'] for entry in season_archive.list()]
+        html = render_template('manager_dashboard.html', view=view)
+        return content_etag(html), html
+    
+    # Re-render only when the data changed; unchanged pages are answered with 304
+    if archived is not None:
+        key, version = f"manager_dashboard:{archived['season']}", season_archive.version()
+    else:
+        key, version = 'manager_dashboard', (snapshot.version, season_archive.version())
+    etag, html = render_cache.get(key, version, render)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(html)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-@app.route('/reporter/dashboard')
+@bp.route('/reporter/dashboard')
 def reporter_dashboard():
     if 'username' not in session or session.get('is_manager'):
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     settings = get_settings()
     signups = get_signups()
@@ -227,15 +551,15 @@ def reporter_dashboard():
                          holidays=holidays['shifts'],
                          signups=user_signups,
                          assignment=user_assignment,
-                         is_locked=is_locked)
+                         is_locked=is_locked,
+                         calendar_url=feed_url(f'reporter:{username}'))
 
-@app.route('/api/signups', methods=['GET', 'POST'])
+@bp.route('/api/signups', methods=['GET', 'POST'])
 def manage_signups():
     if 'username' not in session:
         return jsonify({'error': 'Unauthorized'}), 403
     
     username = session['username']
-    signups = get_signups()
     settings = get_settings()
     
     # Check if locked (manual lock only, no automatic deadline)
@@ -248,69 +572,116 @@ def manage_signups():
         data = request.json
         user_signups = data.get('signups', [])
         
-        signups[username] = user_signups
-        save_json(SIGNUPS_FILE, signups)
+        # Returns once the change is on disk, along with everyone else's pending ones
+        signup_commits.submit({username: user_signups})
         return jsonify({'success': True})
     
     # GET
+    signups = get_signups()
     if session.get('is_manager'):
         return jsonify(signups)
     else:
         return jsonify({username: signups.get(username, [])})
 
-@app.route('/api/allocate', methods=['POST'])
+def allocation_params(data):
+    """{'mode', 'seed'} of an allocation request; ValueError if invalid"""
+    mode = data.get('mode', ALLOCATION_MODE)
+    seed = data.get('seed')
+    if mode not in allocation.MODES:
+        raise ValueError(f"Unknown allocation mode '{mode}'")
+    if seed is not None and not isinstance(seed, int):
+        raise ValueError('Seed must be an integer')
+    return {'mode': mode, 'seed': seed}
+
+def simulation_params(data):
+    """{'mode', 'trials', 'seed'} of a simulation request; ValueError if invalid"""
+    mode = data.get('mode', ALLOCATION_MODE)
+    trials = data.get('trials', simulation.DEFAULT_TRIALS)
+    seed = data.get('seed', 0)
+    if mode not in allocation.MODES:
+        raise ValueError(f"Unknown allocation mode '{mode}'")
+    if not isinstance(trials, int) or not 1 <= trials <= simulation.MAX_TRIALS:
+        raise ValueError(f'Trials must be an integer from 1 to {simulation.MAX_TRIALS}')
+    if not isinstance(seed, int):
+        raise ValueError('Seed must be an integer')
+    return {'mode': mode, 'trials': trials, 'seed': seed}
+
+def save_allocation(snapshot, mode, seed, assignments, shift_assignments):
+    """Store an allocation's assignments and lock signups; returns what /api/allocate answers"""
+    # Assignments and the lock land together as far as snapshots are concerned
+    with snapshots.writing():
+        store.replace('assignments', assignments)
+        
+        # Lock signups and record how to reproduce this run
+        store.put_settings({
+            'is_locked': True,
+            'last_allocation': {
+                'mode': mode,
+                'seed': seed,
+                'ran_at': datetime.now().isoformat(timespec='seconds'),
+            }
+        })
+    event_bus.publish('allocation', {'assignment_count': len(assignments), 'is_locked': True})
+    
+    counts = interest_counts(snapshot)
+    
+    return {
+        'success': True,
+        'mode': mode,
+        'seed': seed,
+        'assignments': assignments,
+        'shift_assignments': shift_assignments,
+        'shift_interest': {shift['id']: counts.get(shift['id'], 0) for shift in snapshot['holidays']['shifts']}
+    }
+
+@bp.route('/api/allocate', methods=['POST'])
 def allocate_shifts():
     if not session.get('is_manager'):
         return jsonify({'error': 'Unauthorized'}), 403
     
-    signups = get_signups()
-    holidays = get_holidays()
-    assignments = {}
-    shift_assignments = {shift['id']: [] for shift in holidays['shifts']}
+    try:
+        params = allocation_params(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Get all reporters who signed up
-    interested_reporters = [r for r in signups.keys() if signups[r]]
+    snapshot = snapshots.current()
     
-    # Randomize order for fairness
-    random.shuffle(interested_reporters)
+    # Each reporter gets max 1 shift; pass the same seed to repeat a run exactly
+    assignments, shift_assignments, seed = allocation.allocate(
+        snapshot['signups'], snapshot['holidays']['shifts'], mode=params['mode'], seed=params['seed'])
     
-    # Allocate shifts - each reporter gets max 1 shift
-    for reporter in interested_reporters:
-        # Skip if already assigned
-        if reporter in assignments:
-            continue
-        
-        # Get their interested shifts
-        reporter_interests = signups[reporter]
-        
-        # Find available shifts from their interests
-        available = []
-        for shift_id in reporter_interests:
-            shift = next((s for s in holidays['shifts'] if s['id'] == shift_id), None)
-            if shift and len(shift_assignments[shift_id]) < shift['slots']:
-                available.append(shift_id)
-        
-        # If they have available shifts, randomly pick one
-        if available:
-            selected_shift = random.choice(available)
-            assignments[reporter] = selected_shift
-            shift_assignments[selected_shift].append(reporter)
+    return jsonify(save_allocation(snapshot, params['mode'], seed, assignments, shift_assignments))
+
+@bp.route('/api/simulate', methods=['POST'])
+def simulate_allocation():
+    """Odds of each reporter getting a shift and each shift filling, over many allocations (ADMIN ONLY)
     
-    # Save assignments
-    save_json(ASSIGNMENTS_FILE, assignments)
+    Runs that won't finish within SIMULATION_TIME_BUDGET are handed to the
+    job queue instead: the answer is then 202 with the simulate job to poll
+    at its Location, as from /api/jobs.
+    """
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
     
-    # Lock signups
-    settings = get_settings()
-    settings['is_locked'] = True
-    save_json(SETTINGS_FILE, settings)
+    try:
+        params = simulation_params(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'success': True,
-        'assignments': assignments,
-        'shift_assignments': shift_assignments
-    })
+    # Same signups and parameters give the same answer, so reuse it until signups change
+    snapshot = snapshots.current()
+    version = ((snapshot.versions['signups'], snapshot.versions['holidays']),
+               params['mode'], params['trials'], params['seed'])
+    try:
+        result = render_cache.get('simulation', version, lambda: simulation.simulate(
+            snapshot['signups'], snapshot['holidays']['shifts'], partial=False, **params))
+    except simulation.OverBudget:
+        # Rather than answer with fewer trials than were asked for
+        job, _ = submit_job('simulate', params)
+        return job_accepted(job)
+    return jsonify(result)
 
-@app.route('/api/reset-system', methods=['POST'])
+@bp.route('/api/reset-system', methods=['POST'])
 def reset_system():
     if not session.get('is_manager'):
         return jsonify({'error': 'Unauthorized'}), 403
@@ -321,21 +692,136 @@ def reset_system():
     if confirmation != 'RESET':
         return jsonify({'error': 'Invalid confirmation'}), 400
     
+    new_season = data.get('season')
+    if new_season is not None and not valid_season(new_season):
+        return jsonify({'error': 'Invalid season name'}), 400
+    
     try:
-        # Reset signups and assignments
-        save_json(SIGNUPS_FILE, {})
-        save_json(ASSIGNMENTS_FILE, {})
+        # Freeze the finished season before clearing it
+        snapshot = snapshots.current()
+        settings = snapshot['settings']
+        signups = snapshot['signups']
+        assignments = snapshot['assignments']
+        archived = None
+        if any(signups.values()) or assignments:
+            holidays = snapshot['holidays']
+            names = {username: reporter.get('name', username)
+                     for username, reporter in snapshot['reporters'].items() if not reporter.get('is_manager')}
+            archived = season_archive.archive(season_id(settings, holidays['shifts']), thaw(holidays),
+                                              thaw(signups), thaw(assignments), thaw(settings), names)
         
-        # Unlock system
-        settings = get_settings()
-        settings['is_locked'] = False
-        save_json(SETTINGS_FILE, settings)
+        with snapshots.writing():
+            # Reset signups and assignments
+            store.reset_season()
+            
+            # Unlock system; the new season is named after its shifts unless given a name
+            store.put_settings({'is_locked': False, 'season': new_season, 'last_allocation': None})
+        session.pop('season', None)
+        event_bus.publish('reset', {'archived_season': archived})
         
-        return jsonify({'success': True, 'message': 'System reset successfully'})
+        message = 'System reset successfully'
+        if archived:
+            message += f' (previous season archived as {archived})'
+        return jsonify({'success': True, 'message': message, 'archived_season': archived})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/change-password', methods=['POST'])
+def wsgi_stream_limit():
+    """Streams this worker may hold open in request threads"""
+    if WSGI_THREADS is None:
+        return EVENT_STREAMS  # e.g. the Flask dev server: a thread per request
+    # Leave at least half the threads for ordinary requests
+    return min(EVENT_STREAMS, WSGI_THREADS // 2)
+
+@bp.route('/api/events')
+def live_events():
+    """Server-Sent Events stream of dashboard updates (ADMIN ONLY)
+
+    Starts with a `snapshot` of live_counts(), then sends `signups` (changed
+    shift_interest counts and submitted_count), `allocation` and `reset`
+    events as they happen, with a comment line every EVENT_HEARTBEAT seconds
+    so proxies keep the connection open.
+    """
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    # A sync worker streaming would serve nobody else; so would a full thread pool.
+    # asgi.py waits for events on its event loop instead of in a thread.
+    if request.environ.get('holiday.asgi'):
+        hold_open = event_bus.subscriber_count() < ASYNC_EVENT_STREAMS
+    else:
+        hold_open = request.environ.get('wsgi.multithread') and event_bus.subscriber_count() < wsgi_stream_limit()
+    subscription = event_bus.subscribe() if hold_open else None
+    
+    # Passed through as is, so asgi.py gets the EventStream to iterate asynchronously
+    stream = EventStream(event_bus, subscription, live_counts, EVENT_HEARTBEAT, EVENT_RETRY_MS)
+    response = current_app.response_class(stream, mimetype='text/event-stream', direct_passthrough=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+@bp.route('/api/seasons')
+def list_seasons():
+    """The active season and the archived ones (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    shifts = get_holidays()['shifts']
+    return jsonify({
+        'active': {'season': season_id(get_settings(), shifts), 'desk': DESK, 'shifts': len(shifts)},
+        'archived': season_archive.list(),
+        'viewing': session.get('season'),
+    })
+
+@bp.route('/api/seasons/<season>')
+def get_season(season):
+    """An archived season's shifts, signups and assignments (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    archived = season_archive.load(season)
+    if archived is None:
+        return jsonify({'error': f"No archived season '{season}'"}), 404
+    return jsonify(archived)
+
+@bp.route('/api/seasons/view', methods=['POST'])
+def view_season():
+    """Switch the manager dashboard to an archived season, or back with null (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    season = (request.get_json(silent=True) or {}).get('season')
+    if season is None:
+        session.pop('season', None)
+    elif season_archive.exists(season):
+        session['season'] = season
+    else:
+        return jsonify({'error': f"No archived season '{season}'"}), 404
+    return jsonify({'success': True, 'viewing': season})
+
+@bp.route('/api/signups/history')
+def signups_history():
+    """Signups/assignments as of a point in time, or one reporter's signup events (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if STORAGE_BACKEND != 'journal':
+        return jsonify({'error': 'History requires STORAGE_BACKEND=journal'}), 400
+    
+    username = request.args.get('username')
+    if username:
+        events = [e for e in store.journal.events()
+                  if e.get('username') == username or e['type'] in ('reset', 'replace')]
+        return jsonify({'username': username, 'events': events})
+    
+    try:
+        when = parse_time(request.args.get('at', ''))
+    except ValueError:
+        return jsonify({'error': 'Pass ?at=YYYY-MM-DD[THH:MM:SS] or ?username='}), 400
+    
+    return jsonify(store.journal.state_at(when))
+
+@bp.route('/api/change-password', methods=['POST'])
 def change_password():
     if 'username' not in session:
         return jsonify({'error': 'Unauthorized'}), 403
@@ -350,168 +836,293 @@ def change_password():
     username = session['username']
     reporters = get_reporters()
     
-    # Verify current password
-    if not check_password_hash(reporters[username]['password'], current_password):
-        return jsonify({'error': 'Current password is incorrect'}), 401
+    try:
+        # Verify current password
+        if not password_pool.verify(reporters[username]['password'], current_password):
+            return jsonify({'error': 'Current password is incorrect'}), 401
+        
+        # Update password
+        reporter = thaw(reporters[username])
+        reporter['password'] = password_pool.hash(new_password)
+    except PasswordPoolBusy:
+        return server_busy()
     
-    # Update password
-    reporters[username]['password'] = generate_password_hash(new_password)
-    save_json(REPORTERS_FILE, reporters)
+    store.put_reporters({username: reporter})
     
     return jsonify({'success': True, 'message': 'Password changed successfully'})
 
-@app.route('/api/export-excel')
+@bp.route('/api/export-excel')
 def export_excel():
     if not session.get('is_manager'):
         return jsonify({'error': 'Unauthorized'}), 403
     
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        from io import BytesIO
-        
-        assignments = get_assignments()
-        reporters = get_reporters()
-        signups = get_signups()
-        holidays = get_holidays()
-        
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Holiday Shifts"
-        
-        # Title
-        ws['A1'] = 'Reuters Reporter Holiday Shifts 2025-2026'
-        ws['A1'].font = Font(size=16, bold=True)
-        ws.merge_cells('A1:G1')
-        
-        # Headers
-        headers = ['Holiday', 'Date', 'Time', 'Assigned Reporter(s)', 'Interest Count', 'Status', 'Capacity']
-        header_row = 3
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=header_row, column=col)
-            cell.value = header
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="2F5233", end_color="2F5233", fill_type="solid")
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Data
-        row = header_row + 1
-        for shift in holidays['shifts']:
-            shift_id = shift['id']
-            assigned = [r for r, s_id in assignments.items() if s_id == shift_id]
-            interested = sum(1 for reporter_shifts in signups.values() if shift_id in reporter_shifts)
-            
-            # Holiday
-            ws.cell(row=row, column=1).value = shift['holiday']
-            
-            # Date
-            ws.cell(row=row, column=2).value = shift['date']
-            
-            # Time
-            ws.cell(row=row, column=3).value = shift['time']
-            
-            # Assigned reporters
-            if assigned:
-                reporter_names = [reporters[r]['name'] for r in assigned]
-                ws.cell(row=row, column=4).value = ", ".join(reporter_names)
-            else:
-                ws.cell(row=row, column=4).value = "VACANT"
-                ws.cell(row=row, column=4).font = Font(color="FF0000", bold=True)
-            
-            # Interest count
-            ws.cell(row=row, column=5).value = interested
-            
-            # Status
-            filled = len(assigned)
-            total = shift['slots']
-            if filled >= total:
-                ws.cell(row=row, column=6).value = "FILLED"
-                ws.cell(row=row, column=6).fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-            else:
-                ws.cell(row=row, column=6).value = f"VACANT ({total - filled})"
-                ws.cell(row=row, column=6).fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-            
-            # Capacity
-            ws.cell(row=row, column=7).value = f"{filled}/{total}"
-            
-            row += 1
-        
-        # Reporter summary section
-        row += 2
-        ws.cell(row=row, column=1).value = "Reporter Summary"
-        ws.cell(row=row, column=1).font = Font(size=14, bold=True)
-        ws.merge_cells(f'A{row}:D{row}')
-        
-        row += 1
-        summary_headers = ['Reporter', 'Expressed Interest', 'Assigned Shift', 'Status']
-        for col, header in enumerate(summary_headers, start=1):
-            cell = ws.cell(row=row, column=col)
-            cell.value = header
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="2F5233", end_color="2F5233", fill_type="solid")
-        
-        row += 1
-        for rep_username, rep_data in reporters.items():
-            if rep_data.get('is_manager'):
-                continue
-            
-            ws.cell(row=row, column=1).value = rep_data['name']
-            
-            # Expressed interest
-            interested = len(signups.get(rep_username, []))
-            ws.cell(row=row, column=2).value = f"Yes ({interested} shifts)" if interested > 0 else "No"
-            
-            # Assigned shift
-            if rep_username in assignments:
-                shift_id = assignments[rep_username]
-                shift = next((s for s in holidays['shifts'] if s['id'] == shift_id), None)
-                if shift:
-                    ws.cell(row=row, column=3).value = f"{shift['holiday']} - {shift['time']}"
-                    ws.cell(row=row, column=4).value = "Assigned"
-                    ws.cell(row=row, column=4).fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-            else:
-                ws.cell(row=row, column=3).value = "None"
-                if interested > 0:
-                    ws.cell(row=row, column=4).value = "Interested but not assigned"
-                    ws.cell(row=row, column=4).fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-                else:
-                    ws.cell(row=row, column=4).value = "No interest"
-            
-            row += 1
+        # Built from one consistent snapshot; writes carry on meanwhile
+        snapshot = snapshots.current()
         
-        # Adjust column widths
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 12
-        ws.column_dimensions['C'].width = 20
-        ws.column_dimensions['D'].width = 30
-        ws.column_dimensions['E'].width = 15
-        ws.column_dimensions['F'].width = 15
-        ws.column_dimensions['G'].width = 10
+        def build():
+            with metrics.span('export_excel'):
+                data = export.build_workbook(snapshot['reporters'], snapshot['signups'],
+                                             snapshot['assignments'], snapshot['holidays']['shifts'],
+                                             interest_counts(snapshot))
+            return content_etag(data), data
         
-        # Save to BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
+        # Rebuilt only when the data changed; repeat downloads are served from cache
+        etag, data = render_cache.get('export_excel', snapshot.version, build)
         
         return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            BytesIO(data),
+            mimetype=export.XLSX_MIMETYPE,
             as_attachment=True,
-            download_name=f'holiday_shifts_{datetime.now().strftime("%Y%m%d")}.xlsx'
+            download_name=f'holiday_shifts_{datetime.now().strftime("%Y%m%d")}.xlsx',
+            etag=etag,
+            max_age=0
         )
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/upload-reporters-page')
+# Background jobs. prepare_* and finish_* run in the web worker, the
+# computation in between in the job runner's process pool.
+
+JOB_PARAMS = {'allocate': allocation_params, 'simulate': simulation_params, 'export': lambda data: {}}
+
+def prepare_allocation_job(job):
+    snapshot = snapshots.current()
+    # Without a seed, one fixed by the job id: a job run again gives the same allocation
+    seed = job['params']['seed']
+    if seed is None:
+        seed = int(job['id'][:8], 16)
+    return snapshot['signups'], snapshot['holidays']['shifts'], job['params']['mode'], seed
+
+def allocation_job(signups, shifts, mode, seed, progress):
+    progress(0.1, 'Allocating')
+    return allocation.allocate(signups, shifts, mode=mode, seed=seed)
+
+def finish_allocation_job(job, output):
+    assignments, shift_assignments, seed = output
+    return save_allocation(snapshots.current(), job['params']['mode'], seed,
+                           assignments, shift_assignments), None
+
+def prepare_export_job(job):
+    snapshot = snapshots.current()
+    # Only what the workbook shows goes to the pool (no password hashes)
+    reporters = {username: {'name': reporter['name'], 'is_manager': reporter.get('is_manager', False)}
+                 for username, reporter in snapshot['reporters'].items()}
+    return (reporters, snapshot['signups'], snapshot['assignments'], snapshot['holidays']['shifts'],
+            interest_counts(snapshot))
+
+def export_job(reporters, signups, assignments, shifts, counts, progress):
+    progress(0.1, 'Building workbook')
+    return export.build_workbook(reporters, signups, assignments, shifts, counts)
+
+def finish_export_job(job, data):
+    return {'bytes': len(data), 'etag': content_etag(data)}, data
+
+def prepare_simulation_job(job):
+    snapshot = snapshots.current()
+    params = job['params']
+    return (snapshot['signups'], snapshot['holidays']['shifts'], params['mode'], params['trials'],
+            params['seed'], JOB_SIMULATION_TIME_BUDGET)
+
+def simulation_job(signups, shifts, mode, trials, seed, time_budget, progress):
+    progress(0.0, 'Simulating')
+    # Progress is the share of trials done, kept below finish's 0.95
+    return simulation.simulate(signups, shifts, mode=mode, trials=trials, seed=seed, time_budget=time_budget,
+                               progress=lambda done: progress(0.9 * done, 'Simulating'))
+
+def finish_simulation_job(job, result):
+    return result, None
+
+def job_response(job):
+    job = dict(job)
+    if job['artifact']:
+        job['artifact_url'] = url_for('.job_artifact', job_id=job['id'])
+    del job['artifact']
+    return job
+
+def submit_job(kind, params, key=None):
+    """Queue a job (or find the one key started); returns (job, created)"""
+    if key is None:
+        # The same data and parameters give the same result (and a
+        # double-clicked Allocate runs once)
+        key = content_etag(repr((snapshots.current().version, params)))
+    return job_runner.submit(kind, params, key)
+
+def job_accepted(job, status=202):
+    response = jsonify(job_response(job))
+    response.status_code = status
+    response.headers['Location'] = url_for('.job_status', job_id=job['id'])
+    return response
+
+@bp.route('/api/jobs', methods=['GET', 'POST'])
+def background_jobs():
+    """Submit an allocation, export or simulation to run in the background, or
+    list recent jobs (ADMIN ONLY)
+    
+    POST {"kind": "allocate"|"export"|"simulate", "params": {...}} with the
+    parameters /api/allocate or /api/simulate take. Send an Idempotency-Key
+    header (or "idempotency_key") to make retries safe: a key that was used
+    before returns its job instead of starting another. Without one, the
+    same request on unchanged data returns the job it started. Only one
+    allocation is queued or running at a time (409 for another). Answers
+    202 with the job to poll at its url.
+    """
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if request.method == 'GET':
+        return jsonify({'counts': job_runner.queue.counts(),
+                        'jobs': [job_response(job) for job in job_runner.queue.list()]})
+    
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    if kind not in JOB_PARAMS:
+        return jsonify({'error': f"Job kind must be one of: {', '.join(JOB_PARAMS)}"}), 400
+    try:
+        params = JOB_PARAMS[kind](data.get('params') or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    try:
+        job, created = submit_job(kind, params, key)
+    except jobs.JobConflict as e:
+        return jsonify({'error': str(e)}), 409
+    return job_accepted(job, 202 if created else 200)
+
+@bp.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """A job's status and progress, and its result once done (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    job = job_runner.queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'No such job'}), 404
+    if job['status'] in ('queued', 'running'):
+        # Whichever worker is polled makes sure the queue is being worked on
+        job_runner.start()
+    return jsonify(job_response(job))
+
+@bp.route('/api/jobs/<job_id>/artifact')
+def job_artifact(job_id):
+    """Download the file a job made, e.g. an export's workbook (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    job = job_runner.queue.get(job_id)
+    path = job_runner.queue.artifact_path(job)
+    if path is None:
+        return jsonify({'error': 'No such artifact'}), 404
+    
+    # Stored as <job id>.<run>-<name>; the content type follows from the name
+    return send_file(path, as_attachment=True, download_name=job['artifact'].split('-', 1)[1], max_age=0)
+
+@bp.route('/api/cache-stats')
+def cache_stats():
+    """Data cache hit/miss counters for this worker (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(dict(store.stats(), render_cache=render_cache.stats(), snapshots=snapshots.stats()))
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    """Request and span metrics of all workers in Prometheus text format (ADMIN ONLY)"""
+    authorized = session.get('is_manager') or (
+        METRICS_TOKEN and hmac.compare_digest(request.headers.get('Authorization', ''),
+                                              f'Bearer {METRICS_TOKEN}'))
+    if not authorized:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    response = make_response(metrics.registry.render())
+    response.mimetype = 'text/plain'
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+@bp.route('/api/profiling', methods=['GET', 'POST', 'DELETE'])
+def profiling_settings():
+    """Start, stop or inspect request profiling and list its captures (ADMIN ONLY)
+    
+    POST {"rate": 0.1, "endpoints": ["/api/allocate"], "minutes": 15} profiles
+    that fraction of requests to those endpoints (rule paths or endpoint
+    names; all endpoints if none are given) in every worker until it expires
+    or is stopped with DELETE.
+    """
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            rate = float(data.get('rate', 1.0))
+            minutes = float(data.get('minutes', 15))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'rate and minutes must be numbers'}), 400
+        if not 0 < rate <= 1:
+            return jsonify({'error': 'rate must be between 0 and 1'}), 400
+        if not 0 < minutes <= profiling.MAX_MINUTES:
+            return jsonify({'error': f'minutes must be between 0 and {profiling.MAX_MINUTES}'}), 400
+        
+        endpoints = []
+        for name in data.get('endpoints') or []:
+            matches = {rule.endpoint for rule in current_app.url_map.iter_rules()
+                       if name in (rule.rule, rule.endpoint, rule.endpoint.partition('.')[2])}
+            if not matches:
+                return jsonify({'error': f'Unknown endpoint: {name}'}), 400
+            endpoints.extend(sorted(matches - set(endpoints)))
+        profiling.profiler.start(rate, endpoints, minutes)
+    elif request.method == 'DELETE':
+        profiling.profiler.stop()
+    
+    return jsonify({
+        'settings': profiling.profiler.settings(),
+        'captures': profiling.profiler.captures(),
+        'budget_bytes': profiling.profiler.budget,
+    })
+
+@bp.route('/api/profiles/<session_id>/<endpoint>')
+def download_profile(session_id, endpoint):
+    """One capture of all workers: ?format=collapsed (flamegraph) or pstats (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    fmt = request.args.get('format', 'collapsed')
+    if fmt not in profiling.FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(profiling.FORMATS)}"}), 400
+    data = profiling.profiler.merged(session_id, endpoint, fmt)
+    if data is None:
+        return jsonify({'error': 'No such capture'}), 404
+    
+    mimetype = 'text/plain' if fmt == 'collapsed' else 'application/octet-stream'
+    return send_file(BytesIO(data), mimetype=mimetype, as_attachment=True,
+                     download_name=f'{session_id}.{endpoint}.{fmt}')
+
+@bp.route('/api/password-stats')
+def password_stats():
+    """Password pool queue depth, rejections and latency histograms for this worker (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(password_pool.stats())
+
+@bp.route('/api/interest-index/check', methods=['POST'])
+def check_interest_index():
+    """Verify the shift interest index against signups, rebuilding it if needed (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(interest_index.check())
+
+@bp.route('/upload-reporters-page')
 def upload_reporters_page():
     """Upload entire reporters.json from weekend_reporter (ADMIN ONLY)"""
     if not session.get('is_manager'):
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     return render_template('upload_reporters.html')
 
-@app.route('/api/upload-reporters', methods=['POST'])
+@bp.route('/api/upload-reporters', methods=['POST'])
 def upload_reporters():
     """Upload reporters.json file directly (ADMIN ONLY)"""
     if not session.get('is_manager'):
@@ -524,8 +1135,8 @@ def upload_reporters():
         if not new_reporters:
             return jsonify({'error': 'No reporters data provided'}), 400
         
-        # Save to reporters file
-        save_json(REPORTERS_FILE, new_reporters)
+        # Save to reporters store
+        store.replace('reporters', new_reporters)
         
         # Verify it saved
         reloaded = get_reporters()
@@ -540,14 +1151,14 @@ def upload_reporters():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/sync-passwords-page')
+@bp.route('/sync-passwords-page')
 def sync_passwords_page():
     """Show password sync interface (ADMIN ONLY)"""
     if not session.get('is_manager'):
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     return render_template('sync_passwords.html')
 
-@app.route('/api/sync-passwords', methods=['POST'])
+@bp.route('/api/sync-passwords', methods=['POST'])
 def sync_passwords():
     """Sync passwords from weekend_reporter's reporters.json (ADMIN ONLY)"""
     if not session.get('is_manager'):
@@ -560,96 +1171,216 @@ def sync_passwords():
         if not weekend_reporters:
             return jsonify({'error': 'No reporters data provided'}), 400
         
-        # Load current holiday_reporter reporters
-        holiday_reporters = get_reporters()
-        
-        # Sync/add reporters from weekend_reporter to holiday_reporter
-        synced_count = 0
-        added_count = 0
-        for username, weekend_data in weekend_reporters.items():
-            if username == 'admin':
-                continue  # Skip admin account
-            
-            if username in holiday_reporters:
-                # Update existing reporter's password
-                holiday_reporters[username]['password'] = weekend_data['password']
-                synced_count += 1
-            else:
-                # Add new reporter
-                holiday_reporters[username] = {
-                    'name': weekend_data['name'],
-                    'is_manager': False,
-                    'password': weekend_data['password'],
-                    'email': weekend_data.get('email', '')
-                }
-                added_count += 1
+        dry_run = bool(data.get('dry_run'))
         
-        # Save updated reporters
-        save_json(REPORTERS_FILE, holiday_reporters)
+        # Only reporters whose password/name/email differ are written
+        changes, report = reporter_sync.diff_reporters(weekend_reporters, get_reporters())
+        if changes and not dry_run:
+            store.put_reporters(changes)
         
+        synced_count = len(report['updated'])
+        added_count = len(report['added'])
         return jsonify({
             'success': True,
-            'message': f'Synced {synced_count} passwords, added {added_count} new reporters',
+            'dry_run': dry_run,
+            'message': f'Synced {synced_count} changed reporters, added {added_count} new reporters',
             'synced_count': synced_count,
-            'added_count': added_count
+            'added_count': added_count,
+            'unchanged_count': report['unchanged'],
+            'changes': report
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/download-signups')
+@bp.route('/api/sync-reporters', methods=['GET', 'POST'])
+def sync_reporters_from_shared():
+    """Sync changed accounts from weekend_reporter's reporters.json on disk (ADMIN ONLY)
+    
+    GET shows the watcher status; POST {"dry_run": true} reports what would change.
+    """
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if request.method == 'GET':
+        return jsonify(reporter_watcher.status())
+    
+    data = request.get_json(silent=True) or {}
+    return jsonify(sync_reporters(dry_run=bool(data.get('dry_run'))))
+
+def download_response(chunks, mimetype, filename):
+    response = current_app.response_class(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@bp.route('/api/download-signups')
 def download_signups():
     """Download raw signups.json file (ADMIN ONLY)"""
     if not session.get('is_manager'):
         return jsonify({'error': 'Unauthorized'}), 403
     
-    try:
-        signups = get_signups()
-        
-        # Create JSON string with pretty formatting
-        json_str = json.dumps(signups, indent=2)
-        
-        # Create BytesIO object to send as file
-        from io import BytesIO
-        output = BytesIO(json_str.encode('utf-8'))
-        output.seek(0)
-        
-        return send_file(
-            output,
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=f'holiday_reporter_signups_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        )
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Streamed as it is encoded rather than built up in memory first
+    return download_response(
+        bulk.chunked(json.JSONEncoder(indent=2).iterencode(get_signups())),
+        'application/json',
+        f'holiday_reporter_signups_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
 
-@app.route('/api/download-assignments')
+@bp.route('/api/download-assignments')
 def download_assignments():
     """Download raw assignments.json file (ADMIN ONLY)"""
     if not session.get('is_manager'):
         return jsonify({'error': 'Unauthorized'}), 403
     
-    try:
-        assignments = get_assignments()
-        
-        # Create JSON string with pretty formatting
-        json_str = json.dumps(assignments, indent=2)
-        
-        # Create BytesIO object to send as file
-        from io import BytesIO
-        output = BytesIO(json_str.encode('utf-8'))
-        output.seek(0)
-        
-        return send_file(
-            output,
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=f'holiday_reporter_assignments_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        )
+    return download_response(
+        bulk.chunked(json.JSONEncoder(indent=2).iterencode(get_assignments())),
+        'application/json',
+        f'holiday_reporter_assignments_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+
+@bp.route('/api/export/<dataset>')
+def export_dataset(dataset):
+    """Stream signups or assignments as NDJSON or CSV, gzipped with ?gzip=1 (ADMIN ONLY)"""
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    if dataset not in bulk.COLUMNS:
+        return jsonify({'error': f"Unknown dataset '{dataset}'"}), 404
     
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in bulk.FORMATS:
+        return jsonify({'error': f"Format must be one of: {', '.join(bulk.FORMATS)}"}), 400
+    
+    # Loaded data is an immutable snapshot, so the generator can outlive the request
+    reporters = get_reporters()
+    if dataset == 'signups':
+        records = bulk.signup_records(get_signups(), reporters)
+    else:
+        records = bulk.assignment_records(get_assignments(), reporters)
+    chunks = bulk.chunked(bulk.encode(records, fmt, bulk.COLUMNS[dataset]))
+    filename = f'holiday_reporter_{dataset}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{fmt}'
+    if request.args.get('gzip') == '1':
+        return download_response(bulk.gzipped(chunks), 'application/gzip', filename + '.gz')
+    return download_response(chunks, bulk.MIMETYPES[fmt], filename)
+
+def feed_subject(feed):
+    return f"{DESK or ''}/{feed}"
+
+def feed_url(feed):
+    """Subscription URL of a calendar feed ('desk' or 'reporter:<username>')"""
+    token = ical.feed_token(CALENDAR_SECRET, feed_subject(feed))
+    if feed == 'desk':
+        return url_for('.desk_calendar', token=token, _external=True)
+    return url_for('.reporter_calendar', username=feed.partition(':')[2], token=token, _external=True)
+
+def calendar_response(feed):
+    """A feed, if the request's token is its token; 304 if the client has it"""
+    token = ical.feed_token(CALENDAR_SECRET, feed_subject(feed))
+    if not hmac.compare_digest(request.args.get('token', ''), token):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    # All feeds are rendered together, once per version of the data they show
+    # (signups come and go without touching them)
+    snapshot = snapshots.current()
+    version = tuple(snapshot.versions[name] for name in ('reporters', 'assignments', 'holidays'))
+    feeds = render_cache.get('calendar_feeds', version, lambda: ical.build_feeds(
+        snapshot['reporters'], snapshot['assignments'], snapshot['holidays']['shifts'],
+        feed_stamps, DESK, CALENDAR_TIMEZONE))
+    rendered = feeds.get(feed)
+    if rendered is None:
+        return jsonify({'error': 'No such calendar'}), 404
+    
+    response = make_response(rendered.body)
+    response.mimetype = ical.MIMETYPE
+    response.set_etag(rendered.etag)
+    response.last_modified = rendered.last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@bp.route('/calendar/desk.ics')
+def desk_calendar():
+    """Every shift and who is assigned to it, as an iCalendar feed (?token=)"""
+    return calendar_response('desk')
+
+@bp.route('/calendar/reporters/<username>.ics')
+def reporter_calendar(username):
+    """A reporter's assigned shift as an iCalendar feed (?token=)"""
+    return calendar_response(f'reporter:{username}')
+
+@bp.route('/api/calendar-links')
+def calendar_links():
+    """Calendar subscription URLs: a reporter's own, or for managers the
+    desk's and (with ?username=) any reporter's"""
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if not session.get('is_manager'):
+        return jsonify({'reporter': feed_url(f"reporter:{session['username']}")})
+    
+    links = {'desk': feed_url('desk')}
+    username = request.args.get('username')
+    if username:
+        if username not in get_reporters():
+            return jsonify({'error': f"Unknown reporter '{username}'"}), 404
+        links['reporter'] = feed_url(f'reporter:{username}')
+    return jsonify(links)
+
+@bp.route('/api/import/signups', methods=['POST'])
+def import_signups():
+    """Bulk-load signups from NDJSON or CSV, optionally gzipped (ADMIN ONLY)
+    
+    Send the file as the request body or as a `file` form upload. The format
+    comes from ?format=, else the file name or content type. Each reporter's
+    row replaces their signups; invalid rows are listed in `errors` and
+    skipped.
+    """
+    if not session.get('is_manager'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, fmt = upload.stream, bulk.format_for(upload.filename, upload.mimetype)
+    else:
+        stream, fmt = request.stream, bulk.format_for(None, request.mimetype)
+    fmt = request.args.get('format', fmt)
+    if fmt not in bulk.FORMATS:
+        return jsonify({'error': f"Format must be one of: {', '.join(bulk.FORMATS)}"}), 400
+    
+    usernames = frozenset(username for username, reporter in get_reporters().items()
+                          if not reporter.get('is_manager'))
+    shift_ids = frozenset(shift['id'] for shift in get_holidays()['shifts'])
+    # Batches go through the same group commit as individual submissions
+    result = bulk.import_signups(stream, fmt, usernames, shift_ids, signup_commits.submit)
+    return jsonify({'success': True, **result})
+
+@bp.cli.command('import-credentials')
+@click.option('--force', is_flag=True, help='Import even if the CSV has not changed')
+@click.option('--csv', 'csv_path', default=None, help='Path to reporter_credentials.csv')
+def import_credentials_command(force, csv_path):
+    """Merge changed rows of reporter_credentials.csv into the reporters store"""
+    csv_path = csv_path or find_credentials_csv()
+    if not csv_path:
+        print("No reporter_credentials.csv found")
+        return
+    result = credentials.import_credentials(csv_path, store, CREDENTIALS_STATE_FILE, force=force)
+    print(json.dumps(result, indent=2))
+
+@bp.cli.command('migrate-to-sqlite')
+def migrate_to_sqlite_command():
+    """Copy data/*.json into the SQLite store (skips datasets it already has)"""
+    target = SqliteStore(SQLITE_FILE, json_store)
+    migrated = copy_datasets(json_store, target, names=SqliteStore.TABLES)
+    print(f"Migrated: {', '.join(migrated) or 'nothing (already migrated)'}")
+
+@bp.cli.command('export-json')
+def export_json_command():
+    """Write the SQLite store back out to data/*.json"""
+    source = SqliteStore(SQLITE_FILE, json_store)
+    exported = copy_datasets(source, json_store, names=SqliteStore.TABLES, overwrite=True)
+    print(f"Exported: {', '.join(exported)}")
+
+@bp.cli.command('build-assets')
+def build_assets_command():
+    """Write the hashed, compressed CSS/JS bundles to assets/dist/"""
+    for name, hashed in asset_pipeline.build().items():
+        print(f"{name} -> {hashed}")
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
+    create_app().run(debug=True, port=5001)
@@ -0,0 +1,221 @@
+"""ASGI entry point: `uvicorn --factory asgi:create_app`.
+
+Runs the same Flask app as the WSGI entry point (gunicorn.conf.py), with an
+event loop in front of it. The views are unchanged and run in a pool of
+THREADS threads; what happens around them is done on the loop:
+
+* request bodies are read before a thread is taken (past SPOOL_SIZE they
+  are spooled to a temporary file, written from the thread pool)
+* response bodies are pulled from the view CHUNK_SIZE at a time in the
+  thread pool and sent at the client's pace, so a slow download holds a
+  coroutine, not a thread, while the client catches up
+* /api/events streams wait for events as coroutines (events.EventStream),
+  so idle dashboards cost a socket each rather than a thread
+
+CPU-bound work stays off the loop: views (Excel builds included) run in the
+thread pool and password hashing in the password process pool.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+THREADS = int(os.environ.get('ASGI_THREADS', 16))
+# Request bodies up to this size are kept in memory
+SPOOL_SIZE = 1024 * 1024
+# Response bytes gathered per trip to the thread pool
+CHUNK_SIZE = 64 * 1024
+
+
+def _read(iterator, size=CHUNK_SIZE):
+    """(up to about size bytes, whether there is more) from a WSGI body"""
+    parts, length = [], 0
+    for data in iterator:
+        parts.append(data)
+        length += len(data)
+        if length >= size:
+            return b''.join(parts), True
+    return b''.join(parts), False
+
+
+class AsgiApp:
+    """A WSGI app served over ASGI"""
+
+    def __init__(self, wsgi_app, threads=THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-view')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        body = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+        try:
+            size = await self.read_body(receive, body, loop)
+            if size is None:
+                return  # the client left mid-upload
+            environ = self.environ(scope, body, size)
+            response = {}
+
+            def start_response(status, headers, exc_info=None):
+                if exc_info and 'sent' in response:
+                    raise exc_info[1].with_traceback(exc_info[2])
+                response['status'] = int(status.split(' ', 1)[0])
+                response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                       for name, value in headers]
+                return response.setdefault('written', []).append
+
+            app_iter, iterator, data, more = await loop.run_in_executor(
+                self.executor, self.start, environ, start_response)
+            response['sent'] = True
+            await send({'type': 'http.response.start', 'status': response['status'],
+                        'headers': response['headers']})
+            data = b''.join(response.get('written', ())) + data
+            if iterator is None:
+                await self.send_async(app_iter, receive, send)
+            elif not more:
+                await send({'type': 'http.response.body', 'body': data})
+            else:
+                await self.send_sync(app_iter, iterator, data, receive, send, loop)
+        finally:
+            body.close()
+
+    def start(self, environ, start_response):
+        """Run the view; returns (body, iterator, first chunk, more to come).
+
+        The iterator is None for a body to iterate asynchronously. A body that
+        fits in one chunk is read and closed here, in the same trip.
+        """
+        app_iter = self.wsgi_app(environ, start_response)
+        if hasattr(app_iter, '__aiter__'):
+            return app_iter, None, b'', True
+        try:
+            iterator = iter(app_iter)
+            data, more = _read(iterator)
+        except BaseException:
+            self.close(app_iter)
+            raise
+        if not more:
+            self.close(app_iter)
+        return app_iter, iterator, data, more
+
+    @staticmethod
+    def close(app_iter):
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+    async def read_body(self, receive, body, loop):
+        """Read the request into body; returns its size, or None on disconnect"""
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            data = message.get('body', b'')
+            if data:
+                size += len(data)
+                if size > SPOOL_SIZE:
+                    await loop.run_in_executor(self.executor, body.write, data)
+                else:
+                    body.write(data)
+            if not message.get('more_body', False):
+                body.seek(0)
+                return size
+
+    @staticmethod
+    async def disconnected(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def send_sync(self, app_iter, iterator, data, receive, send, loop):
+        gone = asyncio.ensure_future(self.disconnected(receive))
+        try:
+            more = True
+            while more:
+                await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+                if gone.done():
+                    return
+                data, more = await loop.run_in_executor(self.executor, _read, iterator)
+            await send({'type': 'http.response.body', 'body': data})
+        finally:
+            gone.cancel()
+            await loop.run_in_executor(self.executor, self.close, app_iter)
+
+    async def send_async(self, app_iter, receive, send):
+        async def pump():
+            async for data in app_iter:
+                await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        sending = asyncio.ensure_future(pump())
+        gone = asyncio.ensure_future(self.disconnected(receive))
+        try:
+            await asyncio.wait((sending, gone), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (sending, gone):
+                task.cancel()
+            await asyncio.gather(sending, gone, return_exceptions=True)
+            self.close(app_iter)
+        if not sending.cancelled() and sending.exception() is not None:
+            raise sending.exception()
+
+    @staticmethod
+    def environ(scope, body, size):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        root_path = scope.get('root_path', '')
+        path = scope['path']
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            # WSGI carries the URL's UTF-8 bytes as latin-1 text
+            'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+            'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(size),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            # Lets /api/events hold streams open without a thread each
+            'holiday.asgi': True,
+        }
+        for name, value in scope.get('headers', ()):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_LENGTH':
+                continue  # the body has been read; size is what arrived
+            key = name if name == 'CONTENT_TYPE' else f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+
+def create_app(config=None, threads=THREADS):
+    """The ASGI app (config as for app.create_app)"""
+    return AsgiApp(app.create_app(config), threads)
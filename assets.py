@@ -0,0 +1,95 @@
+"""Static asset pipeline for the CSS/JS in assets/.
+
+build() copies every source file to assets/dist/ under a content-hashed name
+(manager_dashboard.css -> manager_dashboard.3f2a9c1b7e04.css) next to
+precompressed .gz and, if the brotli module is installed, .br variants, and
+writes manifest.json mapping source names to hashed ones. Templates link
+assets through asset_url(), so a changed file gets a new URL and the old one
+can be cached forever.
+
+Building is cheap and idempotent (files whose hash already exists are left
+alone), so the app runs it at startup; `flask --app app build-assets` runs
+it by hand.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+
+try:
+    import brotli
+except ImportError:  # optional - only gzip variants are built
+    brotli = None
+
+SOURCE_TYPES = ('.css', '.js')
+# (Content-Encoding, file suffix) in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _write(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+class AssetPipeline:
+
+    def __init__(self, source_dir, build_dir):
+        self.source_dir = source_dir
+        self.build_dir = build_dir
+        self.manifest_file = os.path.join(build_dir, 'manifest.json')
+        self.manifest = {}   # source name -> hashed name
+        self._served = {}    # hashed name -> source name
+
+    def build(self):
+        """Write hashed/compressed copies of every source; returns the manifest"""
+        os.makedirs(self.build_dir, exist_ok=True)
+        manifest = {}
+        for name in sorted(os.listdir(self.source_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext not in SOURCE_TYPES:
+                continue
+            with open(os.path.join(self.source_dir, name), 'rb') as f:
+                data = f.read()
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            path = os.path.join(self.build_dir, hashed)
+            if not os.path.exists(path):
+                _write(path + '.gz', gzip.compress(data, 9, mtime=0))
+                if brotli is not None:
+                    _write(path + '.br', brotli.compress(data, quality=11))
+                _write(path, data)  # last: its presence means the variants exist
+            manifest[name] = hashed
+
+        try:
+            with open(self.manifest_file) as f:
+                unchanged = json.load(f) == manifest
+        except (FileNotFoundError, ValueError):
+            unchanged = False
+        if not unchanged:
+            _write(self.manifest_file, json.dumps(manifest, indent=2).encode('utf-8'))
+        self.manifest = manifest
+        self._served = {hashed: name for name, hashed in manifest.items()}
+        return manifest
+
+    def hashed_name(self, name):
+        return self.manifest[name]
+
+    def resolve(self, hashed, accept_encodings):
+        """(path, mimetype, content encoding or None) for a hashed name, or None.
+
+        Only names in the manifest are served, so nothing else under the
+        build directory (or outside it) is reachable.
+        """
+        if hashed not in self._served:
+            return None
+        path = os.path.join(self.build_dir, hashed)
+        mimetype = mimetypes.guess_type(hashed)[0] or 'application/octet-stream'
+        for encoding, suffix in ENCODINGS:
+            if encoding in accept_encodings and os.path.exists(path + suffix):
+                return path + suffix, mimetype, encoding
+        return path, mimetype, None
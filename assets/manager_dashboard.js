@@ -0,0 +1,204 @@
+function openPasswordModal() {
+    document.getElementById('passwordModal').style.display = 'flex';
+    document.getElementById('passwordForm').reset();
+    document.getElementById('modalError').style.display = 'none';
+}
+
+function closePasswordModal() {
+    document.getElementById('passwordModal').style.display = 'none';
+}
+
+async function changePassword(event) {
+    event.preventDefault();
+
+    const currentPassword = document.getElementById('currentPassword').value;
+    const newPassword = document.getElementById('newPassword').value;
+    const confirmPassword = document.getElementById('confirmPassword').value;
+    const errorDiv = document.getElementById('modalError');
+
+    if (newPassword !== confirmPassword) {
+        errorDiv.textContent = 'New passwords do not match';
+        errorDiv.style.display = 'block';
+        return;
+    }
+
+    if (newPassword.length < 6) {
+        errorDiv.textContent = 'New password must be at least 6 characters';
+        errorDiv.style.display = 'block';
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/change-password', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                current_password: currentPassword,
+                new_password: newPassword
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            alert('Password changed successfully!');
+            closePasswordModal();
+        } else {
+            errorDiv.textContent = data.error || 'Failed to change password';
+            errorDiv.style.display = 'block';
+        }
+    } catch (error) {
+        errorDiv.textContent = 'An error occurred. Please try again.';
+        errorDiv.style.display = 'block';
+    }
+}
+
+// Runs a background job and resolves with it once finished. Retries reuse
+// the idempotency key, so a dropped response never starts a second run.
+async function runJob(kind, params) {
+    const key = (crypto.randomUUID && crypto.randomUUID()) || String(Date.now()) + Math.random();
+    let job = null;
+    for (let attempt = 0; job === null; attempt++) {
+        try {
+            const response = await fetch('/api/jobs', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': key,
+                },
+                body: JSON.stringify({kind: kind, params: params || {}})
+            });
+            job = await response.json();
+            if (!response.ok) {
+                throw new Error(job.error || 'Unknown error');
+            }
+        } catch (error) {
+            if (error instanceof TypeError && attempt < 3) {
+                job = null;  // network error: try again with the same key
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                continue;
+            }
+            throw error;
+        }
+    }
+    while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 500));
+        const response = await fetch('/api/jobs/' + job.id);
+        if (response.ok) {
+            job = await response.json();
+        }
+    }
+    if (job.status !== 'done') {
+        throw new Error(job.error || 'Job failed');
+    }
+    return job;
+}
+
+async function runAllocation() {
+    if (!confirm('Are you sure you want to run the allocation? This will randomly assign shifts to interested reporters and lock the system.')) {
+        return;
+    }
+
+    try {
+        await runJob('allocate');
+        alert('Allocation completed successfully! Assignments have been made.');
+        location.reload();
+    } catch (error) {
+        alert('Error running allocation: ' + error.message);
+        console.error(error);
+    }
+}
+
+async function exportExcel() {
+    try {
+        const job = await runJob('export');
+        window.location.href = job.artifact_url;
+    } catch (error) {
+        alert('Error exporting: ' + error.message);
+        console.error(error);
+    }
+}
+
+async function viewSeason(season) {
+    await fetch('/api/seasons/view', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ season: season || null })
+    });
+    location.reload();
+}
+
+async function resetSystem() {
+    const confirmation = prompt('This will archive this season and clear all signups and assignments. Type RESET to confirm:');
+
+    if (confirmation !== 'RESET') {
+        alert('Reset cancelled.');
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/reset-system', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ confirmation: 'RESET' })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            alert(data.message + '. All signups and assignments have been cleared.');
+            location.reload();
+        } else {
+            alert('Error resetting system: ' + (data.error || 'Unknown error'));
+        }
+    } catch (error) {
+        alert('Error resetting system. Please try again.');
+        console.error(error);
+    }
+}
+
+// Live updates: interest counts change in place; an allocation or reset
+// reloads the page, since the assignments table changes wholesale.
+function updateCounts(data) {
+    for (const [shiftId, count] of Object.entries(data.shift_interest || {})) {
+        const row = document.querySelector(`tr[data-shift-id="${shiftId}"] .interest-count`);
+        if (row) {
+            row.textContent = count;
+        }
+    }
+    if (data.submitted_count !== undefined) {
+        document.querySelectorAll('.submitted-count').forEach(el => {
+            el.textContent = data.submitted_count;
+        });
+    }
+}
+
+function startLiveUpdates() {
+    if (document.body.dataset.live !== 'on' || !window.EventSource) {
+        return;
+    }
+    const source = new EventSource('/api/events');
+    source.addEventListener('snapshot', event => {
+        const data = JSON.parse(event.data);
+        if (String(data.assignment_count) !== document.body.dataset.assignmentCount
+                || String(data.is_locked) !== document.body.dataset.locked) {
+            source.close();
+            location.reload();
+            return;
+        }
+        updateCounts(data);
+    });
+    source.addEventListener('signups', event => updateCounts(JSON.parse(event.data)));
+    ['allocation', 'reset'].forEach(type => source.addEventListener(type, () => {
+        source.close();
+        location.reload();
+    }));
+}
+
+document.addEventListener('DOMContentLoaded', startLiveUpdates);
@@ -0,0 +1,11 @@
+"""Benchmarks and load tests for the holiday shift app.
+
+Run from the repository root:
+
+    python -m benchmarks.generate /tmp/bench-data --reporters 5000 --shifts 300
+    python -m benchmarks.micro                 # compare against baseline.json
+    python -m benchmarks.load --clients 50     # signup storm via the test client
+
+All of them work on a generated dataset in a scratch directory, never on
+data/.
+"""
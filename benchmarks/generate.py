@@ -0,0 +1,141 @@
+"""Synthetic reporters.json / holidays.json / signups.json at any scale.
+
+The data has the shape of a real season: holidays with a handful of shifts
+each, most shifts with 1-3 slots, and signups skewed towards the popular
+shifts (Zipf-like), with some reporters not signing up at all.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import passwords
+
+PASSWORD = 'benchmark'
+ADMIN_PASSWORD = 'admin123'
+
+HOLIDAY_NAMES = [
+    'Thanksgiving', 'Christmas Eve', 'Christmas', "New Year's Eve", "New Year's Day",
+    'MLK Day', "Presidents' Day", 'Memorial Day', 'Juneteenth', 'Independence Day',
+    'Labor Day', 'Columbus Day', "Veterans Day",
+]
+SHIFT_TIMES = ['6:00 AM - 2:00 PM', '8:00 AM - 4:00 PM', '3:00 PM - 10:00 PM',
+               '10:00 PM - 6:00 AM']
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Jamie', 'Robin',
+               'Avery', 'Quinn', 'Riley', 'Drew', 'Kim', 'Lee', 'Noor', 'Ana']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Okafor', 'Muller', 'Rossi', 'Tanaka', 'Silva',
+              'Novak', 'Kaur', 'Haddad', 'Jensen', 'Dubois', 'Ivanova', 'Park', 'Byrne']
+
+
+def make_holidays(n_shifts=300, rng=None):
+    """holidays.json contents with n_shifts shifts"""
+    rng = rng or random.Random(0)
+    shifts = []
+    day = date(2025, 11, 27)
+    holiday = 0
+    while len(shifts) < n_shifts:
+        name = HOLIDAY_NAMES[holiday % len(HOLIDAY_NAMES)]
+        if holiday >= len(HOLIDAY_NAMES):
+            name = f'{name} ({holiday // len(HOLIDAY_NAMES) + 1})'
+        for time in SHIFT_TIMES[:rng.randint(2, len(SHIFT_TIMES))]:
+            if len(shifts) == n_shifts:
+                break
+            shifts.append({
+                'id': len(shifts),
+                'date': day.isoformat(),
+                'holiday': name,
+                'time': time,
+                'slots': rng.choice((1, 2, 2, 2, 3)),
+            })
+        day += timedelta(days=rng.randint(3, 30))
+        holiday += 1
+    return {'shifts': shifts}
+
+
+def make_reporters(n_reporters=5000, rng=None):
+    """reporters.json contents: admin plus rep0000... (password PASSWORD)
+
+    Hashing thousands of passwords would take minutes, so every reporter
+    shares one hash made with the app's current hash method.
+    """
+    rng = rng or random.Random(0)
+    pwhash = generate_password_hash(PASSWORD, passwords.HASH_METHOD)
+    width = len(str(max(n_reporters - 1, 0)))
+    reporters = {
+        'admin': {'name': 'Admin', 'is_manager': True,
+                  'password': generate_password_hash(ADMIN_PASSWORD, passwords.HASH_METHOD)},
+    }
+    for i in range(n_reporters):
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        username = f'rep{i:0{width}d}'
+        reporters[username] = {
+            'name': name,
+            'is_manager': False,
+            'password': pwhash,
+            'email': f'{username}@example.com',
+        }
+    return reporters
+
+
+def make_signups(reporters, holidays, participation=0.6, max_picks=6, rng=None):
+    """signups.json contents: shift ids per reporter, skewed to popular shifts"""
+    rng = rng or random.Random(0)
+    shift_ids = [shift['id'] for shift in holidays['shifts']]
+    popularity = list(shift_ids)
+    rng.shuffle(popularity)
+    weights = [1.0 / (rank + 1) for rank in range(len(popularity))]
+    signups = {}
+    for username, reporter in reporters.items():
+        if reporter.get('is_manager') or rng.random() >= participation:
+            continue
+        picks = set()
+        for _ in range(rng.randint(1, max_picks)):
+            picks.update(rng.choices(popularity, weights))
+        signups[username] = sorted(picks)
+    return signups
+
+
+def make_dataset(n_reporters=5000, n_shifts=300, participation=0.6, seed=0):
+    rng = random.Random(seed)
+    holidays = make_holidays(n_shifts, rng)
+    reporters = make_reporters(n_reporters, rng)
+    signups = make_signups(reporters, holidays, participation, rng=rng)
+    return {
+        'reporters': reporters,
+        'holidays': holidays,
+        'signups': signups,
+        'settings': {'is_locked': False},
+        'assignments': {},
+    }
+
+
+def write_dataset(data_dir, dataset):
+    """Write each dataset as data_dir/<name>.json, the layout the app reads"""
+    os.makedirs(data_dir, exist_ok=True)
+    for name, data in dataset.items():
+        with open(os.path.join(data_dir, f'{name}.json'), 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('data_dir')
+    parser.add_argument('--reporters', type=int, default=5000)
+    parser.add_argument('--shifts', type=int, default=300)
+    parser.add_argument('--participation', type=float, default=0.6)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = make_dataset(args.reporters, args.shifts, args.participation, args.seed)
+    write_dataset(args.data_dir, dataset)
+    print(f"Wrote {len(dataset['reporters'])} reporters, {len(dataset['holidays']['shifts'])} shifts "
+          f"and {len(dataset['signups'])} signups to {args.data_dir} "
+          f"(password '{PASSWORD}', admin '{ADMIN_PASSWORD}')")
+
+
+if __name__ == '__main__':
+    main()
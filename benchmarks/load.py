@@ -0,0 +1,231 @@
+"""Signup-storm load driver.
+
+Each client logs in as its own reporter, waits until every client is ready
+(the deadline spike), then POSTs its signups --requests times with a
+different shift list each time. Afterwards the stored signups are checked
+against each client's last POST: any mismatch is a lost update.
+
+Targets:
+* default           - the Flask test client, one thread per client, in-process
+* --gunicorn N      - a local gunicorn with N workers on the generated dataset
+* --url URL         - an already running server on a dataset made by
+                      benchmarks.generate with the same options (its
+                      signups are overwritten!)
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks import generate
+from benchmarks.results import add_baseline_arguments, report, summarize_ms
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestClientSession:
+    """Requests through the Flask test client of an in-process app"""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, payload=None):
+        response = self.client.open(path, method=method, json=payload)
+        # Read the whole body (not just JSON), as HttpSession does
+        try:
+            return response.status_code, json.loads(response.get_data())
+        except ValueError:
+            return response.status_code, None
+
+
+class HttpSession:
+    """Requests over HTTP with a per-client cookie jar"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        try:
+            return status, json.loads(body)
+        except ValueError:
+            return status, None
+
+
+def login(session, username, password, attempts=20):
+    """Log in, retrying while the password pool answers 503"""
+    for _ in range(attempts):
+        status, _ = session.request('POST', '/login', {'username': username, 'password': password})
+        if status == 200:
+            return
+        if status != 503:
+            break
+        time.sleep(0.5)
+    raise RuntimeError(f'Login failed for {username} (HTTP {status})')
+
+
+def run_storm(new_session, usernames, shift_ids, n_requests, seed=0):
+    """Run the storm; returns (latencies in seconds, errors, wall time, last lists)"""
+    latencies, errors = [], []
+    last_posted = {}
+    lock = threading.Lock()
+    ready = threading.Barrier(len(usernames) + 1)
+
+    def client(index, username):
+        rng = random.Random(seed * 100003 + index)
+        session = new_session()
+        try:
+            login(session, username, generate.PASSWORD)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            ready.wait()
+            return
+        ready.wait()
+        mine = []
+        for _ in range(n_requests):
+            picks = sorted(rng.sample(shift_ids, rng.randint(1, min(6, len(shift_ids)))))
+            started = time.perf_counter()
+            status, _ = session.request('POST', '/api/signups', {'signups': picks})
+            mine.append(time.perf_counter() - started)
+            if status == 200:
+                with lock:
+                    last_posted[username] = picks
+            else:
+                with lock:
+                    errors.append(f'{username}: HTTP {status}')
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i, u)) for i, u in enumerate(usernames)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    return latencies, errors, time.perf_counter() - started, last_posted
+
+
+def count_lost_updates(session, last_posted):
+    login(session, 'admin', generate.ADMIN_PASSWORD)
+    status, stored = session.request('GET', '/api/signups')
+    if status != 200:
+        raise RuntimeError(f'Could not read back signups (HTTP {status})')
+    return sum(1 for username, picks in last_posted.items() if stored.get(username) != picks)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(data_dir, name, args):
+    """Run `python -m <name> <args>` on the dataset; args can use {port}"""
+    port = free_port()
+    env = dict(os.environ, HOLIDAY_DATA_DIR=data_dir, USE_SHARED_REPORTERS='0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', name] + [arg.format(port=port) for arg in args],
+        cwd=BASE_DIR, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{name} exited during startup')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{name} did not start within 30s')
+
+
+def start_gunicorn(data_dir, workers):
+    return start_server(data_dir, 'gunicorn', [
+        '-c', 'gunicorn.conf.py', '-w', str(workers), '-b', '127.0.0.1:{port}'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=20, help='signup POSTs per client')
+    parser.add_argument('--reporters', type=int, default=5000)
+    parser.add_argument('--shifts', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--gunicorn', type=int, metavar='WORKERS')
+    target.add_argument('--url')
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix='holiday-load-') as data_dir:
+        dataset = generate.make_dataset(args.reporters, args.shifts, seed=args.seed)
+        shift_ids = [shift['id'] for shift in dataset['holidays']['shifts']]
+        usernames = [u for u, r in dataset['reporters'].items() if not r['is_manager']]
+        usernames = usernames[:args.clients]
+
+        if args.url:
+            new_session = lambda: HttpSession(args.url)
+        else:
+            generate.write_dataset(data_dir, dataset)
+            if args.gunicorn:
+                server, url = start_gunicorn(data_dir, args.gunicorn)
+                new_session = lambda: HttpSession(url)
+            else:
+                from benchmarks.micro import import_app
+                flask_app = import_app(data_dir)[1]
+                new_session = lambda: TestClientSession(flask_app)
+
+        try:
+            latencies, errors, wall, last_posted = run_storm(
+                new_session, usernames, shift_ids, args.requests, args.seed)
+            lost = count_lost_updates(new_session(), last_posted)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    latency = summarize_ms(latencies)
+    for error in errors[:10]:
+        print(f'error: {error}')
+    results = {
+        'signup_post': {key: latency[key] for key in ('p50_ms', 'p95_ms', 'p99_ms')},
+        'storm': {
+            'requests': len(latencies),
+            'errors': len(errors),
+            'lost_updates': lost,
+            'wall_s': round(wall, 3),
+            'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        },
+    }
+    if args.url:
+        section = 'load[url]'
+    elif args.gunicorn:
+        section = f'load[gunicorn-{args.gunicorn}]'
+    else:
+        section = 'load[testclient]'
+    sys.exit(report(section, results, args, higher_is_better=('throughput_rps', 'requests')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""SignupMatrix against the list-of-ints signups layout.
+
+The app keeps the lists (see the README); SignupMatrix lives here only as
+the layout this measured.
+
+* memory       - bytes allocated to hold the signups (tracemalloc)
+* build        - SignupMatrix.from_signups()
+* membership   - LOOKUPS random "is reporter r signed up for shift s" checks
+* interest     - interest totals for every shift
+* reporters    - the reporters interested in every shift
+"""
+import argparse
+import json
+import random
+import sys
+import tracemalloc
+from collections import Counter
+
+from benchmarks import generate
+from benchmarks.results import add_baseline_arguments, report, time_calls
+from benchmarks.signup_matrix import SignupMatrix
+
+LOOKUPS = 100000
+
+
+def allocated(build):
+    """Bytes still allocated by what build() returns"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def run(dataset, repeat, seed):
+    shifts = dataset['holidays']['shifts']
+    text = json.dumps(dataset['signups'])
+    signups = json.loads(text)
+    matrix = SignupMatrix.from_signups(signups, shifts)
+
+    rng = random.Random(seed)
+    usernames = list(signups)
+    shift_ids = [shift['id'] for shift in shifts]
+    queries = [(rng.choice(usernames), rng.choice(shift_ids)) for _ in range(LOOKUPS)]
+
+    def lists_interest():
+        counts = Counter(shift_id for ids in signups.values() for shift_id in ids)
+        return {shift_id: counts.get(shift_id, 0) for shift_id in shift_ids}
+
+    def lists_reporters():
+        return {shift_id: [u for u, ids in signups.items() if shift_id in ids] for shift_id in shift_ids}
+
+    results = {
+        'memory[lists]': {'bytes': allocated(lambda: json.loads(text))},
+        'memory[matrix]': {'bytes': allocated(lambda: SignupMatrix.from_signups(signups, shifts))},
+        'build[matrix]': time_calls(lambda: SignupMatrix.from_signups(signups, shifts), repeat),
+        'membership[lists]': time_calls(
+            lambda: sum(1 for u, s in queries if s in signups[u]), repeat),
+        'membership[matrix]': time_calls(
+            lambda: sum(1 for u, s in queries if matrix.has(u, s)), repeat),
+        'interest[lists]': time_calls(lists_interest, repeat),
+        'interest[matrix]': time_calls(matrix.interest_counts, repeat),
+        'reporters[lists]': time_calls(lists_reporters, repeat),
+        'reporters[matrix]': time_calls(
+            lambda: {shift_id: matrix.reporters(shift_id) for shift_id in shift_ids}, repeat),
+    }
+    assert lists_interest() == matrix.interest_counts()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reporters', type=int, default=5000)
+    parser.add_argument('--shifts', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(generate.make_dataset(args.reporters, args.shifts, seed=args.seed),
+                  args.repeat, args.seed)
+    results = {name: {key: stats[key] for key in ('bytes', 'p50_ms', 'min_ms') if key in stats}
+               for name, stats in results.items()}
+    sys.exit(report('matrix', results, args))
+
+
+if __name__ == '__main__':
+    main()
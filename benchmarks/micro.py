@@ -0,0 +1,95 @@
+"""Micro-benchmarks of the hot paths on a generated dataset.
+
+* allocate_shifts  - allocation.allocate() in each mode
+* export_excel     - export.build_workbook()
+* dashboard_render - GET /manager/dashboard with the render cache cleared,
+                     and the cached (304) case
+* load_json / save_json - reading and atomically writing the data files
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from benchmarks import generate
+from benchmarks.results import add_baseline_arguments, report, time_calls
+
+
+def import_app(data_dir, preload=False):
+    """Import app.py and build the app against data_dir; returns (module, Flask app)"""
+    os.environ.setdefault('PASSWORD_WORKERS', '0')
+    import app
+    flask_app = app.create_app({'HOLIDAY_DATA_DIR': data_dir, 'USE_SHARED_REPORTERS': '0'},
+                               preload=preload)
+    return app, flask_app
+
+
+def run(data_dir, repeat):
+    app_module, flask_app = import_app(data_dir)
+    import allocation
+    import export
+    from storage import JsonFileCache, thaw
+
+    store = app_module.store
+    reporters = thaw(store.load('reporters'))
+    signups = thaw(store.load('signups'))
+    shifts = thaw(store.load('holidays'))['shifts']
+    results = {}
+
+    for mode in allocation.MODES:
+        results[f'allocate_shifts[{mode}]'] = time_calls(
+            lambda: allocation.allocate(signups, shifts, mode, seed=1), repeat)
+
+    assignments, _, _ = allocation.allocate(signups, shifts, 'optimal', seed=1)
+    interest_counts = app_module.interest_index.counts()
+    results['export_excel'] = time_calls(
+        lambda: export.build_workbook(reporters, signups, assignments, shifts, interest_counts),
+        repeat)
+
+    client = flask_app.test_client()
+    response = client.post('/login', json={'username': 'admin',
+                                           'password': generate.ADMIN_PASSWORD})
+    assert response.status_code == 200, response.data
+
+    def render():
+        assert client.get('/manager/dashboard').status_code == 200
+
+    results['dashboard_render'] = time_calls(render, repeat, setup=app_module.render_cache.clear)
+    etag = client.get('/manager/dashboard').headers['ETag']
+
+    def revalidate():
+        assert client.get('/manager/dashboard', headers={'If-None-Match': etag}).status_code == 304
+
+    results['dashboard_render[304]'] = time_calls(revalidate, repeat)
+
+    for name in ('reporters', 'signups'):
+        path = os.path.join(data_dir, f'{name}.json')
+        results[f'load_json[{name}]'] = time_calls(lambda: JsonFileCache().load(path), repeat)
+    cache = JsonFileCache()
+    signups_path = os.path.join(data_dir, 'signups.json')
+    results['load_json[cached]'] = time_calls(lambda: cache.load(signups_path), repeat)
+    results['save_json[signups]'] = time_calls(lambda: cache.save(signups_path, signups), repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reporters', type=int, default=5000)
+    parser.add_argument('--shifts', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='holiday-bench-') as data_dir:
+        generate.write_dataset(data_dir, generate.make_dataset(
+            args.reporters, args.shifts, seed=args.seed))
+        results = run(data_dir, args.repeat)
+    # Compare medians; min/max are too noisy to flag
+    results = {name: {'p50_ms': stats['p50_ms'], 'min_ms': stats['min_ms']}
+               for name, stats in results.items()}
+    sys.exit(report('micro', results, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""Mixed workload: signups, dashboards and downloads at the same time.
+
+Clients are split SIGNUP:DASHBOARD:DOWNLOAD (6:3:1 by default). Signup
+clients log in as a reporter and POST their signups, dashboard clients GET
+the manager dashboard, download clients stream the signups export - each
+--requests times, all at once. Meanwhile --streams live dashboards keep
+/api/events open. Reports throughput, p50/p95 per kind of request, and how
+many of the streams the server was still holding open at the end.
+
+Targets:
+* default       - the WSGI app through the Flask test client, in-process
+* --asgi        - asgi.py's app on an event loop in this process
+* --gunicorn N  - gunicorn.conf.py with N sync workers (WSGI)
+* --uvicorn N   - `uvicorn --factory asgi:create_app` with N workers
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from benchmarks import generate
+from benchmarks.load import HttpSession, TestClientSession, login, start_gunicorn, start_server
+from benchmarks.results import add_baseline_arguments, report, summarize_ms
+
+KINDS = ('signup', 'dashboard', 'download')
+STREAM_PATH = '/api/events'
+
+
+class AsgiSession:
+    """Requests straight to an ASGI app, from coroutines on its event loop"""
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+        self.cookies = {}
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        status, data = await self.call(method, path, body)
+        try:
+            return status, json.loads(data)
+        except ValueError:
+            return status, None
+
+    async def call(self, method, path, body=b'', gone=None, keep_body=True):
+        """(status, body) of one request; the client disconnects when gone is set"""
+        path, _, query = path.partition('?')
+        headers = [(b'host', b'localhost')]
+        if body:
+            headers += [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode('latin-1'))]
+        if self.cookies:
+            cookie = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+            headers.append((b'cookie', cookie.encode('latin-1')))
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                 'method': method, 'scheme': 'http', 'path': path, 'root_path': '',
+                 'query_string': query.encode('latin-1'), 'headers': headers,
+                 'client': ('127.0.0.1', 0), 'server': ('localhost', 80)}
+        gone = gone or asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await gone.wait()
+            return {'type': 'http.disconnect'}
+
+        status, parts = None, []
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                for name, value in message['headers']:
+                    if name == b'set-cookie':
+                        cookie = value.decode('latin-1').split(';', 1)[0]
+                        name, _, value = cookie.partition('=')
+                        self.cookies[name.strip()] = value
+            elif keep_body:
+                parts.append(message.get('body', b''))
+
+        await self.app(scope, receive, send)
+        return status, b''.join(parts)
+
+    def open_stream(self, path):
+        gone = asyncio.Event()
+        task = asyncio.ensure_future(self.call('GET', path, gone=gone, keep_body=False))
+        return Stream(lambda: not task.done(), gone.set)
+
+
+class Stream:
+    """An open /api/events request"""
+
+    def __init__(self, is_open, close):
+        self.is_open = is_open
+        self.close = close
+
+
+def read_in_thread(read, close):
+    """A Stream whose body read() drains in a background thread"""
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    return Stream(thread.is_alive, close)
+
+
+def open_stream(session, path):
+    if isinstance(session, HttpSession):
+        url = urllib.parse.urlsplit(session.base_url)
+        connection = http.client.HTTPConnection(url.hostname, url.port, timeout=300)
+        cookie = '; '.join(f'{c.name}={c.value}' for c in session.cookies)
+        connection.request('GET', path, headers={'Cookie': cookie})
+        response = connection.getresponse()
+
+        def read():
+            try:
+                while response.read1(65536):
+                    pass
+            except OSError:
+                pass
+        return read_in_thread(read, connection.close)
+    response = session.client.get(path, buffered=False)
+    return read_in_thread(lambda: list(response.response), response.close)
+
+
+def account(kind, username):
+    if kind == 'signup':
+        return username, generate.PASSWORD
+    return 'admin', generate.ADMIN_PASSWORD
+
+
+def next_request(kind, index, i, shift_ids):
+    """(method, path, payload) of a client's i-th request"""
+    if kind == 'signup':
+        start = (index + i) % len(shift_ids)
+        return 'POST', '/api/signups', {'signups': shift_ids[start:start + 3]}
+    if kind == 'dashboard':
+        return 'GET', '/manager/dashboard', None
+    return 'GET', '/api/export/signups?format=ndjson', None
+
+
+def client_kinds(n, weights):
+    pattern = [kind for kind, weight in zip(KINDS, weights) for _ in range(weight)]
+    return [pattern[i % len(pattern)] for i in range(n)]
+
+
+def run_mix(new_session, usernames, shift_ids, n_requests, n_streams, weights):
+    """Run every client at once, one thread each.
+
+    Returns (latencies per kind, errors, wall time, streams still open).
+    """
+    latencies = {kind: [] for kind in KINDS}
+    errors = []
+    lock = threading.Lock()
+    kinds = client_kinds(len(usernames), weights)
+    ready = threading.Barrier(len(usernames) + 1)
+
+    manager = new_session()
+    login(manager, *account('dashboard', None))
+    streams = [open_stream(manager, STREAM_PATH) for _ in range(n_streams)]
+
+    def client(index, username, kind):
+        session = new_session()
+        mine = []
+        try:
+            login(session, *account(kind, username))
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            ready.wait()
+            return
+        ready.wait()
+        for i in range(n_requests):
+            started = time.perf_counter()
+            status, _ = session.request(*next_request(kind, index, i, shift_ids))
+            mine.append(time.perf_counter() - started)
+            if status != 200:
+                with lock:
+                    errors.append(f'{kind}: HTTP {status}')
+        with lock:
+            latencies[kind].extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i, u, kinds[i])) for i, u in enumerate(usernames)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    still_open = sum(1 for stream in streams if stream.is_open())
+    for stream in streams:
+        stream.close()
+    return latencies, errors, wall, still_open
+
+
+async def run_mix_async(asgi_app, usernames, shift_ids, n_requests, n_streams, weights):
+    """run_mix() with the clients as coroutines on the app's event loop, as
+    an ASGI server runs its connections"""
+    latencies = {kind: [] for kind in KINDS}
+    errors = []
+    kinds = client_kinds(len(usernames), weights)
+
+    async def logged_in(kind, username, attempts=20):
+        session = AsgiSession(asgi_app)
+        username, password = account(kind, username)
+        for _ in range(attempts):
+            status, _ = await session.request('POST', '/login', {'username': username, 'password': password})
+            if status != 503:
+                break
+            await asyncio.sleep(0.5)
+        if status != 200:
+            raise RuntimeError(f'Login failed for {username} (HTTP {status})')
+        return session
+
+    manager = await logged_in('dashboard', None)
+    streams = [manager.open_stream(STREAM_PATH) for _ in range(n_streams)]
+    sessions = []
+    for kind, username in zip(kinds, usernames):
+        try:
+            sessions.append(await logged_in(kind, username))
+        except RuntimeError as e:
+            errors.append(str(e))
+            sessions.append(None)
+
+    async def client(index, session, kind):
+        for i in range(n_requests):
+            started = time.perf_counter()
+            status, _ = await session.request(*next_request(kind, index, i, shift_ids))
+            latencies[kind].append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(f'{kind}: HTTP {status}')
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i, session, kind)
+                           for i, (session, kind) in enumerate(zip(sessions, kinds)) if session))
+    wall = time.perf_counter() - started
+    still_open = sum(1 for stream in streams if stream.is_open())
+    for stream in streams:
+        stream.close()
+    await asyncio.sleep(0)
+    asgi_app.executor.shutdown(wait=False)
+    return latencies, errors, wall, still_open
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=10, help='requests per client')
+    parser.add_argument('--streams', type=int, default=50, help='live dashboards held open')
+    parser.add_argument('--mix', default='6:3:1', help='signup:dashboard:download clients')
+    parser.add_argument('--reporters', type=int, default=5000)
+    parser.add_argument('--shifts', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--asgi', action='store_true')
+    target.add_argument('--gunicorn', type=int, metavar='WORKERS')
+    target.add_argument('--uvicorn', type=int, metavar='WORKERS')
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    weights = [int(weight) for weight in args.mix.split(':')]
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix='holiday-mixed-') as data_dir:
+        dataset = generate.make_dataset(args.reporters, args.shifts, seed=args.seed)
+        generate.write_dataset(data_dir, dataset)
+        shift_ids = [shift['id'] for shift in dataset['holidays']['shifts']]
+        usernames = [u for u, r in dataset['reporters'].items() if not r['is_manager']][:args.clients]
+
+        if args.gunicorn:
+            server, url = start_gunicorn(data_dir, args.gunicorn)
+            new_session = lambda: HttpSession(url)
+        elif args.uvicorn:
+            server, url = start_server(data_dir, 'uvicorn', [
+                '--factory', 'asgi:create_app', '--workers', str(args.uvicorn),
+                '--port', '{port}', '--log-level', 'warning'])
+            new_session = lambda: HttpSession(url)
+        else:
+            from benchmarks.micro import import_app
+            flask_app = import_app(data_dir)[1]
+            new_session = lambda: TestClientSession(flask_app)
+
+        try:
+            if args.asgi:
+                import asgi
+                latencies, errors, wall, still_open = asyncio.run(run_mix_async(
+                    asgi.AsgiApp(flask_app), usernames, shift_ids, args.requests, args.streams, weights))
+            else:
+                latencies, errors, wall, still_open = run_mix(
+                    new_session, usernames, shift_ids, args.requests, args.streams, weights)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    for error in errors[:10]:
+        print(f'error: {error}')
+    total = sum(len(values) for values in latencies.values())
+    results = {
+        'mixed': {
+            'requests': total,
+            'errors': len(errors),
+            'wall_s': round(wall, 3),
+            'throughput_rps': round(total / wall, 1) if wall else 0.0,
+            'streams_open': still_open,
+        },
+    }
+    for kind, values in latencies.items():
+        if values:
+            stats = summarize_ms(values)
+            results[kind] = {'p50_ms': stats['p50_ms'], 'p95_ms': stats['p95_ms']}
+    if args.gunicorn:
+        section = f'mixed[gunicorn-{args.gunicorn}]'
+    elif args.uvicorn:
+        section = f'mixed[uvicorn-{args.uvicorn}]'
+    else:
+        section = 'mixed[asgi]' if args.asgi else 'mixed[testclient]'
+    sys.exit(report(section, results, args,
+                    higher_is_better=('throughput_rps', 'requests', 'streams_open')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Timing helpers and the baseline.json regression check"""
+import json
+import os
+import time
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# A metric regresses when it is this much worse than its baseline value
+TOLERANCE = 0.25
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize_ms(seconds):
+    """min/p50/p95/p99/max in milliseconds of a list of durations in seconds"""
+    values = sorted(s * 1000 for s in seconds)
+    return {
+        'count': len(values),
+        'min_ms': round(values[0], 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(values[-1], 3) if values else 0.0,
+    }
+
+
+def time_calls(func, repeat=5, setup=None):
+    """Run func repeat times (after one warm-up call) and summarize the timings"""
+    if setup:
+        setup()
+    func()
+    durations = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return summarize_ms(durations)
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(section, results, path=BASELINE_FILE):
+    """Replace one section ('micro', 'load') of the baseline file"""
+    baseline = load_baseline(path)
+    baseline[section] = results
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, higher_is_better=(), tolerance=TOLERANCE):
+    """Metrics worse than baseline by more than tolerance.
+
+    results and baseline map benchmark -> {metric: value}. Only the metrics
+    present in both are compared; returns a list of human-readable lines.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(name, {}).get(metric)
+            if not isinstance(base, (int, float)) or not isinstance(value, (int, float)):
+                continue
+            if metric in higher_is_better:
+                worse = value < base * (1 - tolerance)
+            elif base == 0:
+                worse = value > 0
+            else:
+                worse = value > base * (1 + tolerance)
+            if worse:
+                regressions.append(f'{name}.{metric}: {value} (baseline {base})')
+    return regressions
+
+
+def report(section, results, args, higher_is_better=()):
+    """Print results, then save or check them against the baseline; returns an exit code"""
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if args.save_baseline:
+        save_baseline(section, results)
+        print(f'Saved {section} baseline to {BASELINE_FILE}')
+        return 0
+
+    baseline = load_baseline().get(section)
+    if not baseline:
+        print(f'No {section} baseline yet (run with --save-baseline)')
+        return 0
+    regressions = compare(results, baseline, higher_is_better, args.tolerance)
+    for line in regressions:
+        print(f'REGRESSION {line}')
+    if not regressions:
+        print(f'No regressions against the {section} baseline (tolerance {args.tolerance:.0%})')
+    return 1 if regressions else 0
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='record these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed slowdown before a metric counts as a regression')
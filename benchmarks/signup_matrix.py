@@ -0,0 +1,128 @@
+"""Signups as a bit matrix: one row of bits per reporter, one bit per shift.
+
+Not used by the app - benchmarks/matrix.py compares it with the list layout.
+
+Shift ids are mapped to dense column indexes (in the order of the shifts
+list) and every row is row_bytes bytes of one shared bytearray, so a season
+of signups is a few bytes per reporter instead of a list plus an int object
+per interest. Membership is a single byte lookup, a row converts to an int
+mask for set operations (&, |, bit_count()), and per-shift interest totals
+are counted a byte column at a time.
+
+to_signups() gives back the JSON layout (username -> list of shift ids).
+Rows hold sets, so the lists come back in shift order, without duplicates
+and without ids that aren't in the shifts list.
+"""
+# bytes.translate() tables mapping a byte to its bit n (0 or 1)
+_BIT_TABLES = tuple(bytes(value >> bit & 1 for value in range(256)) for bit in range(8))
+
+
+class SignupRow:
+    """One reporter's signups, as a view into the matrix"""
+
+    __slots__ = ('matrix', 'offset')
+
+    def __init__(self, matrix, offset):
+        self.matrix = matrix
+        self.offset = offset
+
+    def __contains__(self, shift_id):
+        column = self.matrix.columns.get(shift_id)
+        if column is None:
+            return False
+        return self.matrix.buffer[self.offset + (column >> 3)] >> (column & 7) & 1 == 1
+
+    def mask(self):
+        m = self.matrix
+        return int.from_bytes(m.buffer[self.offset:self.offset + m.row_bytes], 'little')
+
+    def __len__(self):
+        return self.mask().bit_count()
+
+    def __iter__(self):
+        return iter(self.matrix.shift_ids_of(self.mask()))
+
+
+class SignupMatrix:
+
+    __slots__ = ('shift_ids', 'columns', 'usernames', 'rows', 'row_bytes', 'buffer')
+
+    def __init__(self, shift_ids, usernames):
+        self.shift_ids = tuple(shift_ids)
+        self.columns = {shift_id: i for i, shift_id in enumerate(self.shift_ids)}
+        self.usernames = tuple(usernames)
+        self.rows = {username: i for i, username in enumerate(self.usernames)}
+        self.row_bytes = max((len(self.shift_ids) + 7) // 8, 1)
+        self.buffer = bytearray(self.row_bytes * len(self.usernames))
+
+    @classmethod
+    def from_signups(cls, signups, shifts):
+        """Build from username -> shift id list; ids not in shifts are dropped"""
+        matrix = cls([shift['id'] for shift in shifts], signups)
+        columns, buffer, row_bytes = matrix.columns, matrix.buffer, matrix.row_bytes
+        for row, shift_ids in enumerate(signups.values()):
+            offset = row * row_bytes
+            for shift_id in shift_ids:
+                column = columns.get(shift_id)
+                if column is not None:
+                    buffer[offset + (column >> 3)] |= 1 << (column & 7)
+        return matrix
+
+    def to_signups(self):
+        return {username: list(self.row(username)) for username in self.usernames}
+
+    def row(self, username):
+        """The reporter's row; KeyError if they have none"""
+        return SignupRow(self, self.rows[username] * self.row_bytes)
+
+    def has(self, username, shift_id):
+        row = self.rows.get(username)
+        column = self.columns.get(shift_id)
+        if row is None or column is None:
+            return False
+        return self.buffer[row * self.row_bytes + (column >> 3)] >> (column & 7) & 1 == 1
+
+    def mask_of(self, shift_ids):
+        """Int mask with the bits of the given shift ids"""
+        mask = 0
+        for shift_id in shift_ids:
+            column = self.columns.get(shift_id)
+            if column is not None:
+                mask |= 1 << column
+        return mask
+
+    def shift_ids_of(self, mask):
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(self.shift_ids[low.bit_length() - 1])
+            mask ^= low
+        return ids
+
+    def reporters(self, shift_id):
+        """Usernames interested in a shift, in row order"""
+        column = self.columns.get(shift_id)
+        if column is None:
+            return []
+        byte, bit = column >> 3, 1 << (column & 7)
+        return [self.usernames[row] for row, value in
+                enumerate(self.buffer[byte::self.row_bytes]) if value & bit]
+
+    def interest_counts(self):
+        """shift_id -> number of reporters interested"""
+        counts = {}
+        for byte in range(self.row_bytes):
+            # Every row's byte number `byte`, reduced to one column's bit at a time
+            values = self.buffer[byte::self.row_bytes]
+            for bit, shift_id in enumerate(self.shift_ids[byte * 8:byte * 8 + 8]):
+                counts[shift_id] = values.translate(_BIT_TABLES[bit]).count(1)
+        return counts
+
+    def submitted_count(self):
+        """Reporters signed up for at least one shift"""
+        empty = bytes(self.row_bytes)
+        return sum(1 for offset in range(0, len(self.buffer), self.row_bytes)
+                   if self.buffer[offset:offset + self.row_bytes] != empty)
+
+    def nbytes(self):
+        return len(self.buffer)
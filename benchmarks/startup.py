@@ -0,0 +1,155 @@
+"""Worker cold start and memory, with and without preloading.
+
+* cold   - WORKERS separate processes each import and build the app (what
+           `gunicorn 'app:create_app()'` without preloading does)
+* preload - the app is built once (create_app(preload=True)) and WORKERS
+           workers are forked from it, as with gunicorn.conf.py
+
+For each worker: the time until it has served a manager dashboard and an
+Excel export, and its RSS, PSS (shared pages split between the processes
+sharing them) and private memory from /proc/<pid>/smaps_rollup (Linux).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+# Hash inline: a password pool's processes aren't part of a worker's memory
+# and would outlive the forked workers (before generate imports passwords)
+os.environ['PASSWORD_WORKERS'] = '0'
+
+from benchmarks import generate
+from benchmarks.micro import import_app
+from benchmarks.results import add_baseline_arguments, report
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory(pid):
+    """RSS, PSS and private memory of a process, in MB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        'private_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0),
+    }
+
+
+def serve(flask_app):
+    """What a worker does first: log in, render the dashboard, export"""
+    client = flask_app.test_client()
+    response = client.post('/login', json={'username': 'admin', 'password': generate.ADMIN_PASSWORD})
+    assert response.status_code == 200, response.data
+    assert client.get('/manager/dashboard').status_code == 200
+    assert client.get('/api/export-excel').status_code == 200
+
+
+def child(data_dir):
+    """A cold worker: build the app, serve, report ready, wait to be measured"""
+    _, flask_app = import_app(data_dir)
+    serve(flask_app)
+    print('ready', flush=True)
+    sys.stdin.read()
+
+
+def summarize(workers):
+    """workers: list of (seconds to ready, memory dict)"""
+    n = len(workers)
+    result = {'start_ms': round(sum(seconds for seconds, _ in workers) / n * 1000, 1)}
+    for key in ('rss_mb', 'pss_mb', 'private_mb'):
+        result[key] = round(sum(mem[key] for _, mem in workers) / n, 1)
+    return result
+
+
+def run_cold(data_dir, n):
+    processes, workers = [], []
+    for _ in range(n):
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, '-m', 'benchmarks.startup', '--child', data_dir],
+                                   cwd=BASE_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   text=True)
+        while process.stdout.readline().strip() != 'ready':
+            if process.poll() is not None:
+                raise RuntimeError('worker exited during startup')
+        processes.append((process, time.perf_counter() - started))
+    for process, seconds in processes:
+        workers.append((seconds, memory(process.pid)))
+    for process, _ in processes:
+        process.stdin.close()
+        process.wait()
+    return summarize(workers)
+
+
+def run_preload(data_dir, n):
+    app_module, flask_app = import_app(data_dir, preload=True)
+    children, workers = [], []
+    for _ in range(n):
+        ready_r, ready_w = os.pipe()
+        done_r, done_w = os.pipe()
+        started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                for fd in [ready_r, done_w] + [sibling for _, _, sibling in children]:
+                    os.close(fd)
+                app_module.start_worker()
+                serve(flask_app)
+                os.write(ready_w, b'r')
+                os.read(done_r, 1)
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+        os.close(ready_w)
+        os.close(done_r)
+        ready = os.read(ready_r, 1)
+        os.close(ready_r)
+        if not ready:
+            os.waitpid(pid, 0)
+            raise RuntimeError('worker exited during startup')
+        children.append((pid, time.perf_counter() - started, done_w))
+    for pid, seconds, _ in children:
+        workers.append((seconds, memory(pid)))
+    for pid, _, done_w in children:
+        os.write(done_w, b'x')
+        os.close(done_w)
+        os.waitpid(pid, 0)
+    return summarize(workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reporters', type=int, default=5000)
+    parser.add_argument('--shifts', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--child', metavar='DATA_DIR', help=argparse.SUPPRESS)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='holiday-bench-') as data_dir:
+        generate.write_dataset(data_dir, generate.make_dataset(
+            args.reporters, args.shifts, seed=args.seed))
+        # Cold first: preloading imports the app into this process
+        results = {
+            f'cold[{args.workers}]': run_cold(data_dir, args.workers),
+            f'preload[{args.workers}]': run_preload(data_dir, args.workers),
+        }
+    sys.exit(report('startup', results, args))
+
+
+if __name__ == '__main__':
+    main()
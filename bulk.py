@@ -0,0 +1,193 @@
+"""Streaming bulk export and import of signups and assignments.
+
+Exports are generators: records are encoded one at a time (NDJSON or CSV,
+optionally gzipped on the fly) and sent in CHUNK_SIZE pieces, so the
+response never exists as a whole in memory however big the roster is.
+
+Imports read the upload a line at a time, validate each record on its own
+and hand valid ones over in batches of IMPORT_BATCH. A bad row is reported
+(with its line number) and skipped; it doesn't stop the rest of the upload.
+
+Signup records are one per reporter: {"username", "name", "shift_ids"}, and
+in CSV shift_ids is space-separated ("3 7 12"). Assignment records are
+{"username", "name", "shift_id"}. name is informational and ignored on import.
+"""
+import csv
+import gzip
+import io
+import json
+import zlib
+
+FORMATS = ('ndjson', 'csv')
+MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+COLUMNS = {
+    'signups': ('username', 'name', 'shift_ids'),
+    'assignments': ('username', 'name', 'shift_id'),
+}
+CHUNK_SIZE = 64 * 1024
+IMPORT_BATCH = 500
+# Errors listed in an import's result; the count covers all of them
+MAX_REPORTED_ERRORS = 100
+
+
+def _name(reporters, username):
+    reporter = reporters.get(username)
+    return reporter.get('name', username) if reporter else username
+
+
+def signup_records(signups, reporters):
+    for username, shift_ids in signups.items():
+        yield {'username': username, 'name': _name(reporters, username), 'shift_ids': list(shift_ids)}
+
+
+def assignment_records(assignments, reporters):
+    for username, shift_id in assignments.items():
+        yield {'username': username, 'name': _name(reporters, username), 'shift_id': shift_id}
+
+
+def encode(records, fmt, columns):
+    """Records as lines of NDJSON or CSV (with a header row)"""
+    if fmt == 'ndjson':
+        for record in records:
+            yield json.dumps(record, separators=(',', ':')) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow([' '.join(map(str, value)) if isinstance(value, list) else value
+                         for value in (record[column] for column in columns)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def chunked(pieces, size=CHUNK_SIZE):
+    """Join small strings into UTF-8 chunks of about size bytes"""
+    parts, length = [], 0
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        parts.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(parts)
+            parts, length = [], 0
+    if parts:
+        yield b''.join(parts)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def format_for(filename, mimetype):
+    """Guess an upload's format from its file name or content type"""
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith('.csv') or mimetype == 'text/csv':
+        return 'csv'
+    return 'ndjson'
+
+
+def _text(stream):
+    binary = stream if hasattr(stream, 'peek') else io.BufferedReader(stream)
+    if binary.peek(2)[:2] == b'\x1f\x8b':
+        binary = gzip.GzipFile(fileobj=binary, mode='rb')
+    # Undecodable bytes become U+FFFD, so they fail their own row's validation
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def read_records(stream, fmt):
+    """(line number, record or None, error or None) for each row of an upload"""
+    text = _text(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, 'Too many columns'
+                continue
+            shift_ids = row.get('shift_ids')
+            record = {'username': row.get('username'),
+                      'shift_ids': shift_ids.split() if shift_ids is not None else None}
+            yield reader.line_num, record, None
+        return
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None, 'Not valid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield number, None, 'Expected a JSON object'
+            continue
+        yield number, record, None
+
+
+def validate_signup(record, usernames, shift_ids):
+    """(username, shift id list) for a signup record; raises ValueError if invalid"""
+    username = record.get('username')
+    if not username or not isinstance(username, str):
+        raise ValueError('Missing username')
+    if username not in usernames:
+        raise ValueError(f"Unknown reporter '{username}'")
+    values = record.get('shift_ids')
+    if not isinstance(values, list):
+        raise ValueError('shift_ids must be a list')
+    ids = []
+    for value in values:
+        # CSV gives strings; JSON must give numbers
+        if isinstance(value, str) and value.lstrip('-').isdigit():
+            value = int(value)
+        if not isinstance(value, int) or isinstance(value, bool) or value not in shift_ids:
+            raise ValueError(f'Unknown shift id {value!r}')
+        if value not in ids:
+            ids.append(value)
+    return username, ids
+
+
+def import_signups(stream, fmt, usernames, shift_ids, apply):
+    """Validate an upload and apply(changes) it in batches; returns a summary.
+
+    A later row for the same reporter replaces an earlier one, as it would
+    if they had been submitted one after another.
+    """
+    imported, errors, error_count = 0, [], 0
+    batch = {}
+
+    def error(line, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': line, 'error': message})
+
+    line = 0
+    try:
+        for line, record, problem in read_records(stream, fmt):
+            if problem is None:
+                try:
+                    username, ids = validate_signup(record, usernames, shift_ids)
+                except ValueError as e:
+                    problem = str(e)
+            if problem is not None:
+                error(line, problem)
+                continue
+            batch[username] = ids
+            imported += 1
+            if len(batch) >= IMPORT_BATCH:
+                apply(batch)
+                batch = {}
+    except (OSError, EOFError, zlib.error, csv.Error) as e:
+        # Nothing past here can be read; keep what was
+        error(line + 1, f'Unreadable upload: {e}')
+    if batch:
+        apply(batch)
+    return {'imported': imported, 'error_count': error_count, 'errors': errors}
@@ -0,0 +1,156 @@
+"""Import reporter accounts from reporter_credentials.csv.
+
+The import is an explicit step (``flask --app app import-credentials``, and
+automatically on first start when there are no reporters yet). It is skipped
+when the CSV is byte-for-byte the one imported last time. Otherwise only
+rows that changed since the last import are merged into the store, and the
+new passwords are hashed in parallel across cores.
+
+Passwords users changed in the app are never overwritten by an unchanged CSV
+row. The first import into an existing reporters store only records each
+row as the baseline and leaves existing accounts alone, as before.
+
+Per-row fingerprints are HMACs under a random per-install key, so the state
+file does not reveal the CSV passwords.
+"""
+import csv
+import hashlib
+import hmac
+import io
+import json
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash
+
+import passwords
+from storage import file_lock
+
+ENCODINGS = ('utf-8', 'latin-1', 'cp1252')
+
+ADMIN_ACCOUNT = ('admin', {'name': 'Admin', 'is_manager': True}, 'admin123')
+
+
+def read_rows(raw):
+    """Decode the CSV bytes (trying each encoding once) and return its rows"""
+    for encoding in ENCODINGS:
+        try:
+            text = raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        return list(csv.DictReader(io.StringIO(text)))
+    raise ValueError('Could not decode credentials CSV')
+
+
+def _hash_password(password):
+    return generate_password_hash(password, passwords.HASH_METHOD)
+
+
+def hash_passwords(plaintexts, workers=None):
+    """Hash a list of passwords, in parallel when there are enough of them"""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(plaintexts) < 4:
+        return [_hash_password(p) for p in plaintexts]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_hash_password, plaintexts,
+                             chunksize=max(1, len(plaintexts) // (workers * 4))))
+
+
+def _load_state(state_path):
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'key': secrets.token_hex(32), 'csv_sha256': None, 'rows': {}}
+
+
+def _save_state(state_path, state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def import_credentials(csv_path, store, state_path, force=False, workers=None):
+    """Merge changed CSV rows into store's reporters; returns a summary dict"""
+    with file_lock(state_path):
+        with open(csv_path, 'rb') as f:
+            raw = f.read()
+        fingerprint = hashlib.sha256(raw).hexdigest()
+        state = _load_state(state_path)
+        if not force and state['csv_sha256'] == fingerprint and store.exists('reporters'):
+            return {'skipped': True, 'reason': 'CSV unchanged since last import',
+                    'csv_sha256': fingerprint}
+
+        key = bytes.fromhex(state['key'])
+
+        def digest(*values):
+            return hmac.new(key, json.dumps(values).encode('utf-8'), hashlib.sha256).hexdigest()
+
+        has_reporters = store.exists('reporters')
+        current = store.load('reporters') if has_reporters else {}
+        previous_rows = state['rows']
+        rows = {}
+        profiles = {}      # username -> record without password
+        to_hash = {}       # username -> plaintext password
+        unchanged = 0
+
+        for row in read_rows(raw):
+            username = row['Username']
+            profile = {'name': row['Name'], 'is_manager': False, 'email': row['Email']}
+            row_digest = {'profile': digest(row['Name'], row['Email']),
+                          'password': digest(row['Password'])}
+            rows[username] = row_digest
+            before = previous_rows.get(username)
+
+            if username not in current:
+                profiles[username] = profile
+                to_hash[username] = row['Password']
+            elif before is None or before == row_digest:
+                # Unchanged row, or first import into existing data: keep the account
+                unchanged += 1
+            else:
+                profiles[username] = profile
+                if before.get('password') != row_digest['password']:
+                    to_hash[username] = row['Password']
+
+        admin_username, admin_profile, admin_password = ADMIN_ACCOUNT
+        if admin_username not in current and admin_username not in rows:
+            profiles[admin_username] = dict(admin_profile)
+            to_hash[admin_username] = admin_password
+
+        hashes = dict(zip(to_hash, hash_passwords(list(to_hash.values()), workers)))
+        changes = {}
+        for username, profile in profiles.items():
+            record = dict(current.get(username, {}))
+            record.update(profile)
+            if username in hashes:
+                record['password'] = hashes[username]
+            changes[username] = record
+
+        if changes or not has_reporters:
+            if has_reporters:
+                store.put_reporters(changes)
+            else:
+                store.replace('reporters', changes)
+
+        state.update({
+            'csv_path': csv_path,
+            'csv_sha256': fingerprint,
+            'imported_at': datetime.now().isoformat(timespec='seconds'),
+            'rows': rows,
+        })
+        _save_state(state_path, state)
+
+        return {
+            'skipped': False,
+            'csv_sha256': fingerprint,
+            'rows': len(rows),
+            'added': sum(1 for u in changes if u not in current),
+            'updated': sum(1 for u in changes if u in current),
+            'passwords_hashed': len(hashes),
+            'unchanged': unchanged,
+        }
@@ -0,0 +1,240 @@
+"""Live update feed for the manager dashboard (Server-Sent Events).
+
+Writes publish small events (signup counts changed, allocation ran, season
+reset) by appending a line to a shared feed file, so every gunicorn worker
+sees every event without a broker. Each worker runs one tailer thread that
+polls the file (a single stat() per POLL_INTERVAL) and hands new events to
+the streams open in that worker. The thread only runs while the worker
+has subscribers.
+
+Every subscriber has a bounded queue. A subscriber that falls more than
+QUEUE_SIZE events behind is not sent the backlog: its queue is dropped and
+it is marked as lagged, and the stream sends a fresh snapshot instead.
+
+EventStream is the response body. A WSGI server iterates it, blocking one
+thread per open stream in Subscription.get(); under asgi.py it is iterated
+asynchronously instead, and an idle stream is a coroutine waiting to be
+woken by the tailer thread.
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+
+from storage import file_lock
+
+POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 0.5))
+QUEUE_SIZE = 64
+# The feed is started afresh once it grows past this
+MAX_FEED_BYTES = 1024 * 1024
+
+
+class Subscription:
+
+    def __init__(self):
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.lagged = False
+        # Called from the tailer thread after new events (or a resync)
+        self.notify = None
+
+    def get(self, timeout):
+        """Next event, or None if there was none within timeout seconds"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_nowait(self):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def put(self, event):
+        if self.lagged:
+            return  # the stream's next snapshot covers it
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.lagged = True
+            while not self.queue.empty():
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+
+class EventBus:
+
+    def __init__(self, feed_file, poll_interval=POLL_INTERVAL):
+        self.feed_file = feed_file
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._position = (None, 0)  # (inode, offset) read up to
+
+    def publish(self, event_type, data):
+        line = json.dumps({'type': event_type, 'data': data, 'ts': time.time()},
+                          separators=(',', ':')) + '\n'
+        try:
+            with file_lock(self.feed_file):
+                if os.path.exists(self.feed_file) and os.path.getsize(self.feed_file) > MAX_FEED_BYTES:
+                    # Tailers notice the new inode and resync their subscribers
+                    open(self.feed_file + '.new', 'w').close()
+                    os.replace(self.feed_file + '.new', self.feed_file)
+                with open(self.feed_file, 'a') as f:
+                    f.write(line)
+        except OSError:
+            pass  # the write being announced already succeeded; dashboards resync later
+
+    def subscribe(self):
+        subscription = Subscription()
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # Start at the end of the feed; the stream begins with a snapshot
+                self._position = self._end_of_feed()
+                self._subscribers = set()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='event-feed', daemon=True)
+                self._thread.start()
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _end_of_feed(self):
+        try:
+            st = os.stat(self.feed_file)
+        except FileNotFoundError:
+            return (None, 0)
+        return (st.st_ino, st.st_size)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+                subscribers = list(self._subscribers)
+            events, resync = self._read_new()
+            if not events and not resync:
+                continue
+            for subscription in subscribers:
+                if resync:
+                    subscription.lagged = True
+                for event in events:
+                    subscription.put(event)
+                if subscription.notify is not None:
+                    subscription.notify()
+
+    def _read_new(self):
+        """Events appended since the last read, and whether some were missed"""
+        inode, offset = self._position
+        try:
+            with open(self.feed_file, 'rb') as f:
+                st = os.fstat(f.fileno())
+                resync = inode is not None and st.st_ino != inode
+                if resync or st.st_size < offset:
+                    offset = 0  # a new feed file; the end of the old one may be lost
+                if st.st_size == offset:
+                    self._position = (st.st_ino, offset)
+                    return [], resync
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], False
+        # Only whole lines; a line being written is picked up next time
+        complete = data[:data.rfind(b'\n') + 1]
+        self._position = (st.st_ino, offset + len(complete))
+        events = []
+        for line in complete.splitlines():
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events, resync
+
+
+def format_sse(event_type, data):
+    return f'event: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class EventStream:
+    """An /api/events response body: retry, snapshot, then events and heartbeats.
+
+    snapshot() gives the current state (the data of a `snapshot` event). With
+    no subscription it ends after the snapshot, and the browser reconnects
+    retry_ms later.
+    """
+
+    def __init__(self, bus, subscription, snapshot, heartbeat, retry_ms):
+        self.bus = bus
+        self.subscription = subscription
+        self.snapshot = snapshot
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+
+    def _next(self, event):
+        """The text to send for what the subscription gave (event or None)"""
+        if self.subscription.lagged:
+            # Fell too far behind (or missed events); start over from the current state
+            self.subscription.lagged = False
+            return None
+        if event is None:
+            return ': heartbeat\n\n'
+        return format_sse(event['type'], event['data'])
+
+    def __iter__(self):
+        yield f'retry: {self.retry_ms}\n'.encode('utf-8')
+        yield format_sse('snapshot', self.snapshot()).encode('utf-8')
+        while self.subscription is not None:
+            text = self._next(self.subscription.get(self.heartbeat))
+            if text is None:
+                text = format_sse('snapshot', self.snapshot())
+            yield text.encode('utf-8')
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+
+        def notify():
+            try:
+                loop.call_soon_threadsafe(woken.set)
+            except RuntimeError:
+                pass  # the loop has closed
+
+        if self.subscription is not None:
+            self.subscription.notify = notify
+        yield f'retry: {self.retry_ms}\n'.encode('utf-8')
+        # The snapshot reads the store; keep that off the event loop
+        yield format_sse('snapshot', await asyncio.to_thread(self.snapshot)).encode('utf-8')
+        while self.subscription is not None:
+            # Cleared before looking, so an event put after the look still wakes us
+            woken.clear()
+            event = self.subscription.get_nowait()
+            if event is None and not self.subscription.lagged:
+                try:
+                    await asyncio.wait_for(woken.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    continue
+            text = self._next(event)
+            if text is None:
+                text = format_sse('snapshot', await asyncio.to_thread(self.snapshot))
+            yield text.encode('utf-8')
+
+    def close(self):
+        if self.subscription is not None:
+            self.subscription.notify = None
+            self.bus.unsubscribe(self.subscription)
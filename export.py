@@ -0,0 +1,113 @@
+"""Excel export of the holiday shift assignments.
+
+Uses openpyxl's write-only (streaming) workbook, so rows go straight to the
+output instead of being held as cell objects, and a small set of named styles
+that every cell shares instead of per-cell Font/PatternFill objects. All the
+per-shift and per-reporter lookups are dict joins built once up front.
+"""
+from io import BytesIO
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+TITLE = 'Reuters Reporter Holiday Shifts 2025-2026'
+SHIFT_HEADERS = ['Holiday', 'Date', 'Time', 'Assigned Reporter(s)', 'Interest Count', 'Status', 'Capacity']
+SUMMARY_HEADERS = ['Reporter', 'Expressed Interest', 'Assigned Shift', 'Status']
+COLUMN_WIDTHS = {'A': 20, 'B': 12, 'C': 20, 'D': 30, 'E': 15, 'F': 15, 'G': 10}
+
+
+def _named_styles():
+    from copy import copy
+    from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+    from openpyxl.styles.fonts import DEFAULT_FONT
+
+    def fill(color):
+        return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+    return [
+        NamedStyle('title', font=Font(size=16, bold=True)),
+        NamedStyle('section', font=Font(size=14, bold=True)),
+        NamedStyle('header', font=Font(bold=True, color='FFFFFF'), fill=fill('2F5233'),
+                   alignment=Alignment(horizontal='center', vertical='center')),
+        NamedStyle('summary_header', font=Font(bold=True, color='FFFFFF'), fill=fill('2F5233')),
+        NamedStyle('vacant_text', font=Font(color='FF0000', bold=True)),
+        NamedStyle('filled', font=copy(DEFAULT_FONT), fill=fill('C6EFCE')),
+        NamedStyle('vacant', font=copy(DEFAULT_FONT), fill=fill('FFC7CE')),
+        NamedStyle('unassigned', font=copy(DEFAULT_FONT), fill=fill('FFEB9C')),
+    ]
+
+
+def build_workbook(reporters, signups, assignments, shifts, interest_counts):
+    """Render the export and return the .xlsx bytes"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    wb = Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+    ws = wb.create_sheet('Holiday Shifts')
+    for column, width in COLUMN_WIDTHS.items():
+        ws.column_dimensions[column].width = width
+
+    def cell(value, style=None):
+        c = WriteOnlyCell(ws, value=value)
+        if style:
+            c.style = style
+        return c
+
+    shifts_by_id = {shift['id']: shift for shift in shifts}
+    assigned_by_shift = {}
+    for username, shift_id in assignments.items():
+        assigned_by_shift.setdefault(shift_id, []).append(username)
+
+    # Title (row 1), blank row, headers (row 3)
+    ws.append([cell(TITLE, 'title')])
+    ws.merged_cells.add('A1:G1')
+    ws.append([])
+    ws.append([cell(header, 'header') for header in SHIFT_HEADERS])
+    row = 3
+
+    for shift in shifts:
+        assigned = assigned_by_shift.get(shift['id'], [])
+        filled = len(assigned)
+        total = shift['slots']
+        if assigned:
+            reporters_cell = cell(', '.join(reporters[r]['name'] for r in assigned))
+        else:
+            reporters_cell = cell('VACANT', 'vacant_text')
+        if filled >= total:
+            status_cell = cell('FILLED', 'filled')
+        else:
+            status_cell = cell(f'VACANT ({total - filled})', 'vacant')
+        ws.append([shift['holiday'], shift['date'], shift['time'], reporters_cell,
+                   interest_counts.get(shift['id'], 0), status_cell, f'{filled}/{total}'])
+        row += 1
+
+    # Reporter summary section
+    ws.append([])
+    ws.append([])
+    row += 3
+    ws.append([cell('Reporter Summary', 'section')])
+    ws.merged_cells.add(f'A{row}:D{row}')
+    ws.append([cell(header, 'summary_header') for header in SUMMARY_HEADERS])
+
+    for rep_username, rep_data in reporters.items():
+        if rep_data.get('is_manager'):
+            continue
+
+        interested = len(signups.get(rep_username, []))
+        values = [rep_data['name'], f'Yes ({interested} shifts)' if interested > 0 else 'No']
+        if rep_username in assignments:
+            shift = shifts_by_id.get(assignments[rep_username])
+            if shift:
+                values += [f"{shift['holiday']} - {shift['time']}", cell('Assigned', 'filled')]
+        else:
+            values.append('None')
+            if interested > 0:
+                values.append(cell('Interested but not assigned', 'unassigned'))
+            else:
+                values.append('No interest')
+        ws.append(values)
+
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
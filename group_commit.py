@@ -0,0 +1,93 @@
+"""Group commit of signup submissions.
+
+When many reporters press Save at once, each POST used to do its own locked
+read-modify-write of the signups (and its own fsync). Instead, every
+submission is dropped into a spool directory and then waits for the commit
+lock (a cross-process flock, so all gunicorn workers and threads share one
+commit stream). Whoever holds the lock writes *every* pending submission in
+a single store.put_signups() call - one durable write - and removes their
+spool files. A submission whose spool file is already gone when its turn
+comes was committed by someone else, so it returns straight away.
+
+submit() returns only once the submission's commit is durable. Spool files
+are only a hand-off between waiting requests and are not fsynced: after a
+crash, any left over belong to requests that were never acknowledged.
+
+While one commit is being written, new submissions queue up behind the lock
+and all go out in the next one, so batches grow with load on their own.
+SIGNUP_COMMIT_WINDOW_MS additionally holds each commit open that long to
+collect more.
+"""
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+
+import metrics
+from storage import file_lock
+
+WINDOW = float(os.environ.get('SIGNUP_COMMIT_WINDOW_MS', 0)) / 1000
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommit:
+
+    def __init__(self, put, spool_dir, on_commit=None, window=WINDOW):
+        self.put = put                # e.g. store.put_signups; returns a storage.Change
+        self.spool_dir = spool_dir
+        self.on_commit = on_commit    # called as on_commit(change, changes) after each commit
+        self.window = window
+        self._sequence = itertools.count()
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def submit(self, changes):
+        """Durably apply changes, together with any other pending submissions"""
+        started = time.perf_counter()
+        name = self._spool(changes)
+        with file_lock(self.spool_dir):
+            if os.path.exists(os.path.join(self.spool_dir, name)):
+                self._commit()
+        metrics.registry.observe('holiday_signup_commit_wait_seconds', {},
+                                 time.perf_counter() - started)
+
+    def _spool(self, changes):
+        # Names sort in arrival order; pid and sequence keep them unique
+        name = f'{time.time_ns():020d}-{os.getpid()}-{next(self._sequence)}.json'
+        fd, tmp_path = tempfile.mkstemp(dir=self.spool_dir, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(changes, f)
+        os.replace(tmp_path, os.path.join(self.spool_dir, name))
+        return name
+
+    def pending(self):
+        return sorted(name for name in os.listdir(self.spool_dir)
+                      if name.endswith('.json') and not name.startswith('.'))
+
+    def _commit(self):
+        if self.window:
+            time.sleep(self.window)
+        started = time.perf_counter()
+        names = self.pending()
+        batch = {}
+        for name in names:
+            try:
+                with open(os.path.join(self.spool_dir, name)) as f:
+                    batch.update(json.load(f))  # later submissions win
+            except ValueError:
+                pass  # torn by a crash; its request was never acknowledged
+        change = self.put(batch)
+        for name in names:
+            os.unlink(os.path.join(self.spool_dir, name))
+        if self.on_commit is not None:
+            # The batch is durable and its waiters will return success, so a
+            # failing follow-up (events, indexes) mustn't fail this request
+            try:
+                self.on_commit(change, batch)
+            except Exception:
+                logger.exception('on_commit failed after committing %d signups', len(batch))
+        metrics.registry.observe('holiday_signup_commit_batch_size', {}, len(names))
+        metrics.registry.observe('holiday_signup_commit_duration_seconds', {},
+                                 time.perf_counter() - started)
@@ -0,0 +1,17 @@
+"""gunicorn settings: `gunicorn -c gunicorn.conf.py`
+
+The app is built once in the master (preload_app) and the workers are forked
+from it, so they share its imported modules, loaded data and compiled
+templates copy-on-write instead of each paying the full cold start.
+post_fork does the per-worker part. Workers, bind address etc. still come
+from the usual command line flags or WEB_CONCURRENCY / PORT.
+"""
+
+wsgi_app = 'app:create_app(preload=True)'
+preload_app = True
+
+
+def post_fork(server, worker):
+    import app
+    # Live event streams are capped by the worker's threads (--threads)
+    app.start_worker(threads=server.cfg.threads)
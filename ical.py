@@ -0,0 +1,215 @@
+"""iCalendar (.ics) feeds of the holiday shift assignments.
+
+One feed per reporter (their assigned shift) and one for the desk (every
+shift and who works it). All of them are rendered together, once per data
+version, so calendar clients polling every few minutes are answered from
+memory - mostly with 304s.
+
+A feed's Last-Modified (and its events' DTSTAMP) is when its content last
+changed. FeedStamps keeps those times in a file, so every worker renders
+byte-identical feeds and sends the same strong ETag for them.
+
+Shift times like '8:00 AM - 4:00 PM' become floating local times (a shift
+ending before it starts ends the next day); other times become all-day
+events.
+"""
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from storage import file_lock, fsync_directory
+from views import content_etag
+
+MIMETYPE = 'text/calendar'
+PRODID = '-//Reuters//Holiday Shifts//EN'
+TIME_FORMAT = '%I:%M %p'
+
+
+def feed_token(secret, subject):
+    """The token that authorizes a feed URL"""
+    return hmac.new(secret.encode('utf-8'), subject.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+
+def load_secret(path):
+    """The token secret kept in path, generated (randomly, readable only by
+    us) the first time"""
+    with file_lock(path):
+        try:
+            with open(path) as f:
+                secret = f.read().strip()
+            if secret:
+                return secret
+        except FileNotFoundError:
+            pass
+        secret = secrets.token_hex(32)
+        directory = os.path.dirname(path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')  # mode 0600
+        with os.fdopen(fd, 'w') as f:
+            f.write(secret + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        fsync_directory(directory)
+    return secret
+
+
+def _escape(text):
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Split a content line into 75-octet lines (RFC 5545 3.1)"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Don't split a UTF-8 sequence
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(parts)
+
+
+def _utc(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def shift_times(shift):
+    """DTSTART/DTEND properties for a shift"""
+    day = datetime.strptime(shift['date'], '%Y-%m-%d')
+    try:
+        start, end = (datetime.strptime(part.strip(), TIME_FORMAT).time()
+                      for part in shift['time'].split('-'))
+    except (AttributeError, ValueError):
+        return [f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+                f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}"]
+    starts = datetime.combine(day, start)
+    ends = datetime.combine(day, end)
+    if ends <= starts:
+        ends += timedelta(days=1)
+    return [f'DTSTART:{starts:%Y%m%dT%H%M%S}', f'DTEND:{ends:%Y%m%dT%H%M%S}']
+
+
+def shift_event(shift, uid, summary, description):
+    """A VEVENT's properties, less DTSTAMP (added by render())"""
+    return [f'UID:{uid}', *shift_times(shift), f'SUMMARY:{_escape(summary)}',
+            f'DESCRIPTION:{_escape(description)}', 'TRANSP:OPAQUE']
+
+
+def render(name, events, stamp, tz=None):
+    """The .ics bytes of a calendar; stamp is when its content last changed"""
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+             'METHOD:PUBLISH', f'X-WR-CALNAME:{_escape(name)}']
+    if tz:
+        lines.append(f'X-WR-TIMEZONE:{tz}')
+    for event in events:
+        lines += ['BEGIN:VEVENT', f'DTSTAMP:{_utc(stamp)}', *event, 'END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(_fold(line) for line in lines) + '\r\n').encode('utf-8')
+
+
+def feed_events(reporters, assignments, shifts, desk=None):
+    """Events of every feed: {'desk': [...], 'reporter:<username>': [...]}.
+
+    Every reporter gets a feed, empty until they are assigned a shift.
+    """
+    domain = f"{desk or 'default'}.holiday-shifts"
+    shifts_by_id = {shift['id']: shift for shift in shifts}
+    assigned_by_shift = {}
+    for username, shift_id in assignments.items():
+        assigned_by_shift.setdefault(shift_id, []).append(username)
+
+    def name(username):
+        return reporters.get(username, {}).get('name', username)
+
+    feeds = {f'reporter:{username}': [] for username, reporter in reporters.items()
+             if not reporter.get('is_manager')}
+    for username, shift_id in assignments.items():
+        shift = shifts_by_id.get(shift_id)
+        if shift is None:
+            continue
+        feeds[f'reporter:{username}'] = [shift_event(
+            shift, f"shift-{shift['id']}-{username}@{domain}", f"Holiday shift: {shift['holiday']}",
+            f"{shift['holiday']}, {shift['time']}")]
+
+    desk_events = []
+    for shift in shifts:
+        names = sorted(name(username) for username in assigned_by_shift.get(shift['id'], []))
+        open_slots = max(shift['slots'] - len(names), 0)
+        staffing = ', '.join(names) or 'nobody yet'
+        if open_slots:
+            staffing += f" ({open_slots} open slot{'s' if open_slots != 1 else ''})"
+        desk_events.append(shift_event(
+            shift, f"shift-{shift['id']}@{domain}", f"{shift['holiday']}: {staffing}",
+            f"{shift['holiday']}, {shift['time']}\nAssigned: {staffing}"))
+    feeds['desk'] = desk_events
+    return feeds
+
+
+class FeedStamps:
+    """When each feed's content last changed, shared by the workers through a JSON file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def update(self, digests):
+        """Stamps (Unix seconds) for {feed: content digest}; a new digest is stamped now"""
+        now = int(time.time())
+        with file_lock(self.path):
+            try:
+                with open(self.path) as f:
+                    entries = json.load(f)
+            except (FileNotFoundError, ValueError):
+                entries = {}
+            changed = set(entries) != set(digests)
+            stamps = {}
+            for feed, digest in digests.items():
+                entry = entries.get(feed)
+                if entry is None or entry[0] != digest:
+                    entry = entries[feed] = [digest, now]
+                    changed = True
+                stamps[feed] = entry[1]
+            if changed:
+                entries = {feed: entries[feed] for feed in digests}
+                with open(self.path + '.tmp', 'w') as f:
+                    json.dump(entries, f, separators=(',', ':'))
+                os.replace(self.path + '.tmp', self.path)
+        return stamps
+
+
+class Feed:
+    """A rendered feed"""
+
+    def __init__(self, body, etag, last_modified):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+def build_feeds(reporters, assignments, shifts, stamps, desk=None, tz=None):
+    """Every feed rendered, {feed: Feed}; stamps is a FeedStamps"""
+    events = feed_events(reporters, assignments, shifts, desk)
+    stamped = stamps.update({feed: content_etag(repr(items)) for feed, items in events.items()})
+    title = f'Holiday shifts ({desk})' if desk else 'Holiday shifts'
+    feeds, empty = {}, {}
+    for feed, items in events.items():
+        name = f'{title} - desk' if feed == 'desk' else title
+        stamp = stamped[feed]
+        if items:
+            body = render(name, items, stamp, tz)
+        else:
+            # Without events the stamp isn't in the body, so empty feeds share one
+            if name not in empty:
+                empty[name] = render(name, [], stamp, tz)
+            body = empty[name]
+        feeds[feed] = Feed(body, content_etag(body), datetime.fromtimestamp(stamp, timezone.utc))
+    return feeds
@@ -0,0 +1,88 @@
+"""Inverted index of signups: shift id -> usernames interested in it.
+
+Kept per process and updated in O(changed shifts) from the storage.Change
+returned by store.put_signups(). If the signups changed in any other way
+(another worker, a reset, an import) the index notices the version mismatch
+and rebuilds itself from the store on the next read.
+"""
+import threading
+
+
+def build_index(signups):
+    index = {}
+    for username, shift_ids in signups.items():
+        for shift_id in shift_ids:
+            index.setdefault(shift_id, set()).add(username)
+    return index
+
+
+class InterestIndex:
+
+    def __init__(self, store):
+        self.store = store
+        self.version = None
+        self.rebuilds = 0
+        self._reporters = {}  # shift_id -> set of usernames
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        with self._lock:
+            version = self.store.version('signups')
+            self._reporters = build_index(self.store.load('signups'))
+            self.version = version
+            self.rebuilds += 1
+
+    def sync(self):
+        if self.version is None or self.version != self.store.version('signups'):
+            self.rebuild()
+
+    def apply(self, change, changes):
+        """Apply the result of store.put_signups(changes)"""
+        with self._lock:
+            if self.version is None or change.before != self.version:
+                self.version = None  # missed an update - rebuild on next read
+                return
+            for username, shift_ids in changes.items():
+                old = set(change.previous.get(username) or ())
+                new = set(shift_ids or ())
+                for shift_id in old - new:
+                    reporters = self._reporters.get(shift_id)
+                    if reporters is not None:
+                        reporters.discard(username)
+                        if not reporters:
+                            del self._reporters[shift_id]
+                for shift_id in new - old:
+                    self._reporters.setdefault(shift_id, set()).add(username)
+            self.version = change.after
+
+    def counts(self):
+        """shift_id -> number of reporters interested"""
+        self.sync()
+        with self._lock:
+            return {shift_id: len(reporters) for shift_id, reporters in self._reporters.items()}
+
+    def counts_at(self, version, signups):
+        """counts() for the given signups at the given version (e.g. a snapshot's)"""
+        self.sync()
+        with self._lock:
+            if self.version == version:
+                return {shift_id: len(reporters) for shift_id, reporters in self._reporters.items()}
+        # The index has moved on (or not caught up); count the snapshot itself
+        return {shift_id: len(usernames) for shift_id, usernames in build_index(signups).items()}
+
+    def reporters(self, shift_id):
+        self.sync()
+        with self._lock:
+            return frozenset(self._reporters.get(shift_id, ()))
+
+    def check(self):
+        """Compare with a fresh build from the store; rebuilds on mismatch"""
+        self.sync()
+        with self._lock:
+            expected = build_index(self.store.load('signups'))
+            mismatched = sorted(shift_id for shift_id in set(expected) | set(self._reporters)
+                                if expected.get(shift_id) != self._reporters.get(shift_id))
+        if mismatched:
+            self.rebuild()
+        return {'consistent': not mismatched, 'mismatched_shifts': mismatched,
+                'rebuilds': self.rebuilds}
@@ -0,0 +1,399 @@
+"""Background jobs: allocations, exports and simulations off the request thread.
+
+A job is submitted into a SQLite queue (one per desk) and the request returns
+straight away with its id; the client polls the job for its progress and
+result. Every web worker that has submitted or polled a job runs a
+dispatcher thread that claims queued jobs - at most WORKERS running at once
+across all workers - and runs their computation in its process pool. While
+no job is queued or running anywhere, the dispatcher sleeps until the next
+submit or poll instead of checking the queue.
+
+A job kind is three functions, registered with JobRunner.register():
+
+* prepare(job) -> args        in the web worker, e.g. reads a snapshot
+* compute(*args, progress)    in the pool; pure computation, module-level so
+                              it can be pickled; calls progress(fraction, message)
+* finish(job, output)         in the web worker: writes what the job changes;
+                              returns (result, artifact bytes or None)
+
+Submitting with an idempotency key that was already used for the same kind
+returns the job that key started instead of running another one (a key
+reused with different parameters is a JobConflict). An exclusive kind has at
+most one job queued or running; submitting another is a JobConflict too.
+Jobs whose worker died
+- no heartbeat for STALE seconds - are queued again, up to MAX_ATTEMPTS
+runs, so a job should give the same answer when re-run (an allocation
+job's seed comes from its id). Only the latest run of a job may complete or
+fail it; a run that was given up on and finishes anyway is dropped. Finished jobs and their artifacts are deleted after
+RETENTION_DAYS.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import metrics
+
+# Jobs running at once (all web workers together); 0 = one at a time in a
+# thread of the web worker instead of a process pool (local development)
+WORKERS = int(os.environ.get('JOB_WORKERS', 1))
+RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', 7))
+POLL_INTERVAL = 0.5
+HEARTBEAT_INTERVAL = 5.0
+STALE = 60.0
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 0.25
+PRUNE_INTERVAL = 3600.0
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    artifact TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+Task = namedtuple('Task', 'prepare compute finish artifact_name exclusive')
+
+
+class JobConflict(Exception):
+    """An idempotency key was reused for a different request, or an
+    exclusive job kind already has a job queued or running"""
+
+
+class JobQueue:
+    """Jobs, their state and results in SQLite; artifacts as files next to it"""
+
+    def __init__(self, db_path, artifact_dir):
+        self.db_path = db_path
+        self.artifact_dir = artifact_dir
+        self._local = threading.local()
+
+    def _conn(self):
+        # One connection per thread, re-opened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def _job(row, with_result=True):
+        if row is None:
+            return None
+        job = {key: row[key] for key in ('id', 'kind', 'status', 'progress', 'message', 'error',
+                                         'attempts', 'created', 'started', 'finished')}
+        job['params'] = json.loads(row['params'])
+        job['idempotency_key'] = row['idempotency_key'].split(':', 1)[1] if row['idempotency_key'] else None
+        job['artifact'] = row['artifact']
+        if with_result:
+            job['result'] = json.loads(row['result']) if row['result'] else None
+        return job
+
+    def submit(self, kind, params, key=None, exclusive=False):
+        """Queue a job; returns (job, created). With a key already used for
+        this kind, returns that key's job and created=False. exclusive: a
+        JobConflict if a job of this kind is queued or running."""
+        scoped_key = f'{kind}:{key}' if key is not None else None
+        encoded = json.dumps(params, sort_keys=True)
+        with self._transaction() as conn:
+            if scoped_key is not None:
+                row = conn.execute('SELECT * FROM jobs WHERE idempotency_key = ?', (scoped_key,)).fetchone()
+                if row is not None:
+                    if row['params'] != encoded:
+                        raise JobConflict(f"Idempotency key '{key}' was used for a different {kind} job")
+                    return self._job(row), False
+            if exclusive:
+                row = conn.execute("SELECT status FROM jobs WHERE kind = ? AND status IN ('queued', 'running') "
+                                   'LIMIT 1', (kind,)).fetchone()
+                if row is not None:
+                    raise JobConflict(f"Another {kind} job is {row['status']}")
+            job_id = uuid.uuid4().hex
+            conn.execute('INSERT INTO jobs (id, kind, idempotency_key, params, status, message, created) '
+                         "VALUES (?, ?, ?, ?, 'queued', 'Queued', ?)",
+                         (job_id, kind, scoped_key, encoded, time.time()))
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._job(row), True
+
+    def get(self, job_id):
+        return self._job(self._conn().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+    def list(self, limit=50):
+        rows = self._conn().execute('SELECT * FROM jobs ORDER BY created DESC LIMIT ?', (limit,))
+        return [self._job(row, with_result=False) for row in rows]
+
+    def counts(self):
+        rows = self._conn().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status')
+        return dict({status: 0 for status in STATUSES}, **{status: n for status, n in rows})
+
+    def active(self):
+        """Jobs queued or running, whichever worker has them"""
+        return self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def claim(self, limit):
+        """Mark the oldest queued job running and return it, unless limit jobs
+        are running already (or none are queued)"""
+        now = time.time()
+        with self._transaction() as conn:
+            # Jobs of workers that died: run again, or give up on them
+            conn.execute("UPDATE jobs SET status = 'failed', finished = ?, "
+                         "error = 'The worker running this job stopped', message = 'Failed' "
+                         "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                         (now, now - STALE, MAX_ATTEMPTS))
+            conn.execute("UPDATE jobs SET status = 'queued', progress = 0, message = 'Queued again' "
+                         "WHERE status = 'running' AND heartbeat < ?", (now - STALE,))
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+            if running >= limit:
+                return None
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, started = ?, "
+                         "heartbeat = ?, progress = 0, message = 'Starting' WHERE id = ?",
+                         (now, now, row['id']))
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+        return self._job(row)
+
+    def owns(self, job_id, attempt):
+        """Whether run number attempt of the job is still the one running it"""
+        row = self._conn().execute("SELECT 1 FROM jobs WHERE id = ? AND status = 'running' AND attempts = ?",
+                                   (job_id, attempt)).fetchone()
+        return row is not None
+
+    def progress(self, job_id, fraction, message=None):
+        self._conn().execute("UPDATE jobs SET progress = ?, message = COALESCE(?, message), heartbeat = ? "
+                             "WHERE id = ? AND status = 'running'",
+                             (round(min(max(fraction, 0.0), 1.0), 4), message, time.time(), job_id))
+
+    def heartbeat(self, job_ids):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'",
+                             [(now, job_id) for job_id in job_ids])
+
+    def complete(self, job_id, attempt, result, artifact=None, artifact_name=None):
+        """Store the result of run number attempt; False (and nothing stored) if
+        the job was queued again or finished by another run meanwhile"""
+        name = None
+        if artifact is not None:
+            os.makedirs(self.artifact_dir, exist_ok=True)
+            # Per run, so a run that loses the race can't overwrite the winner's file
+            name = f'{job_id}.{attempt}-{artifact_name}'
+            fd, tmp_path = tempfile.mkstemp(dir=self.artifact_dir, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(artifact)
+            os.replace(tmp_path, os.path.join(self.artifact_dir, name))
+        cursor = self._conn().execute("UPDATE jobs SET status = 'done', progress = 1, message = 'Done', "
+                                      'result = ?, artifact = ?, finished = ? '
+                                      "WHERE id = ? AND status = 'running' AND attempts = ?",
+                                      (json.dumps(result), name, time.time(), job_id, attempt))
+        if cursor.rowcount == 0:
+            if name is not None:
+                os.remove(os.path.join(self.artifact_dir, name))
+            return False
+        return True
+
+    def fail(self, job_id, attempt, error):
+        """Mark run number attempt failed, unless another run owns the job by now"""
+        self._conn().execute("UPDATE jobs SET status = 'failed', message = 'Failed', error = ?, finished = ? "
+                             "WHERE id = ? AND status = 'running' AND attempts = ?",
+                             (error, time.time(), job_id, attempt))
+
+    def artifact_path(self, job):
+        if not job or not job['artifact']:
+            return None
+        path = os.path.join(self.artifact_dir, job['artifact'])
+        return path if os.path.exists(path) else None
+
+    def prune(self, retention_days=RETENTION_DAYS):
+        """Delete finished jobs (and their artifacts) older than retention_days"""
+        cutoff = time.time() - retention_days * 86400
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT id, artifact FROM jobs WHERE status IN ('done', 'failed') "
+                                "AND finished < ?", (cutoff,)).fetchall()
+            conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?", (cutoff,))
+        for row in rows:
+            if row['artifact']:
+                try:
+                    os.remove(os.path.join(self.artifact_dir, row['artifact']))
+                except FileNotFoundError:
+                    pass
+        return len(rows)
+
+
+_queues = {}
+
+
+class Progress:
+    """progress(fraction, message) for a running job; picklable, so it works
+    in the pool processes. Writes at most once per PROGRESS_INTERVAL."""
+
+    def __init__(self, db_path, artifact_dir, job_id):
+        self.db_path = db_path
+        self.artifact_dir = artifact_dir
+        self.job_id = job_id
+        self._last = 0.0
+
+    def __call__(self, fraction, message=None):
+        now = time.monotonic()
+        if now - self._last < PROGRESS_INTERVAL and fraction < 1:
+            return
+        self._last = now
+        queue = _queues.get(self.db_path)
+        if queue is None:
+            queue = _queues[self.db_path] = JobQueue(self.db_path, self.artifact_dir)
+        queue.progress(self.job_id, fraction, message)
+
+
+def _compute(compute, args, progress):
+    # Runs in the pool process
+    return compute(*args, progress=progress)
+
+
+class JobRunner:
+
+    def __init__(self, queue, workers=WORKERS):
+        self.queue = queue
+        self.workers = workers
+        self.tasks = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._executor = None
+
+    def register(self, kind, prepare, compute, finish, artifact_name=None, exclusive=False):
+        """artifact_name: file name for the artifact finish() returns, if any;
+        exclusive: one job of this kind queued or running at a time"""
+        self.tasks[kind] = Task(prepare, compute, finish, artifact_name, exclusive)
+
+    def submit(self, kind, params, key=None):
+        """Queue a job (see JobQueue.submit) and make sure it will be run"""
+        if kind not in self.tasks:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job, created = self.queue.submit(kind, params, key, self.tasks[kind].exclusive)
+        self.start()
+        return job, created
+
+    def start(self):
+        """Run the dispatcher in this process (once per process; threads don't survive a fork)
+        and have it look at the queue now"""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = None
+                self._thread = threading.Thread(target=self._run, name='job-dispatcher', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.workers == 0:
+                # Not in the dispatcher thread itself: it has to keep heartbeating
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job')
+            else:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _run(self):
+        running = {}  # future -> (job, started)
+        last_heartbeat = last_prune = 0.0
+        idle = False  # no job queued or running in any worker when last looked
+        while True:
+            if running:
+                done, _ = wait(list(running), timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, started = running.pop(future)
+                    self._finish(job, started, future)
+            else:
+                # Jobs of other workers may still be claimable (or go stale),
+                # so keep polling for them; with none, sleep until start()
+                self._wake.wait(PRUNE_INTERVAL if idle else POLL_INTERVAL)
+                self._wake.clear()
+            try:
+                now = time.monotonic()
+                if running and now - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    self.queue.heartbeat([job['id'] for job, _ in running.values()])
+                    last_heartbeat = now
+                if now - last_prune >= PRUNE_INTERVAL:
+                    self.queue.prune()
+                    last_prune = now
+                while len(running) < max(self.workers, 1):
+                    job = self.queue.claim(max(self.workers, 1))
+                    if job is None:
+                        break
+                    future = self._start(job)
+                    if future is not None:
+                        running[future] = (job, time.perf_counter())
+                idle = not running and not self.queue.active()
+            except sqlite3.Error:
+                idle = False
+                continue  # locked for longer than the timeout; try again next round
+
+    def _start(self, job):
+        """Prepare a claimed job and hand it to the pool; None if it failed already"""
+        task = self.tasks.get(job['kind'])
+        try:
+            if task is None:
+                raise ValueError(f"Unknown job kind '{job['kind']}'")
+            args = task.prepare(job)
+            self.queue.progress(job['id'], 0.0, 'Running')
+            progress = Progress(self.queue.db_path, self.queue.artifact_dir, job['id'])
+            return self._get_executor().submit(_compute, task.compute, args, progress)
+        except Exception as e:
+            self.queue.fail(job['id'], job['attempts'], f'{type(e).__name__}: {e}')
+            return None
+
+    def _finish(self, job, started, future):
+        task = self.tasks[job['kind']]
+        try:
+            output = future.result()
+            # Queued again (we missed heartbeats) and picked up by another run:
+            # that run's result is the job's, so don't write this one
+            if self.queue.owns(job['id'], job['attempts']):
+                self.queue.progress(job['id'], 0.95, 'Saving')
+                result, artifact = task.finish(job, output)
+                self.queue.complete(job['id'], job['attempts'], result, artifact, task.artifact_name)
+        except Exception as e:
+            self.queue.fail(job['id'], job['attempts'], f'{type(e).__name__}: {e}')
+        metrics.registry.observe('holiday_span_duration_seconds', {'span': f"job_{job['kind']}"},
+                                 time.perf_counter() - started)
+
@@ -0,0 +1,279 @@
+"""Append-only event journal for signups and assignments.
+
+Every signup change, allocation, reset and reporter/password change is
+appended as one NDJSON line to data/journal/events.ndjson. Current signups
+and assignments are materialised from the latest snapshot plus the journal
+tail; each process keeps its materialised state and only reads the bytes
+appended since it last looked. The events file is never rewritten, so the
+state at any earlier point in time can be rebuilt by replaying it.
+
+A reset is an epoch marker event rather than a wipe of the data files.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+from storage import Change, JsonFileCache, file_lock, freeze, thaw
+
+# Fold the tail into a new snapshot once this many events have piled up
+COMPACT_EVERY = 500
+
+
+def empty_state():
+    return {'seq': 0, 'epoch': 0, 'signups': {}, 'assignments': {}}
+
+
+def apply_event(state, event):
+    """Apply one journal event to a mutable state dict"""
+    kind = event['type']
+    if kind == 'signup':
+        state['signups'][event['username']] = event['shifts']
+    elif kind == 'assign':
+        state['assignments'].update(event['assignments'])
+    elif kind == 'allocate':
+        state['assignments'] = dict(event['assignments'])
+    elif kind == 'replace':
+        state[event['dataset']] = dict(event['data'])
+    elif kind == 'reset':
+        state['epoch'] = event['epoch']
+        state['signups'] = {}
+        state['assignments'] = {}
+    # 'reporter'/'reporters_uploaded' events are an audit trail only;
+    # reporters themselves live in the base store
+    state['seq'] = event['seq']
+
+
+def parse_time(value):
+    """Parse an ISO timestamp; date-only values mean the end of that day"""
+    if len(value) == 10:
+        value += 'T23:59:59.999999'
+    return datetime.fromisoformat(value)
+
+
+class Journal:
+    """The events file plus its latest snapshot"""
+
+    def __init__(self, journal_dir):
+        self.journal_dir = journal_dir
+        self.events_file = os.path.join(journal_dir, 'events.ndjson')
+        self.snapshot_file = os.path.join(journal_dir, 'snapshot.json')
+        os.makedirs(journal_dir, exist_ok=True)
+        self._snapshot_cache = JsonFileCache()
+        self._lock = threading.RLock()
+        self._state = None
+        self._offset = 0      # bytes of events_file applied to _state
+        self._inode = None
+        self._frozen = {}     # dataset -> frozen copy of current state
+        self._compacting = False
+        self.snapshot_seq = 0
+
+    def _reset_from_snapshot(self):
+        if os.path.exists(self.snapshot_file):
+            snapshot = self._snapshot_cache.load(self.snapshot_file)
+            self._state = thaw(snapshot['state'])
+            self._offset = snapshot['offset']
+        else:
+            self._state = empty_state()
+            self._offset = 0
+        self.snapshot_seq = self._state['seq']
+        self._frozen = {}
+
+    def _catch_up(self):
+        """Apply any events appended (by any process) since we last looked"""
+        try:
+            st = os.stat(self.events_file)
+        except FileNotFoundError:
+            st = None
+        inode = st.st_ino if st else None
+        size = st.st_size if st else 0
+        if self._state is None or inode != self._inode or size < self._offset:
+            self._inode = inode
+            self._reset_from_snapshot()
+        if size <= self._offset:
+            return
+        with open(self.events_file, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        # Only consume complete lines; a writer may be mid-append
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                apply_event(self._state, json.loads(line))
+        self._offset += end
+        if end:
+            self._frozen = {}
+
+    def load(self, dataset):
+        with self._lock:
+            self._catch_up()
+            if dataset not in self._frozen:
+                self._frozen[dataset] = freeze(self._state[dataset])
+            return self._frozen[dataset]
+
+    def version(self):
+        """(inode, offset) of the journal position the current state reflects"""
+        with self._lock:
+            self._catch_up()
+            return (self._inode, self._offset)
+
+    def state(self):
+        with self._lock:
+            self._catch_up()
+            return {'seq': self._state['seq'], 'epoch': self._state['epoch'],
+                    'offset': self._offset, 'snapshot_seq': self.snapshot_seq}
+
+    def append(self, events):
+        """Durably append events (dicts without seq/ts) and apply them locally.
+
+        Returns a storage.Change; `previous` holds the prior value of every
+        signup or assignment the events touch.
+        """
+        with self._lock, file_lock(self.events_file):
+            self._catch_up()
+            before = (self._inode, self._offset)
+            previous = {}
+            lines = []
+            for event in events:
+                if event['type'] == 'signup':
+                    previous.setdefault(event['username'], self._state['signups'].get(event['username']))
+                elif event['type'] == 'assign':
+                    for username in event['assignments']:
+                        previous.setdefault(username, self._state['assignments'].get(username))
+                event = dict(event, seq=self._state['seq'] + 1,
+                             ts=datetime.now().isoformat(timespec='microseconds'))
+                if event['type'] == 'reset':
+                    event['epoch'] = self._state['epoch'] + 1
+                apply_event(self._state, event)
+                lines.append(json.dumps(event, separators=(',', ':')) + '\n')
+            data = ''.join(lines).encode('utf-8')
+            with open(self.events_file, 'ab') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                self._inode = os.fstat(f.fileno()).st_ino
+            self._offset += len(data)
+            self._frozen = {}
+            after = (self._inode, self._offset)
+            backlog = self._state['seq'] - self.snapshot_seq
+        if backlog >= COMPACT_EVERY:
+            self.compact_in_background()
+        return Change(previous, before, after)
+
+    def compact(self):
+        """Write a snapshot of the current state so replay starts from here"""
+        with self._lock:
+            self._catch_up()
+            snapshot = {'offset': self._offset, 'state': thaw(self._state),
+                        'created': datetime.now().isoformat(timespec='seconds')}
+        with file_lock(self.snapshot_file):
+            current = self._snapshot_cache.load(self.snapshot_file) \
+                if os.path.exists(self.snapshot_file) else None
+            if current is None or current['offset'] < snapshot['offset']:
+                self._snapshot_cache.save(self.snapshot_file, snapshot)
+        self.snapshot_seq = snapshot['state']['seq']
+        return snapshot['state']['seq']
+
+    def compact_in_background(self):
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, name='journal-compactor', daemon=True).start()
+
+    def events(self):
+        """Iterate over every event in the journal, oldest first"""
+        if not os.path.exists(self.events_file):
+            return
+        with open(self.events_file, 'rb') as f:
+            for line in f:
+                if line.endswith(b'\n') and line.strip():
+                    yield json.loads(line)
+
+    def state_at(self, when):
+        """Rebuild signups/assignments as they were at datetime `when`"""
+        state = empty_state()
+        for event in self.events():
+            if parse_time(event['ts']) > when:
+                break
+            apply_event(state, event)
+        return state
+
+
+class JournalStore:
+    """Store wrapper that keeps signups and assignments in a Journal.
+
+    Everything else (reporters, settings, holidays) is delegated to the base
+    store; reporter changes are additionally journaled as audit events.
+    """
+
+    DATASETS = ('signups', 'assignments')
+
+    def __init__(self, journal, base):
+        self.journal = journal
+        self.base = base
+        # Seed the journal from existing signups/assignments on first use
+        if not os.path.exists(journal.events_file) and not os.path.exists(journal.snapshot_file):
+            seed = [{'type': 'replace', 'dataset': name, 'data': thaw(base.load(name))}
+                    for name in self.DATASETS if base.exists(name)]
+            if seed:
+                journal.append(seed)
+
+    def exists(self, name):
+        return True if name in self.DATASETS else self.base.exists(name)
+
+    def load(self, name):
+        if name in self.DATASETS:
+            return self.journal.load(name)
+        return self.base.load(name)
+
+    def version(self, name):
+        if name in self.DATASETS:
+            return self.journal.version()
+        return self.base.version(name)
+
+    def replace(self, name, data):
+        if name == 'assignments':
+            self.journal.append([{'type': 'allocate', 'assignments': data}])
+        elif name in self.DATASETS:
+            self.journal.append([{'type': 'replace', 'dataset': name, 'data': data}])
+        else:
+            self.base.replace(name, data)
+            if name == 'reporters':
+                self.journal.append([{'type': 'reporters_uploaded', 'count': len(data)}])
+
+    def put_signups(self, changes):
+        return self.journal.append([{'type': 'signup', 'username': username, 'shifts': shifts}
+                             for username, shifts in changes.items()])
+
+    def put_assignments(self, changes):
+        return self.journal.append([{'type': 'assign', 'assignments': changes}])
+
+    def put_reporters(self, changes):
+        change = self.base.put_reporters(changes)
+        events = []
+        for username, record in changes.items():
+            before = change.previous.get(username) or {}
+            fields = sorted(k for k in set(record) | set(before) if record.get(k) != before.get(k))
+            if fields:
+                # Never journal password hashes - just the fact they changed
+                events.append({'type': 'reporter', 'username': username, 'fields': fields})
+        if events:
+            self.journal.append(events)
+        return change
+
+    def put_settings(self, changes):
+        return self.base.put_settings(changes)
+
+    def reset_season(self):
+        self.journal.append([{'type': 'reset'}])
+
+    def stats(self):
+        return dict(self.base.stats(), backend='journal', journal=self.journal.state())
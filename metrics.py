@@ -0,0 +1,342 @@
+"""Request and span timings in Prometheus text format.
+
+Every worker process keeps its counters and histograms in memory and writes
+them to its own file in the metrics directory (at most once per
+FLUSH_INTERVAL seconds, and whenever /metrics is served). /metrics adds up
+the files of all workers, so the numbers are the same whichever gunicorn
+worker answers the scrape. When a worker has exited, the next scrape folds
+its file into retired.json and removes it, so counters never go backwards
+and the directory doesn't grow with every restart; delete the directory to
+reset everything.
+
+span() times a block of code into holiday_span_duration_seconds; the store,
+password pool, templates and Excel export are wrapped with it.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+
+# Prometheus' default latency buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    'holiday_http_requests_total':
+        ('counter', 'HTTP requests by endpoint, method and status'),
+    'holiday_http_request_duration_seconds':
+        ('histogram', 'Time from the start of a request to its response, by endpoint'),
+    'holiday_span_duration_seconds':
+        ('histogram', 'Time spent in instrumented code: JSON load/save, password hashing, '
+                      'template rendering, export generation'),
+    'holiday_signup_commit_batch_size':
+        ('histogram', 'Signup submissions written by one group commit'),
+    'holiday_signup_commit_duration_seconds':
+        ('histogram', 'Time to write one group commit of signups'),
+    'holiday_signup_commit_wait_seconds':
+        ('histogram', 'Time from a signup submission to its durable commit'),
+}
+
+# Totals of workers that have exited, in the metrics directory
+RETIRED_FILE = 'retired.json'
+
+# Histograms that don't measure latency
+BUCKETS = {
+    'holiday_signup_commit_batch_size': (1, 2, 4, 8, 16, 32, 64, 128, 256),
+}
+
+
+class Histogram:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == '+Inf' else repr(float(bound))
+
+
+def _merge(snapshots):
+    """Add up snapshots: (counters, histograms) keyed by (name, label key)"""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, _label_key(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total, count in snapshot['histograms']:
+            key = (name, _label_key(labels))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _worker_alive(filename):
+    """Whether the process that writes <pid>-<ns>.json is still running"""
+    try:
+        pid = int(filename.split('-', 1)[0])
+    except ValueError:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # someone else's process
+    return True
+
+
+class Metrics:
+    """Counters and histograms of one process, persisted to directory/<worker>.json"""
+
+    def __init__(self, directory=None, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # pid alone could be reused by a later worker and overwrite our totals
+        self._worker_id = f'{self._pid}-{time.time_ns()}'
+        self._counters = {}    # (name, label key) -> value
+        self._histograms = {}  # (name, label key) -> Histogram
+        self._last_flush = 0.0
+
+    def _check_fork(self):
+        # A forked worker starts from zero; the parent's numbers are its own
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._check_fork()
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._check_fork()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(BUCKETS.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('holiday_span_duration_seconds', {'span': name},
+                         time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                'counters': [[name, dict(labels), value]
+                             for (name, labels), value in self._counters.items()],
+                'histograms': [[name, dict(labels), h.counts, h.total, h.count]
+                               for (name, labels), h in self._histograms.items()],
+            }
+
+    def flush(self, force=False):
+        """Write this worker's numbers to its file (throttled unless force)"""
+        if self.directory is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        snapshot = self.snapshot()
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, os.path.join(self.directory, f'{self._worker_id}.json'))
+
+    def _snapshots(self):
+        if self.directory is None:
+            return [self.snapshot()]
+        from storage import file_lock
+        self.flush(force=True)
+        retired_path = os.path.join(self.directory, RETIRED_FILE)
+        # Scrapes and retirement take the same lock, so a scrape never counts
+        # a file both in retired.json and on its own, or in neither
+        with file_lock(retired_path):
+            retired = _read_json(retired_path) or {'counters': [], 'histograms': [], 'folded': []}
+            # Left behind if we died between writing retired.json and removing them
+            for filename in retired['folded']:
+                _remove(os.path.join(self.directory, filename))
+            snapshots, dead = [], []
+            for filename in os.listdir(self.directory):
+                if not filename.endswith('.json') or filename.startswith('.') \
+                        or filename == RETIRED_FILE:
+                    continue
+                snapshot = _read_json(os.path.join(self.directory, filename))
+                if snapshot is None:
+                    continue  # removed or being replaced; next scrape picks it up
+                if _worker_alive(filename):
+                    snapshots.append(snapshot)
+                else:
+                    dead.append((filename, snapshot))
+            if dead:
+                retired = self._retire(retired_path, retired, dead)
+        return [retired] + snapshots
+
+    def _retire(self, retired_path, retired, dead):
+        """Fold exited workers' files into retired.json, then remove them"""
+        counters, histograms = _merge([retired] + [snapshot for _, snapshot in dead])
+        retired = {
+            'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, dict(labels), counts, total, count]
+                           for (name, labels), (counts, total, count) in histograms.items()],
+            'folded': [filename for filename, _ in dead],
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(retired, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, retired_path)
+        for filename, _ in dead:
+            _remove(os.path.join(self.directory, filename))
+        return retired
+
+    def collect(self):
+        """Totals of every worker: (counters, histograms) keyed by (name, label key)"""
+        return _merge(self._snapshots())
+
+    def render(self):
+        """All workers' metrics in the Prometheus text exposition format"""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            bounds = [str(b) for b in BUCKETS.get(name, DEFAULT_BUCKETS)] + ['+Inf']
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(bounds, counts):
+                    cumulative += bucket_count
+                    le = _format_labels(labels, [('le', _format_bound(bound))])
+                    lines.append(f'{name}_bucket{le} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {round(total, 6)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def instrument(self, app):
+        """Time every request of a Flask app, and its template rendering"""
+        from flask import before_render_template, g, request, template_rendered
+
+        @app.before_request
+        def start_timer():
+            g.metrics_started = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            self._record(request, response.status_code)
+            return response
+
+        @app.teardown_request
+        def record_failure(exc):
+            # after_request is skipped when a view raises
+            if exc is not None and 'metrics_started' in g:
+                self._record(request, 500)
+
+        def render_started(sender, template, context, **extra):
+            g.setdefault('metrics_render_started', []).append(time.perf_counter())
+
+        def render_finished(sender, template, context, **extra):
+            starts = g.get('metrics_render_started')
+            if starts:
+                self.observe('holiday_span_duration_seconds',
+                             {'span': f'render:{template.name}'},
+                             time.perf_counter() - starts.pop())
+
+        before_render_template.connect(render_started, app, weak=False)
+        template_rendered.connect(render_finished, app, weak=False)
+        atexit.register(self.flush, force=True)
+
+    def _record(self, request, status):
+        from flask import g
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        # Unknown URLs share one label so scanners can't blow up the series count
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        self.inc('holiday_http_requests_total',
+                 {'endpoint': endpoint, 'method': request.method, 'status': str(status)})
+        self.observe('holiday_http_request_duration_seconds', {'endpoint': endpoint},
+                     time.perf_counter() - started)
+        self.flush()
+
+
+# Process-wide registry; app.py points it at data/metrics
+registry = Metrics()
+
+
+def span(name):
+    return registry.span(name)
@@ -0,0 +1,124 @@
+"""Password hashing and verification off the request thread.
+
+scrypt is deliberately slow, so hashing runs in a small process pool that is
+shared by all requests in a worker. The number of calls waiting on the pool
+is capped; when it is full, callers get PasswordPoolBusy straight away (the
+routes turn that into a 503) instead of queueing behind everyone else. A call
+that times out also gets PasswordPoolBusy, but keeps its place under the cap
+until its hash has actually finished in the pool.
+
+HASH_METHOD is the hash policy. Hashes made with a different method or cost
+are upgraded on the next successful login (see needs_rehash).
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import metrics
+from metrics import Histogram
+
+# Werkzeug 3.0's default is scrypt with N=2**15, r=8, p=1
+HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+# 0 workers = hash inline in the request thread (local development)
+WORKERS = int(os.environ.get('PASSWORD_WORKERS', min(os.cpu_count() or 1, 2)))
+MAX_PENDING = int(os.environ.get('PASSWORD_MAX_PENDING', max(WORKERS, 1) * 8))
+TIMEOUT = float(os.environ.get('PASSWORD_TIMEOUT', 10))
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PasswordPoolBusy(Exception):
+    """Too many password checks are already waiting"""
+
+
+def _timed(func, *args):
+    # Runs in the pool process; returns when it actually started so the
+    # caller can tell queue wait from KDF time
+    started = time.time()
+    return started, func(*args)
+
+
+class PasswordPool:
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING, timeout=TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.pending = 0
+        self.rejected = 0
+        self.latency = {'verify': Histogram(LATENCY_BUCKETS), 'hash': Histogram(LATENCY_BUCKETS)}
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+
+    def _get_executor(self):
+        # Created lazily so each (forked) gunicorn worker gets its own pool
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _release(self, future=None):
+        self.pending -= 1
+        self._slots.release()
+
+    def _run(self, kind, func, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordPoolBusy()
+        self.pending += 1
+        submitted = time.time()
+        if self.workers == 0:
+            try:
+                started, result = _timed(func, *args)
+            finally:
+                self._release()
+        else:
+            try:
+                future = self._get_executor().submit(_timed, func, *args)
+            except BaseException:
+                self._release()
+                raise
+            # A KDF that is already running can't be cancelled, so the slot
+            # stays taken until the pool is really done with it - otherwise
+            # timed-out calls would pile up behind the cap
+            future.add_done_callback(self._release)
+            try:
+                started, result = future.result(timeout=self.timeout)
+            except TimeoutError:
+                future.cancel()
+                self.rejected += 1
+                raise PasswordPoolBusy()
+        elapsed = time.time() - submitted
+        self.queue_wait.observe(max(started - submitted, 0.0))
+        self.latency[kind].observe(elapsed)
+        metrics.registry.observe('holiday_span_duration_seconds', {'span': f'password_{kind}'}, elapsed)
+        return result
+
+    def verify(self, pwhash, password):
+        return self._run('verify', check_password_hash, pwhash, password)
+
+    def hash(self, password):
+        return self._run('hash', generate_password_hash, password, HASH_METHOD)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'rejected': self.rejected,
+            'hash_method': HASH_METHOD,
+            'latency_seconds': {kind: h.snapshot() for kind, h in self.latency.items()},
+            'queue_wait_seconds': self.queue_wait.snapshot(),
+        }
+
+
+def needs_rehash(pwhash):
+    """True if pwhash was not made with the current HASH_METHOD"""
+    return pwhash.split('$', 1)[0] != HASH_METHOD
@@ -0,0 +1,357 @@
+"""Opt-in request profiling: sampled stacks and cProfile stats per endpoint.
+
+Off until switched on with start() (POST /api/profiling): a fraction of
+requests, optionally only to some endpoints, for a limited number of
+minutes. The settings are a file in the profiles directory, so every worker
+picks them up (checked at most once per SETTINGS_INTERVAL).
+
+A captured request's view runs under cProfile, and while it runs a sampler
+thread records its Python stack every INTERVAL seconds. Each worker adds its
+captures up per (session, endpoint) and writes them, at most once per
+FLUSH_INTERVAL, as <session>.<endpoint>.<worker>.*:
+
+* .collapsed - `frame;frame;frame count` lines, for flamegraph.pl or speedscope
+* .pstats    - cProfile stats, for `python -m pstats` or snakeviz
+* .json      - requests, samples and seconds captured
+
+captures() and merged() add the workers' files up. Once the directory is
+over BUDGET bytes the oldest captures are deleted.
+
+Only the view is profiled; a streamed response body is generated after it.
+"""
+import atexit
+import cProfile
+import json
+import marshal
+import os
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from storage import file_token
+
+INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+BUDGET = int(float(os.environ.get('PROFILE_BUDGET_MB', 50)) * 1024 * 1024)
+FLUSH_INTERVAL = 5.0
+SETTINGS_INTERVAL = 1.0
+MAX_MINUTES = 24 * 60
+SETTINGS_FILE = 'settings.json'
+FORMATS = ('collapsed', 'pstats')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=None)
+def _short_path(filename):
+    # The app's own files relative to it, libraries as package/module.py
+    if filename.startswith(BASE_DIR + os.sep):
+        return os.path.relpath(filename, BASE_DIR)
+    return os.path.join(*filename.split(os.sep)[-2:]) if os.sep in filename else filename
+
+
+def collapse(frame):
+    """A stack as `outermost;...;innermost` function names"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names)).replace(' ;', ';').replace('\n', ' ')
+
+
+def _safe(name):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+
+
+class Capture:
+    """One worker's captures of one endpoint in one session"""
+
+    def __init__(self, session, endpoint):
+        self.session = session
+        self.endpoint = endpoint
+        self.stacks = Counter()
+        self.stats = None
+        self.requests = 0
+        self.samples = 0
+        self.seconds = 0.0
+        self.dirty = False
+
+
+class Profiler:
+
+    def __init__(self, directory=None, interval=INTERVAL, budget=BUDGET):
+        self.directory = directory
+        self.interval = interval
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._worker_id = f'{self._pid}-{time.time_ns()}'
+        self._active = {}    # thread id -> (Capture, cProfile.Profile, start time)
+        self._captures = {}  # (session, endpoint) -> Capture
+        self._thread = None
+        self._settings = None
+        self._settings_token = None
+        self._settings_checked = 0.0
+        self._last_flush = 0.0
+
+    def _check_fork(self):
+        # A forked worker has no sampler thread and its own captures
+        if self._pid != os.getpid():
+            self._reset()
+
+    # Settings, shared by the workers through the profiles directory
+
+    def _write(self, filename, data, mode='w'):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.directory, filename))
+
+    def settings(self):
+        """The current profiling settings, or None when profiling is off"""
+        if self.directory is None:
+            return None
+        now = time.monotonic()
+        if now - self._settings_checked >= SETTINGS_INTERVAL:
+            self._settings_checked = now
+            path = os.path.join(self.directory, SETTINGS_FILE)
+            token = file_token(path)
+            if token != self._settings_token:
+                try:
+                    with open(path) as f:
+                        self._settings = json.load(f)
+                except (OSError, ValueError):
+                    self._settings = None
+                self._settings_token = token
+        settings = self._settings
+        if settings is None or settings['until'] < time.time():
+            return None
+        return settings
+
+    def start(self, rate=1.0, endpoints=(), minutes=15):
+        """Start a profiling session in every worker; returns its settings"""
+        now = time.time()
+        settings = {
+            'session': time.strftime('%Y%m%d-%H%M%S', time.localtime(now)),
+            'rate': rate,
+            'endpoints': list(endpoints),
+            'started': now,
+            'until': now + minutes * 60,
+        }
+        self._write(SETTINGS_FILE, json.dumps(settings))
+        self._settings_checked = 0.0
+        return settings
+
+    def stop(self):
+        try:
+            os.remove(os.path.join(self.directory, SETTINGS_FILE))
+        except FileNotFoundError:
+            pass
+        self._settings_checked = 0.0
+        self.flush(force=True)
+
+    # Capturing
+
+    def instrument(self, app):
+        """Profile a Flask app's requests while a session is on"""
+        from flask import request
+
+        @app.before_request
+        def start_capture():
+            if request.endpoint is not None:
+                self.begin(request.endpoint)
+
+        @app.teardown_request
+        def end_capture(exc):
+            self.end()
+
+        atexit.register(self.flush, force=True)
+
+    def begin(self, endpoint):
+        """Capture the current thread's request if the settings select it"""
+        settings = self.settings()
+        if settings is None:
+            return
+        if settings['endpoints'] and endpoint not in settings['endpoints']:
+            return
+        if random.random() >= settings['rate']:
+            return
+        profile = cProfile.Profile()
+        with self._lock:
+            self._check_fork()
+            key = (settings['session'], endpoint)
+            capture = self._captures.get(key)
+            if capture is None:
+                capture = self._captures[key] = Capture(*key)
+            self._active[threading.get_ident()] = (capture, profile, time.perf_counter())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+        profile.enable()
+
+    def end(self):
+        with self._lock:
+            entry = self._active.pop(threading.get_ident(), None)
+        if entry is None:
+            return
+        capture, profile, started = entry
+        profile.disable()
+        elapsed = time.perf_counter() - started
+        stats = pstats.Stats(profile)
+        with self._lock:
+            capture.requests += 1
+            capture.seconds += elapsed
+            if capture.stats is None:
+                capture.stats = stats
+            else:
+                capture.stats.add(stats)
+            capture.dirty = True
+        self.flush()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+                if not active and not any(c.dirty for c in self._captures.values()):
+                    self._thread = None
+                    return
+            if not active:
+                # Idle: write what the last requests captured, then stop
+                self.flush()
+                continue
+            frames = sys._current_frames()
+            stacks = [(capture, collapse(frames[ident]))
+                      for ident, (capture, _, _) in active if ident in frames]
+            del frames
+            with self._lock:
+                for capture, stack in stacks:
+                    capture.stacks[stack] += 1
+                    capture.samples += 1
+
+    # Files
+
+    def flush(self, force=False):
+        """Write this worker's changed captures (throttled unless force)"""
+        if self.directory is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        with self._lock:
+            self._check_fork()
+            pending = []
+            for capture in self._captures.values():
+                if not capture.dirty:
+                    continue
+                capture.dirty = False
+                pending.append((
+                    f'{capture.session}.{_safe(capture.endpoint)}.{self._worker_id}',
+                    ''.join(f'{stack} {count}\n' for stack, count in capture.stacks.items()),
+                    marshal.dumps(capture.stats.stats),
+                    {'session': capture.session, 'endpoint': capture.endpoint,
+                     'requests': capture.requests, 'samples': capture.samples,
+                     'seconds': round(capture.seconds, 6), 'updated': time.time()},
+                ))
+        if not pending:
+            return
+        for base, collapsed, stats, meta in pending:
+            self._write(base + '.collapsed', collapsed)
+            self._write(base + '.pstats', stats, 'wb')
+            self._write(base + '.json', json.dumps(meta))
+        self.prune()
+
+    def _groups(self):
+        """base name -> (meta or None, [(path, size, mtime)]) of the capture files"""
+        groups = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return groups
+        for name in names:
+            if name == SETTINGS_FILE or name.startswith('.'):
+                continue
+            base, _, ext = name.rpartition('.')
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            meta, files = groups.setdefault(base, (None, []))
+            files.append((path, st.st_size, st.st_mtime))
+            if ext == 'json':
+                try:
+                    with open(path) as f:
+                        groups[base] = (json.load(f), files)
+                except (OSError, ValueError):
+                    pass
+        return groups
+
+    def prune(self):
+        """Delete the oldest captures until the directory is within budget"""
+        groups = self._groups()
+        total = sum(size for _, files in groups.values() for _, size, _ in files)
+        by_age = sorted(groups.values(), key=lambda group: max(mtime for _, _, mtime in group[1]))
+        for _, files in by_age:
+            if total <= self.budget:
+                break
+            for path, size, _ in files:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def captures(self):
+        """Captures of every worker, per (session, endpoint), newest first"""
+        self.flush(force=True)
+        merged = {}
+        for meta, files in self._groups().values():
+            if meta is None:
+                continue
+            entry = merged.setdefault((meta['session'], meta['endpoint']), {
+                'session': meta['session'], 'endpoint': meta['endpoint'],
+                'requests': 0, 'samples': 0, 'seconds': 0.0, 'workers': 0, 'bytes': 0, 'updated': 0,
+            })
+            entry['requests'] += meta['requests']
+            entry['samples'] += meta['samples']
+            entry['seconds'] = round(entry['seconds'] + meta['seconds'], 6)
+            entry['workers'] += 1
+            entry['bytes'] += sum(size for _, size, _ in files)
+            entry['updated'] = max(entry['updated'], meta['updated'])
+        return sorted(merged.values(), key=lambda entry: entry['updated'], reverse=True)
+
+    def merged(self, session, endpoint, fmt):
+        """One capture's files of every worker added up, as bytes; None if there are none"""
+        self.flush(force=True)
+        bases = [base for base, (meta, _) in self._groups().items()
+                 if meta and meta['session'] == session and meta['endpoint'] == endpoint]
+        paths = [os.path.join(self.directory, f'{base}.{fmt}') for base in bases]
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            return None
+        if fmt == 'collapsed':
+            counts = Counter()
+            for path in paths:
+                with open(path) as f:
+                    for line in f:
+                        stack, _, count = line.rstrip('\n').rpartition(' ')
+                        if stack and count.isdigit():
+                            counts[stack] += int(count)
+            return ''.join(f'{stack} {count}\n' for stack, count in counts.most_common()).encode('utf-8')
+        stats = pstats.Stats(*paths)
+        return marshal.dumps(stats.stats)
+
+
+profiler = Profiler()
@@ -0,0 +1,201 @@
+"""Delta sync of reporter accounts from weekend_reporter's reporters.json.
+
+Each sync diffs the source against the local reporters store and writes only
+the accounts whose password, name or email changed. A cursor file records
+the source file's stat token and a fingerprint of every source row as last
+applied, so:
+
+* an unchanged source file is skipped after one stat() call;
+* unchanged rows are skipped without comparing them, and a local change
+  (e.g. a password changed in this app) is not overwritten unless the
+  source row itself changes.
+
+SyncWatcher runs syncs in the background when the source file changes,
+using inotify on Linux and mtime polling elsewhere.
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import struct
+import threading
+import time
+from datetime import datetime
+
+from storage import file_lock, file_token
+
+SYNC_FIELDS = ('password', 'name', 'email')
+
+
+def row_fingerprint(record):
+    values = [record.get(field) for field in SYNC_FIELDS]
+    return hashlib.sha256(json.dumps(values).encode('utf-8')).hexdigest()
+
+
+def load_cursor(cursor_path):
+    try:
+        with open(cursor_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'source_token': None, 'rows': {}}
+
+
+def save_cursor(cursor_path, cursor):
+    tmp_path = cursor_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cursor, f, indent=2)
+    os.replace(tmp_path, cursor_path)
+
+
+def diff_reporters(source, local, cursor_rows=None):
+    """Compare source accounts with local ones.
+
+    Returns (changes, report): changes maps username -> full new record for
+    every account to write; report lists what was added and which fields of
+    which accounts changed.
+    """
+    changes = {}
+    report = {'added': [], 'updated': {}, 'unchanged': 0}
+    for username, record in source.items():
+        if username == 'admin':
+            continue  # Skip admin account
+        if cursor_rows is not None and cursor_rows.get(username) == row_fingerprint(record):
+            report['unchanged'] += 1
+            continue
+
+        current = local.get(username)
+        if current is None:
+            changes[username] = {
+                'name': record['name'],
+                'is_manager': False,
+                'password': record['password'],
+                'email': record.get('email', '')
+            }
+            report['added'].append(username)
+            continue
+
+        fields = [field for field in SYNC_FIELDS
+                  if field in record and record[field] != current.get(field)]
+        if fields:
+            updated = dict(current)
+            updated.update({field: record[field] for field in fields})
+            changes[username] = updated
+            report['updated'][username] = fields
+        else:
+            report['unchanged'] += 1
+    return changes, report
+
+
+def sync_from_file(source_path, store, cursor_path, dry_run=False):
+    """Apply source_path's changed accounts to store; returns a report dict"""
+    with file_lock(cursor_path):
+        cursor = load_cursor(cursor_path)
+        token = file_token(source_path)
+        if token is None:
+            return {'skipped': True, 'reason': f'{source_path} not found'}
+        token = list(token)
+        if cursor.get('source') == source_path and cursor['source_token'] == token:
+            return {'skipped': True, 'reason': 'Source unchanged since last sync'}
+
+        with open(source_path) as f:
+            source = json.load(f)
+        cursor_rows = cursor['rows'] if cursor.get('source') == source_path else {}
+        changes, report = diff_reporters(source, store.load('reporters'), cursor_rows)
+        report.update({'skipped': False, 'dry_run': dry_run})
+        if dry_run:
+            return report
+
+        if changes:
+            store.put_reporters(changes)
+        save_cursor(cursor_path, {
+            'source': source_path,
+            'source_token': token,
+            'synced_at': datetime.now().isoformat(timespec='seconds'),
+            'rows': {username: row_fingerprint(record) for username, record in source.items()},
+        })
+        return report
+
+
+class _Inotify:
+    """Minimal inotify binding: waits for files in one directory to be written"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+
+    def wait(self, timeout):
+        """Names of files changed within timeout seconds (may be empty)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        names, offset = [], 0
+        while offset < len(data):
+            _, _, _, length = struct.unpack_from('iIII', data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b'\0').decode()
+            names.append(name)
+            offset += 16 + length
+        return names
+
+
+class SyncWatcher:
+    """Background thread that syncs whenever the source file changes"""
+
+    def __init__(self, source_path, sync, poll_interval=30):
+        self.source_path = source_path
+        self.sync = sync
+        self.poll_interval = poll_interval
+        self.mode = None
+        self.last_report = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='reporter-sync', daemon=True)
+            self._thread.start()
+
+    def _sync(self):
+        try:
+            self.last_report = self.sync()
+        except Exception as e:  # keep watching; report the failure
+            self.last_report = {'error': str(e)}
+
+    def _run(self):
+        self._sync()
+        try:
+            inotify = _Inotify(os.path.dirname(self.source_path))
+            self.mode = 'inotify'
+        except (OSError, AttributeError, TypeError):
+            inotify = None
+            self.mode = 'polling'
+
+        filename = os.path.basename(self.source_path)
+        last_token = file_token(self.source_path)
+        while True:
+            if inotify is not None:
+                # Still re-check the token now and then in case events were missed
+                changed = filename in inotify.wait(self.poll_interval)
+            else:
+                time.sleep(self.poll_interval)
+                changed = False
+            token = file_token(self.source_path)
+            if changed or token != last_token:
+                last_token = token
+                self._sync()
+
+    def status(self):
+        return {'source': self.source_path, 'mode': self.mode,
+                'running': bool(self._thread and self._thread.is_alive()),
+                'last_report': self.last_report}
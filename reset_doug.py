@@ -1,12 +1,5 @@
-from werkzeug.security import generate_password_hash
-import json
+from reset_password import open_store, set_password
 
-with open('data/reporters.json', 'r') as f:
-    reporters = json.load(f)
-
-reporters['douglas.gillison']['password'] = generate_password_hash('2idb2J')
-
-with open('data/reporters.json', 'w') as f:
-    json.dump(reporters, f, indent=2)
+set_password(open_store(), 'douglas.gillison', '2idb2J')
 
 print("✓ Password reset for douglas.gillison to 2idb2J")
@@ -5,27 +5,44 @@ Usage: python3 reset_password.py
 """
 
 from werkzeug.security import generate_password_hash
-import json
 import secrets
 import string
 
+import app
+from storage import thaw
+
 def generate_random_password(length=6):
     """Generate a random password with mixed case and numbers"""
     chars = string.ascii_letters + string.digits
     return ''.join(secrets.choice(chars) for _ in range(length))
 
+def open_store():
+    """The store the app is configured to use (STORAGE_BACKEND and friends)"""
+    app.configure()
+    _, store = app.open_store()
+    return store
+
+def set_password(store, username, password):
+    """Store a new password hash for username; returns the reporter or None"""
+    reporters = store.load('reporters')
+    if username not in reporters:
+        return None
+    reporter = thaw(reporters[username])
+    reporter['password'] = generate_password_hash(password)
+    store.put_reporters({username: reporter})
+    return reporter
+
 def reset_password(username):
     """Reset password for a given username"""
-    # Load reporters
-    try:
-        with open('data/reporters.json', 'r') as f:
-            reporters = json.load(f)
-    except FileNotFoundError:
-        print("ERROR: data/reporters.json not found")
-        return False
+    store = open_store()
+    
+    # Generate new password and save its hash
+    new_password = generate_random_password()
+    reporter = set_password(store, username, new_password)
     
     # Check if user exists
-    if username not in reporters:
+    if reporter is None:
+        reporters = store.load('reporters')
         print(f"ERROR: Username '{username}' not found")
         print(f"\nAvailable usernames:")
         for user in sorted(reporters.keys()):
@@ -33,18 +50,8 @@ def reset_password(username):
                 print(f"  - {user}")
         return False
     
-    # Generate new password
-    new_password = generate_random_password()
-    
-    # Hash and update
-    reporters[username]['password'] = generate_password_hash(new_password)
-    
-    # Save
-    with open('data/reporters.json', 'w') as f:
-        json.dump(reporters, f, indent=2)
-    
     # Display results
-    name = reporters[username].get('name', username)
+    name = reporter.get('name', username)
     print(f"\n✓ Password reset successful!")
     print(f"  Name: {name}")
     print(f"  Username: {username}")
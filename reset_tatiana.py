@@ -1,12 +1,5 @@
-from werkzeug.security import generate_password_hash
-import json
+from reset_password import open_store, set_password
 
-with open('data/reporters.json', 'r') as f:
-    reporters = json.load(f)
-
-reporters['tatiana.bautzer']['password'] = generate_password_hash('x8ZQRd')
-
-with open('data/reporters.json', 'w') as f:
-    json.dump(reporters, f, indent=2)
+set_password(open_store(), 'tatiana.bautzer', 'x8ZQRd')
 
 print("✓ Password reset for tatiana.bautzer to x8ZQRd")
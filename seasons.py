@@ -0,0 +1,129 @@
+"""Archive of past seasons.
+
+Only the active season lives in the store. When a season is reset, its
+holidays, signups, assignments and allocation details are frozen into
+seasons/<season>.json.gz: compact, gzipped, read-only and never touched
+again. seasons/index.json lists them with a short summary, so listing
+seasons does not open any archive. An archive is only read when somebody
+asks for that season, and is then cached (it can't change).
+"""
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime
+
+from storage import file_lock, file_token, freeze
+
+# Archives kept parsed in memory per process
+CACHED_SEASONS = 4
+
+
+def season_id(settings, shifts):
+    """The active season's id: settings['season'], else the years its shifts span"""
+    if settings.get('season'):
+        return settings['season']
+    years = sorted({shift['date'][:4] for shift in shifts if shift.get('date')})
+    if not years:
+        return datetime.now().strftime('%Y')
+    return years[0] if years[0] == years[-1] else f'{years[0]}-{years[-1]}'
+
+
+def valid_season(season):
+    return isinstance(season, str) and re.fullmatch(r'[A-Za-z0-9][A-Za-z0-9._-]{0,63}', season)
+
+
+class SeasonArchive:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_file = os.path.join(directory, 'index.json')
+        self._cache = {}  # season -> frozen archive
+        self._lock = threading.Lock()
+
+    def _path(self, season):
+        return os.path.join(self.directory, f'{season}.json.gz')
+
+    def list(self):
+        """Summaries of the archived seasons, oldest first"""
+        try:
+            with open(self.index_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def version(self):
+        """Changes whenever a season is archived"""
+        return file_token(self.index_file)
+
+    def exists(self, season):
+        return valid_season(season) and os.path.exists(self._path(season))
+
+    def archive(self, season, holidays, signups, assignments, settings, reporter_names):
+        """Freeze a season; returns the id it was archived under.
+
+        reporter_names maps every (non-manager) reporter to their name.
+
+        Archiving the same season twice (e.g. a second reset) keeps both,
+        as <season>, <season>.2, ...
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(self.index_file):
+            archived_id, n = season, 1
+            while os.path.exists(self._path(archived_id)):
+                n += 1
+                archived_id = f'{season}.{n}'
+
+            archived_at = datetime.now().isoformat(timespec='seconds')
+            # Names as they were, so the archive doesn't depend on reporters.json
+            names = {username: reporter_names.get(username, username)
+                     for username in set(signups) | set(assignments)}
+            data = {
+                'season': archived_id,
+                'archived_at': archived_at,
+                'total_reporters': len(reporter_names),
+                'holidays': holidays,
+                'signups': signups,
+                'assignments': assignments,
+                'last_allocation': settings.get('last_allocation'),
+                'reporter_names': names,
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                    f.write(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, self._path(archived_id))
+
+            index = self.list()
+            index.append({
+                'season': archived_id,
+                'archived_at': archived_at,
+                'shifts': len(holidays.get('shifts', [])),
+                'reporters_signed_up': sum(1 for shift_ids in signups.values() if shift_ids),
+                'assignments': len(assignments),
+            })
+            with open(self.index_file + '.tmp', 'w') as f:
+                json.dump(index, f, indent=2)
+            os.replace(self.index_file + '.tmp', self.index_file)
+        return archived_id
+
+    def load(self, season):
+        """A frozen archived season, or None if there is no such season"""
+        if not self.exists(season):
+            return None
+        with self._lock:
+            data = self._cache.get(season)
+        if data is not None:
+            return data
+        with gzip.open(self._path(season), 'rb') as f:
+            data = freeze(json.loads(f.read()))
+        with self._lock:
+            if len(self._cache) >= CACHED_SEASONS:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[season] = data
+        return data
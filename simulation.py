@@ -0,0 +1,328 @@
+"""Monte Carlo estimates of what Allocate will do with the current signups.
+
+Runs many seeded allocations and reports how often each reporter gets a
+shift, how often each shift is filled, and how many slots stay vacant.
+
+Trials are simulated CHUNK at a time as whole-array NumPy operations:
+
+* greedy  - all trials of a chunk advance together: step i hands the i-th
+  reporter of every trial's random order a random shift that still has room
+  in that trial. Same distribution as allocation.allocate_greedy.
+* optimal - the greedy result, then (like allocation.allocate_optimal)
+  augmenting paths until every trial fills as many slots as Allocate can. A
+  batch of trials takes one shortest augmenting path per round, found by a
+  breadth-first search over bitsets of the shifts each shift's holders also
+  signed up for; the path starts at the earliest reporter in the trial's
+  order who has one, as Allocate's would. Allocate breaks the remaining ties
+  differently, so the odds are close to, not exactly, Allocate's.
+
+The draws differ from allocation.allocate()'s, so trial i isn't what
+Allocate would do with seed+i. A simulation stops after time_budget seconds
+(checked between chunks); the result then says truncated and how many
+trials ran. With partial=False it raises OverBudget instead, as soon as the
+chunks so far show that all trials won't fit.
+"""
+import os
+import time
+from collections import Counter
+
+import numpy
+
+import allocation
+
+DEFAULT_TRIALS = 10000
+MAX_TRIALS = 100000
+TIME_BUDGET = float(os.environ.get('SIMULATION_TIME_BUDGET', 2.0))
+
+# Trials simulated together (bounds memory: the random orders take
+# CHUNK * reporters * 2 bytes, pruning and matches a few times that)
+CHUNK = 1000
+# Every PRUNE_EVERY steps, reporters who can't get a shift in any trial are
+# dropped from the rest of the orders, once PRUNE_THRESHOLD of the remaining
+# reporters are
+PRUNE_EVERY = 128
+PRUNE_THRESHOLD = 0.25
+# Trials augmented together (each round holds a bitset of shift x shift
+# per trial)
+AUGMENT_BATCH = 256
+
+
+class OverBudget(Exception):
+    """All the trials asked for won't run within the time budget"""
+
+
+class Tally:
+    """Outcome counts accumulated over trials"""
+
+    def __init__(self, usernames, shifts):
+        self.usernames = usernames
+        self.shifts = shifts
+        self.trials = 0
+        self.assigned = numpy.zeros(len(usernames), dtype=numpy.int64)  # trials in which each reporter got a shift
+        self.filled = numpy.zeros(len(shifts), dtype=numpy.int64)       # filled slots summed over trials
+        self.full = numpy.zeros(len(shifts), dtype=numpy.int64)         # trials in which each shift was full
+        self.vacancies = Counter()                                      # vacant slots -> trials
+
+    def add(self, placed, open_slots, capacity):
+        """Count a chunk: placed is trials x reporters (bool), open_slots trials x shifts"""
+        self.assigned += placed.sum(axis=0)
+        self.filled += (capacity - open_slots).sum(axis=0)
+        self.full += (open_slots == 0).sum(axis=0)
+        self.vacancies.update(open_slots.sum(axis=1).tolist())
+        self.trials += len(placed)
+
+    def result(self):
+        trials = max(self.trials, 1)
+        shift_rows = []
+        for i, shift in enumerate(self.shifts):
+            shift_rows.append({
+                'id': shift['id'],
+                'holiday': shift['holiday'],
+                'date': shift['date'],
+                'time': shift['time'],
+                'slots': shift['slots'],
+                'fill_probability': round(int(self.full[i]) / trials, 4),
+                'expected_filled': round(int(self.filled[i]) / trials, 3),
+            })
+        mean = sum(v * n for v, n in self.vacancies.items()) / trials
+        return {
+            'trials': self.trials,
+            'reporters': {username: round(int(self.assigned[i]) / trials, 4)
+                          for i, username in enumerate(self.usernames)},
+            'shifts': shift_rows,
+            'vacancies': {
+                'mean': round(mean, 3),
+                'distribution': {str(v): round(n / trials, 4)
+                                 for v, n in sorted(self.vacancies.items())},
+            },
+        }
+
+
+def _pack(mask):
+    """Bool rows (last axis) as bitsets of uint64 words"""
+    words = -(-mask.shape[-1] // 64)
+    packed = numpy.packbits(mask, axis=-1, bitorder='little')
+    padding = [(0, 0)] * (mask.ndim - 1) + [(0, words * 8 - packed.shape[-1])]
+    return numpy.pad(packed, padding).view(numpy.uint64)
+
+
+def _meets(a, b):
+    """Whether bitsets a and b (broadcast against each other) share a bit"""
+    common = a[..., 0] & b[..., 0]
+    for word in range(1, a.shape[-1]):
+        common |= a[..., word] & b[..., word]
+    return common != 0
+
+
+def _pick(rng, mask):
+    """A uniformly random True column of each row of mask (0 if there's none)"""
+    keys = rng.integers(1, 1 << 16, size=mask.shape, dtype=numpy.uint16)
+    return (keys * mask).argmax(axis=1)
+
+
+def _compact(orders, keep, nobody):
+    """orders without the reporters not in keep; short rows padded with nobody"""
+    rows = [row[keep[row]] for row in orders]
+    compacted = numpy.full((len(rows), max(len(row) for row in rows)), nobody, dtype=orders.dtype)
+    for i, row in enumerate(rows):
+        compacted[i, :len(row)] = row
+    return compacted
+
+
+class Problem:
+    """The signups as arrays: n reporters, m shifts.
+
+    Two dummy shifts follow the real ones: column m, "nowhere", has room for
+    everybody and is every reporter's last choice, taken only when none of
+    their shifts has room; column m + 1 has no room and pads the rows (and
+    stands in for unknown shift ids). Reporter n is "nobody", who only has
+    the dummies.
+    """
+
+    def __init__(self, signups, shifts, usernames):
+        np = numpy
+        position = {shift['id']: i for i, shift in enumerate(shifts)}
+        self.n, self.m = n, m = len(usernames), len(shifts)
+        lists = [[position.get(s, m + 1) for s in signups[u]] for u in usernames]
+        width = max((len(row) for row in lists), default=0) + 1
+        self.choices = np.full((n + 1, width), m + 1, dtype=np.int32)
+        for r, row in enumerate(lists):
+            self.choices[r, :len(row)] = row
+        self.choices[:, -1] = m
+        self.capacity = np.array([shift['slots'] for shift in shifts] + [2 ** 31 - 1, 0], dtype=np.int32)
+        interest = np.zeros((n + 1, m + 2), dtype=bool)
+        interest[np.repeat(np.arange(n + 1), width), self.choices.reshape(-1)] = True
+        interest[:, m:] = False
+        self.interest = _pack(interest[:n])        # reporter -> bitset of their shifts
+        self.signed_up = interest[:n].astype(np.float32)
+        self.order_type = np.int16 if n < 2 ** 15 - 1 else np.int32
+
+
+def _greedy(problem, t, rng):
+    """t greedy trials; returns (order, match, room).
+
+    order is each trial's random order of reporters, match[trial, reporter]
+    the shift they got (m for none) and room[trial, shift] its open slots.
+    """
+    np = numpy
+    n, m, choices = problem.n, problem.m, problem.choices
+    rows = np.arange(t)
+    offsets = (rows * (m + 2)).astype(np.int32)[:, None]
+    room = np.tile(problem.capacity, (t, 1))
+    flat_room = room.reshape(-1)
+    match = np.full((t, n + 1), m, dtype=np.int32)
+    flat_match = match.reshape(-1)
+    match_offsets = rows * (n + 1)
+    order = orders = rng.permuted(np.tile(np.arange(n, dtype=problem.order_type), (t, 1)), axis=1)
+    pruned = 0
+    while orders.shape[1]:
+        block = np.ascontiguousarray(orders[:, :PRUNE_EVERY].T)
+        # Uniform choice among the shifts with room (like rng.choice): the
+        # one with the highest random key, "nowhere" (key 1) if none has room
+        keys = np.frombuffer(rng.bytes(2 * block.size * choices.shape[1]), dtype=np.uint16)
+        keys = keys.reshape(len(block), t, -1) | 2
+        keys[:, :, -1] = 1
+        for reporter, key in zip(block, keys):
+            slots = choices[reporter] + offsets                   # t x width
+            chosen = slots[rows, (key * (flat_room[slots] > 0)).argmax(axis=1)]
+            flat_room[chosen] -= 1
+            flat_match[match_offsets + reporter] = chosen - offsets[:, 0]
+        # Most reporters late in the order can't get anything any more:
+        # drop those whose shifts are full in every trial of the chunk
+        orders = orders[:, PRUNE_EVERY:]
+        open_shifts = (room > 0).any(axis=0)
+        open_shifts[m] = False
+        alive = open_shifts[choices].any(axis=1)
+        dead = n + 1 - int(alive.sum())
+        if dead - pruned >= PRUNE_THRESHOLD * (n + 1 - pruned):
+            orders = _compact(orders, alive, n)
+            pruned = dead
+    return order, match[:, :n], room
+
+
+def _augment_once(problem, match, room, rank, rng):
+    """One shortest augmenting path per trial, in place; returns which trials had one"""
+    np = numpy
+    n, m, choices, interest = problem.n, problem.m, problem.choices, problem.interest
+    t = len(match)
+    rows = np.arange(t)
+    held = match < m
+
+    # reach[trial, s]: the shifts a holder of s could move to
+    trial, holder = np.nonzero(held)
+    reach = np.zeros((t * (m + 2), interest.shape[1]), dtype=np.uint64)
+    np.bitwise_or.at(reach, trial * (m + 2) + match[trial, holder], interest[holder])
+    reach = reach.reshape(t, m + 2, -1)
+    # wanted[trial]: the shifts its unplaced reporters signed up for
+    wanted = _pack((~held).astype(np.float32) @ problem.signed_up > 0)
+
+    # Breadth-first from the shifts with room, a layer at a time, until a
+    # layer has a shift an unplaced reporter wants
+    dist = np.where(room > 0, 0, -1).astype(np.int16)
+    dist[:, m:] = -1
+    frontier = dist == 0
+    layers = []
+    found = np.full(t, -1)
+    while True:
+        bits = _pack(frontier)
+        layers.append(bits)
+        found[(found < 0) & _meets(bits, wanted)] = len(layers) - 1
+        searching = found < 0
+        frontier = _meets(reach, bits[:, None, :]) & (dist < 0) & searching[:, None]
+        if not frontier.any():
+            break
+        dist[frontier] = len(layers)
+    layers = np.stack(layers)
+    ok = found >= 0
+
+    # The earliest unplaced reporter (in the trial's order) at that distance
+    # takes one of their shifts there, whose holder moves one layer closer
+    # to the room, and so on
+    target = layers[np.maximum(found, 0), rows]
+    start = ~held & _meets(interest[None], target[:, None, :])
+    reporter = np.where(start, rank, n).argmin(axis=1)
+    step = found
+    shift = choices[reporter, _pick(rng, dist[rows[:, None], choices[reporter]] == step[:, None])]
+    active = np.flatnonzero(ok)
+    while len(active):
+        match[active, reporter[active]] = shift[active]
+        done = step[active] == 0
+        room[active[done], shift[active[done]]] -= 1
+        active = active[~done]
+        if not len(active):
+            break
+        step[active] -= 1
+        closer = layers[step[active], active]
+        movable = (match[active] == shift[active, None]) & _meets(interest[None], closer[:, None, :])
+        movable[np.arange(len(active)), reporter[active]] = False
+        reporter[active] = _pick(rng, movable)
+        mover = choices[reporter[active]]
+        shift[active] = mover[np.arange(len(active)), _pick(rng, dist[active[:, None], mover] == step[active, None])]
+    return ok
+
+
+def _augment(problem, order, match, room, target, rng):
+    """Augment the trials that place fewer than target reporters, in place"""
+    np = numpy
+    short = np.flatnonzero((match < problem.m).sum(axis=1) < target)
+    for start in range(0, len(short), AUGMENT_BATCH):
+        batch = short[start:start + AUGMENT_BATCH]
+        batch_match, batch_room = match[batch], room[batch]
+        rank = np.empty(batch_match.shape, dtype=problem.order_type)
+        np.put_along_axis(rank, order[batch], np.arange(problem.n, dtype=problem.order_type), axis=1)
+        missing = target - (batch_match < problem.m).sum(axis=1)
+        while missing.any():
+            live = np.flatnonzero(missing > 0)
+            live_match, live_room = batch_match[live], batch_room[live]
+            ok = _augment_once(problem, live_match, live_room, rank[live], rng)
+            batch_match[live], batch_room[live] = live_match, live_room
+            # A trial without a path has a maximum matching already
+            missing[live] = np.where(ok, missing[live] - 1, 0)
+        match[batch], room[batch] = batch_match, batch_room
+
+
+def simulate(signups, shifts, mode='optimal', trials=DEFAULT_TRIALS, seed=None,
+             time_budget=TIME_BUDGET, progress=None, partial=True):
+    """Simulate trials allocations; returns probabilities per reporter and shift.
+
+    Stops after time_budget seconds (None for no limit), at the end of the
+    chunk running by then - or, unless partial, raises OverBudget once the
+    time per trial so far says the rest won't make it. progress, if given,
+    is called with the fraction of trials done so far.
+    """
+    if mode not in allocation.MODES:
+        raise ValueError(f"Unknown allocation mode '{mode}'")
+    trials = max(1, min(int(trials), MAX_TRIALS))
+    if seed is None:
+        seed = allocation.new_seed()
+    started = time.monotonic()
+    usernames = [username for username in signups if signups[username]]
+    tally = Tally(usernames, shifts)
+    problem = Problem(signups, shifts, usernames)
+    rng = numpy.random.default_rng(seed)
+    # Allocate fills the same number of slots whatever the seed
+    target = len(allocation.allocate_optimal(signups, shifts, seed)[0]) if mode == 'optimal' else 0
+
+    while tally.trials < trials:
+        if tally.trials and time_budget is not None and time.monotonic() - started > time_budget:
+            break
+        order, match, room = _greedy(problem, min(CHUNK, trials - tally.trials), rng)
+        if target:
+            _augment(problem, order, match, room, target, rng)
+        tally.add(match < problem.m, room[:, :problem.m], problem.capacity[:problem.m])
+        if not partial and time_budget is not None and tally.trials < trials \
+                and (time.monotonic() - started) / tally.trials * trials > time_budget:
+            raise OverBudget()
+        if progress is not None:
+            progress(tally.trials / trials)
+
+    result = tally.result()
+    result.update({
+        'mode': mode,
+        'seed': seed,
+        'trials_requested': trials,
+        'truncated': tally.trials < trials,
+        'total_slots': sum(shift['slots'] for shift in shifts),
+        'elapsed_ms': round((time.monotonic() - started) * 1000, 1),
+    })
+    return result
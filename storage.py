@@ -0,0 +1,489 @@
+"""Storage backends for the holiday shift data.
+
+The app works with five datasets - reporters, signups, settings, assignments
+and holidays - each shaped like the original data/*.json files. Two backends
+are available:
+
+* ``JsonStore`` keeps one JSON file per dataset (the original layout).
+* ``SqliteStore`` keeps reporters, signups, settings and assignments as rows
+  in a WAL-mode SQLite file, so changing one reporter's signups is a single
+  row upsert instead of a whole-file rewrite. Holidays stay in holidays.json.
+
+Both backends hand out frozen (read-only) data from a per-process cache that
+is revalidated on every read, so a request only pays for parsing when the
+data actually changed - including changes made by another gunicorn worker or
+by the reset_*.py scripts, which write through the same store API. Call ``thaw()`` to get a mutable copy.
+
+Code that reads several datasets together should take a ``Snapshots``
+snapshot rather than loading them one after another, so a write landing in
+between can't give it a mix of old and new data.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows (local development) - no cross-process locking
+    fcntl = None
+
+DATASETS = ('reporters', 'signups', 'settings', 'assignments', 'holidays')
+
+# Returned by the put_* methods: the previous values of the changed keys and
+# the dataset version just before and just after the write. Derived data can
+# apply the delta if it was built from exactly `before`, and rebuild otherwise.
+Change = namedtuple('Change', 'previous before after')
+
+
+class FrozenDict(dict):
+    """Read-only dict. Serialises, renders and compares like a normal dict."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('Cached data is read-only; use thaw() to get a mutable copy')
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value):
+    """Return a deep read-only copy of parsed JSON (dicts -> FrozenDict, lists -> tuples)"""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Return a deep mutable copy of frozen (or plain) JSON data"""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+def stat_token(st):
+    """Change token for a stat result; os.replace() always yields a new inode"""
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def file_token(filepath):
+    try:
+        return stat_token(os.stat(filepath))
+    except FileNotFoundError:
+        return None
+
+
+def fsync_directory(path):
+    """Flush a directory's entries, so a file just renamed into it survives a crash"""
+    if os.name == 'nt':  # directories can't be opened (or fsynced) on Windows
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JsonFileCache:
+    """Per-process cache of parsed JSON files, validated by file_token()"""
+
+    def __init__(self):
+        self._entries = {}  # filepath -> (token, frozen data)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, filepath):
+        token = file_token(filepath)
+        entry = self._entries.get(filepath)
+        if entry is not None and token is not None and entry[0] == token:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        with metrics.span('json_load'), open(filepath, 'r') as f:
+            data = freeze(json.load(f))
+            token = stat_token(os.fstat(f.fileno()))
+        with self._lock:
+            self._entries[filepath] = (token, data)
+        return data
+
+    def save(self, filepath, data):
+        """Atomically replace filepath with data and prime the cache with it"""
+        directory = os.path.dirname(filepath) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+        try:
+            os.chmod(tmp_path, 0o644)  # mkstemp creates 0600 files
+            with metrics.span('json_save'), os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+                # The inode survives os.replace(), so this token stays valid
+                # until somebody else replaces the file.
+                token = stat_token(os.fstat(f.fileno()))
+            os.replace(tmp_path, filepath)
+            # The rename is only durable once the directory is synced, and
+            # callers (e.g. GroupCommit) acknowledge the write when we return
+            fsync_directory(directory)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._entries[filepath] = (token, freeze(data))
+        return token
+
+    def invalidate(self, filepath=None):
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(filepath, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            'entries': len(self._entries),
+        }
+
+
+@contextmanager
+def file_lock(filepath):
+    """Exclusive cross-process lock on filepath (via a sidecar .lock file)"""
+    if fcntl is None:
+        yield
+        return
+    with open(filepath + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class JsonStore:
+    """One JSON file per dataset; row updates are locked read-modify-writes"""
+
+    def __init__(self, paths, cache=None):
+        self.paths = dict(paths)
+        self.cache = cache or JsonFileCache()
+
+    def exists(self, name):
+        return os.path.exists(self.paths[name])
+
+    def load(self, name):
+        return self.cache.load(self.paths[name])
+
+    def version(self, name):
+        return file_token(self.paths[name])
+
+    def replace(self, name, data):
+        path = self.paths[name]
+        with file_lock(path):
+            self.cache.save(path, data)
+
+    def _update(self, name, changes):
+        path = self.paths[name]
+        with file_lock(path):
+            before = file_token(path)
+            current = self.cache.load(path) if before is not None else {}
+            previous = {key: current.get(key) for key in changes}
+            data = thaw(current)
+            data.update(changes)
+            after = self.cache.save(path, data)
+        return Change(previous, before, after)
+
+    def put_reporters(self, changes):
+        return self._update('reporters', changes)
+
+    def put_signups(self, changes):
+        return self._update('signups', changes)
+
+    def put_settings(self, changes):
+        return self._update('settings', changes)
+
+    def put_assignments(self, changes):
+        return self._update('assignments', changes)
+
+    def reset_season(self):
+        """Clear signups and assignments for a new round of signups"""
+        self.replace('signups', {})
+        self.replace('assignments', {})
+
+    def stats(self):
+        return {'backend': 'json', 'cache': self.cache.stats()}
+
+
+class SqliteStore:
+    """Reporters, signups, settings and assignments as rows in SQLite.
+
+    Each dataset is a (key, value) table with JSON-encoded values. Every write
+    bumps a per-dataset version in the meta table, which is what the read
+    cache is validated against. Datasets without a table (holidays) are
+    delegated to file_store.
+    """
+
+    TABLES = ('reporters', 'signups', 'settings', 'assignments')
+
+    def __init__(self, db_path, file_store):
+        self.db_path = db_path
+        self.file_store = file_store
+        self._local = threading.local()
+        self._cache = {}  # name -> (version, frozen data)
+        self.hits = 0
+        self.misses = 0
+        with self._transaction() as conn:
+            for table in self.TABLES:
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {table} '
+                             '(key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS meta '
+                         '(key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+    def _conn(self):
+        # One connection per thread, re-opened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # FULL: with NORMAL a WAL commit is only synced at the next
+            # checkpoint, and writes (e.g. GroupCommit's) are acknowledged as
+            # durable as soon as they commit
+            conn.execute('PRAGMA synchronous=FULL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self, mode='IMMEDIATE'):
+        conn = self._conn()
+        conn.execute(f'BEGIN {mode}')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def _version(conn, name):
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', ('version:' + name,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _bump(conn, name):
+        conn.execute('INSERT INTO meta (key, value) VALUES (?, 1) '
+                     'ON CONFLICT(key) DO UPDATE SET value = value + 1', ('version:' + name,))
+
+    def exists(self, name):
+        if name not in self.TABLES:
+            return self.file_store.exists(name)
+        return self._version(self._conn(), name) is not None
+
+    def version(self, name):
+        if name not in self.TABLES:
+            return self.file_store.version(name)
+        return self._version(self._conn(), name)
+
+    def load(self, name):
+        if name not in self.TABLES:
+            return self.file_store.load(name)
+        with self._transaction('DEFERRED') as conn:
+            version = self._version(conn, name)
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            rows = conn.execute(f'SELECT key, value FROM {name}').fetchall()
+        data = freeze({key: json.loads(value) for key, value in rows})
+        self._cache[name] = (version, data)
+        return data
+
+    def replace(self, name, data):
+        if name not in self.TABLES:
+            return self.file_store.replace(name, data)
+        with self._transaction() as conn:
+            conn.execute(f'DELETE FROM {name}')
+            conn.executemany(f'INSERT INTO {name} (key, value) VALUES (?, ?)',
+                             [(key, json.dumps(value)) for key, value in data.items()])
+            self._bump(conn, name)
+
+    def _upsert(self, name, changes):
+        with self._transaction() as conn:
+            before = self._version(conn, name)
+            previous = dict.fromkeys(changes)
+            for key in changes:
+                row = conn.execute(f'SELECT value FROM {name} WHERE key = ?', (key,)).fetchone()
+                if row:
+                    previous[key] = json.loads(row[0])
+            conn.executemany(f'INSERT INTO {name} (key, value) VALUES (?, ?) '
+                             'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                             [(key, json.dumps(value)) for key, value in changes.items()])
+            self._bump(conn, name)
+            after = self._version(conn, name)
+        return Change(previous, before, after)
+
+    def put_reporters(self, changes):
+        return self._upsert('reporters', changes)
+
+    def put_signups(self, changes):
+        return self._upsert('signups', changes)
+
+    def put_settings(self, changes):
+        return self._upsert('settings', changes)
+
+    def put_assignments(self, changes):
+        return self._upsert('assignments', changes)
+
+    def reset_season(self):
+        """Clear signups and assignments for a new round of signups"""
+        self.replace('signups', {})
+        self.replace('assignments', {})
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': 'sqlite',
+            'cache': {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'entries': len(self._cache),
+            },
+            'file_cache': self.file_store.cache.stats(),
+        }
+
+
+class Snapshot:
+    """Every dataset as of one moment. Frozen, so it can be shared and kept freely."""
+
+    def __init__(self, state, data):
+        self.state = state         # (sequence token, dataset versions)
+        self.version = state[1]    # store.version() of each dataset, as data_version() gives
+        self.data = data           # name -> frozen dataset
+        self.versions = dict(zip(data, state[1]))
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+
+class Snapshots:
+    """Consistent snapshots of a store that never hold up writers.
+
+    Writes that change several datasets together (an allocation, a reset) run
+    inside writing(), which leaves a marker file while they run and replaces
+    a sequence file when they finish. current() works like a seqlock: it
+    reads the versions, the datasets and the versions again, and only
+    publishes a snapshot if nothing changed and no such write was running
+    meanwhile. Otherwise it retries, or - while a write is running - returns
+    the last published snapshot, which is older but consistent.
+
+    Publishing is copy-on-write: datasets that didn't change are the same
+    frozen objects as in the previous snapshot (the store caches them), and
+    when nothing changed current() is a handful of version checks.
+    """
+
+    RETRIES = 20
+    # A marker this old was left by a writer that died; ignore it
+    STALE_MARKER = 60
+
+    def __init__(self, store, seq_file, names=DATASETS):
+        self.store = store
+        self.seq_file = seq_file
+        self.marker_file = seq_file + '.writing'
+        self.names = names
+        self._current = None
+        self.published = 0
+        self.retries = 0
+        self.stale = 0
+
+    def _writing(self):
+        try:
+            return time.time() - os.stat(self.marker_file).st_mtime < self.STALE_MARKER
+        except FileNotFoundError:
+            return False
+
+    def _state(self):
+        """Sequence token and dataset versions, or None if a write is running"""
+        if self._writing():
+            return None
+        state = (file_token(self.seq_file), tuple(self.store.version(name) for name in self.names))
+        return None if self._writing() else state
+
+    def current(self):
+        snapshot = None
+        for _ in range(self.RETRIES):
+            state = self._state()
+            current = self._current
+            if state is None:
+                if current is not None:
+                    self.stale += 1
+                    return current
+                time.sleep(0.005)
+                continue
+            if current is not None and current.state == state:
+                return current
+            snapshot = Snapshot(state, FrozenDict((name, self.store.load(name)) for name in self.names))
+            if self._state() == state:
+                self._current = snapshot
+                self.published += 1
+                return snapshot
+            self.retries += 1
+        # Writers kept changing things under us; settle for the last consistent view
+        if self._current is not None:
+            return self._current
+        if snapshot is None:
+            versions = tuple(self.store.version(name) for name in self.names)
+            snapshot = Snapshot((None, versions), FrozenDict((name, self.store.load(name)) for name in self.names))
+        return snapshot
+
+    @contextmanager
+    def writing(self):
+        """Group several dataset writes so no snapshot sees only some of them"""
+        with file_lock(self.seq_file):
+            open(self.marker_file, 'w').close()
+            try:
+                yield
+            finally:
+                # New sequence token first, so a reader can't miss the write
+                with open(self.seq_file + '.tmp', 'w') as f:
+                    f.write(str(time.time_ns()))
+                os.replace(self.seq_file + '.tmp', self.seq_file)
+                os.unlink(self.marker_file)
+
+    def stats(self):
+        return {'published': self.published, 'retries': self.retries, 'stale': self.stale}
+
+
+def copy_datasets(source, target, names=DATASETS, overwrite=False):
+    """Copy datasets between stores; returns the names that were copied.
+
+    Used as the one-shot JSON -> SQLite migrator (datasets the target already
+    has are left alone) and, with overwrite=True, to export SQLite data back
+    to the original JSON files.
+    """
+    copied = []
+    for name in names:
+        if not source.exists(name):
+            continue
+        if target.exists(name) and not overwrite:
+            continue
+        target.replace(name, thaw(source.load(name)))
+        copied.append(name)
+    return copied
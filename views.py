@@ -0,0 +1,86 @@
+"""View models and version-keyed caches for rendered pages.
+
+View models are plain dicts holding exactly what a template displays, built
+in one pass over the data, so templates never loop over whole datasets (and
+never see password hashes).
+"""
+import hashlib
+import threading
+
+
+class VersionedCache:
+    """Most recent value per key, tagged with the data version it was built from"""
+
+    def __init__(self):
+        self._entries = {}  # key -> (version, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = build()
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+def content_etag(body):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def reporter_name(reporters, username):
+    return reporters.get(username, {}).get('name', username)
+
+
+def build_manager_view(reporters, settings, signups, assignments, shifts, interest_counts):
+    """Everything manager_dashboard.html shows"""
+    assigned_by_shift = {}
+    for username, shift_id in assignments.items():
+        assigned_by_shift.setdefault(shift_id, []).append(reporter_name(reporters, username))
+
+    shift_rows = []
+    for shift in shifts:
+        assigned = assigned_by_shift.get(shift['id'], [])
+        shift_rows.append({
+            'id': shift['id'],
+            'holiday': shift['holiday'],
+            'date': shift['date'],
+            'time': shift['time'],
+            'interest': interest_counts.get(shift['id'], 0),
+            'assigned': assigned,
+            'slots': shift['slots'],
+            'open_slots': max(shift['slots'] - len(assigned), 0),
+        })
+
+    interested_reporters = sorted(
+        ({
+            'name': reporter_name(reporters, username),
+            'count': len(shift_list),
+            'assigned': username in assignments,
+        } for username, shift_list in signups.items() if shift_list),
+        key=lambda reporter: reporter['name'])
+
+    return {
+        'is_locked': settings.get('is_locked', False),
+        'submitted_count': len(interested_reporters),
+        'total_reporters': sum(1 for r in reporters.values() if not r.get('is_manager')),
+        'total_shifts': len(shifts),
+        'total_slots': sum(shift['slots'] for shift in shifts),
+        'assignment_count': len(assignments),
+        'shifts': shift_rows,
+        'interested_reporters': interested_reporters,
+    }